@@ -0,0 +1,75 @@
+# benchmarks/bench_arrays.py
+"""
+对一列传感器数据求同一个单位公式：逐行以 UnitValue 解释执行，
+与把整列绑定为一个 UnitArray 一次求值进行比较。需要安装 numpy。
+
+用法:
+    python benchmarks/bench_arrays.py [--rows N] [--scalar-rows M]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+
+from lucid.lexer import Lexer
+from lucid.parser import Parser
+from lucid.compiler import Compiler
+from lucid.arrays import UnitArray, np
+from lucid.runtime_types import Unit, UnitValue
+from lucid.vm import VM
+
+FORMULA = "0.5 * mass * (distance / duration)^2 + mass * 9.81m/s^2 * height"
+
+
+def bind(vm, columns, row=None):
+    units = {"mass": "kg", "distance": "m", "duration": "s", "height": "m"}
+    for name, unit in units.items():
+        if row is None:
+            vm.globals[name] = UnitArray(columns[name], unit)
+        else:
+            vm.globals[name] = UnitValue(columns[name][row].item(), Unit.named(unit))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--rows", type=int, default=1_000_000)
+    arg_parser.add_argument("--scalar-rows", type=int, default=20_000)
+    args = arg_parser.parse_args()
+    if np is None:
+        sys.exit("bench_arrays requires numpy.")
+
+    rng = np.random.default_rng(0)
+    columns = {
+        name: rng.uniform(1.0, 100.0, args.rows)
+        for name in ("mass", "distance", "duration", "height")
+    }
+    chunk = Compiler().compile(Parser(Lexer(FORMULA)).parse())
+
+    # 逐行执行太慢，只测前 scalar-rows 行再按比例换算
+    vm = VM()
+    start = time.perf_counter()
+    for row in range(args.scalar_rows):
+        bind(vm, columns, row)
+        vm.interpret(chunk)
+    per_row = (time.perf_counter() - start) / args.scalar_rows
+
+    vm = VM()
+    bind(vm, columns)
+    start = time.perf_counter()
+    result = vm.interpret(chunk)
+    vectorized = time.perf_counter() - start
+
+    print(f"formula:      {FORMULA}")
+    print(f"result unit:  {result.unit}")
+    print(f"rows:         {args.rows:,}")
+    print(f"per row:      {per_row * args.rows:10.3f} s (extrapolated)")
+    print(f"UnitArray:    {vectorized:10.3f} s")
+    print(f"speedup:      {per_row * args.rows / vectorized:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
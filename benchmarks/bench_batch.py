@@ -0,0 +1,72 @@
+# benchmarks/bench_batch.py
+"""
+比较对大量输入记录求同一个表达式的几种方式：
+循环调用 VM.interpret、BatchEvaluator 的按行 / 按列接口，以及进程池。
+
+用法:
+    python benchmarks/bench_batch.py [--rows N] [--processes P]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+
+from lucid.lexer import Lexer
+from lucid.parser import Parser
+from lucid.compiler import Compiler
+from lucid.batch import BatchEvaluator
+from lucid.runtime_types import Unit, UnitValue
+from lucid.vm import VM
+
+SOURCE = "let v = distance / duration; if v > 3m/s then v else 0m/s"
+
+
+def interpret_loop(chunk, rows):
+    vm, results = VM(), []
+    for row in rows:
+        vm.globals.update(row)
+        try:
+            results.append(vm.interpret(chunk))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def timed(label, fn, rows):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<20}{elapsed:>10.3f} s{rows / elapsed:>14,.0f} rows/s")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--rows", type=int, default=200_000)
+    arg_parser.add_argument("--processes", type=int, default=os.cpu_count())
+    args = arg_parser.parse_args()
+
+    metres, seconds = Unit.named("m"), Unit.named("s")
+    columns = {
+        "distance": [UnitValue(i % 97, metres) for i in range(args.rows)],
+        "duration": [UnitValue(i % 13, seconds) for i in range(args.rows)],
+    }
+    rows = [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+    chunk = Compiler().compile(Parser(Lexer(SOURCE)).parse())
+    evaluator = BatchEvaluator(chunk)
+    timed("interpret loop", lambda: interpret_loop(chunk, rows), args.rows)
+    timed("batch rows", lambda: list(evaluator.evaluate(rows)), args.rows)
+    timed("batch columns", lambda: list(evaluator.evaluate_columns(columns)), args.rows)
+    timed(
+        f"process pool ({args.processes})",
+        lambda: list(evaluator.evaluate_parallel(rows, args.processes)),
+        args.rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# benchmarks/bench_calls.py
+"""
+测量函数调用开销：递归 fib 在两种执行引擎下的耗时与每秒调用次数。
+
+用法:
+    python benchmarks/bench_calls.py [--n N] [--repeat R]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+
+from lucid.lexer import Lexer
+from lucid.parser import Parser
+from lucid.compiler import Compiler
+from lucid.vm import VM
+
+SOURCE = "let fib = fn(n) { if n < 2 then n else fib(n - 1) + fib(n - 2) }; fib(N)"
+
+
+def call_count(n):
+    """fib(n) 触发的调用总数"""
+    counts = [1, 1]
+    for _ in range(2, n + 1):
+        counts.append(counts[-1] + counts[-2] + 1)
+    return counts[n]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--n", type=int, default=22)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    ast = Parser(Lexer(SOURCE.replace("N", str(args.n)))).parse()
+    chunk = Compiler().compile(ast)
+    calls = call_count(args.n)
+
+    print(f"fib({args.n}): {calls:,} calls")
+    for dispatch in ("switch", "table"):
+        vm = VM(dispatch=dispatch)
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = vm.interpret(chunk)
+            best = min(best, time.perf_counter() - start)
+        print(
+            f"{dispatch:<8}{best:>10.3f} s{calls / best:>14,.0f} calls/s"
+            f"   result={result}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# benchmarks/bench_constants.py
+"""
+编译并运行一个含有大量常量与 let 绑定的生成程序，验证宽操作数编码并计时。
+
+用法:
+    python benchmarks/bench_constants.py [--constants N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+
+from lucid.lexer import Lexer
+from lucid.parser import Parser
+from lucid.compiler import Compiler
+from lucid.chunk import LONG_FORMS, OpCode, instruction_length
+from lucid.vm import VM
+
+
+def generate_program(constants):
+    """
+    每条绑定引入一个新的数值常量和一个新的全局变量；所有绑定放在一个
+    if 代码块中，使条件跳转必须跨越整个程序。每个单位字面量都重复出现，
+    用来检验常量池去重。
+    """
+    bindings = [f"let c{i} = {i}.5 * 1m" for i in range(constants)]
+    return (
+        "let enabled = true;\n"
+        f"if enabled {{\n{';'.join(bindings)};\nc{constants - 1} + c0\n}}"
+    )
+
+
+def opcode_histogram(chunk):
+    counts, offset = {}, 0
+    while offset < len(chunk.code):
+        opcode = chunk.code[offset]
+        counts[opcode] = counts.get(opcode, 0) + 1
+        offset += instruction_length(opcode)
+    return counts
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--constants", type=int, default=100_000)
+    args = arg_parser.parse_args()
+
+    source = generate_program(args.constants)
+    ast = Parser(Lexer(source)).parse()
+
+    start = time.perf_counter()
+    chunk = Compiler(fold_constants=False).compile(ast)
+    compile_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = VM().interpret(chunk)
+    run_time = time.perf_counter() - start
+
+    counts = opcode_histogram(chunk)
+    print(f"bindings:        {args.constants:,}")
+    print(f"code size:       {len(chunk.code):,} bytes")
+    print(f"constant pool:   {len(chunk.constants):,} entries")
+    print(f"global names:    {len(chunk.global_names):,}")
+    for short_op, long_op in LONG_FORMS.items():
+        print(
+            f"  {OpCode(short_op).name:<22}{counts.get(short_op, 0):>9,}"
+            f"   {OpCode(long_op).name:<26}{counts.get(long_op, 0):>9,}"
+        )
+    print(f"compile time:    {compile_time * 1000:,.1f} ms")
+    print(f"run time:        {run_time * 1000:,.1f} ms")
+    print(f"result:          {result}")
+
+
+if __name__ == "__main__":
+    main()
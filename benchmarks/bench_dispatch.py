@@ -0,0 +1,74 @@
+# benchmarks/bench_dispatch.py
+"""
+比较虚拟机两种执行引擎（原始 if/elif 循环 与 表驱动分派）的指令吞吐量。
+
+用法:
+    python benchmarks/bench_dispatch.py [--runs N] [--repeat R]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+
+from lucid.lexer import Lexer
+from lucid.parser import Parser
+from lucid.compiler import Compiler
+from lucid.chunk import instruction_length
+from lucid.vm import VM
+
+# 全部是不含跳转的直线代码，因此静态指令数即为实际执行的指令数
+WORKLOADS = [
+    ("arithmetic", "1 + 2 * 3 - 4 / 2 + (5 - 1) * 2 - 7 * 3 + 9"),
+    ("comparisons", "(3 > 2) == (5 >= 1); (4 != 4) == (2 <= 8); 1 < 2"),
+    ("units", "100km / 2hr + 10km / 1hr; 10m * 5s; 3m^2"),
+    ("globals", "let x = 3; let y = 4; x * x + y * y - x * y"),
+]
+
+
+def compile_source(source):
+    ast = Parser(Lexer(source)).parse()
+    # 关闭常量折叠，保证测量的是解释执行而不是折叠后的单条常量
+    return Compiler(fold_constants=False).compile(ast)
+
+
+def count_instructions(chunk):
+    count, offset = 0, 0
+    while offset < len(chunk.code):
+        offset += instruction_length(chunk.code[offset])
+        count += 1
+    return count
+
+
+def measure(chunk, dispatch, runs, repeat):
+    """返回 repeat 次测量中最快一次的每秒指令数"""
+    vm = VM(dispatch=dispatch)
+    instructions = count_instructions(chunk) * runs
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(runs):
+            vm.interpret(chunk)
+        best = min(best, time.perf_counter() - start)
+    return instructions / best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--runs", type=int, default=20000)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    print(f"{'workload':<14}{'switch ips':>16}{'table ips':>16}{'speedup':>10}")
+    for name, source in WORKLOADS:
+        chunk = compile_source(source)
+        before = measure(chunk, "switch", args.runs, args.repeat)
+        after = measure(chunk, "table", args.runs, args.repeat)
+        print(f"{name:<14}{before:>16,.0f}{after:>16,.0f}{after / before:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
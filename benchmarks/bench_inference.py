@@ -0,0 +1,67 @@
+# benchmarks/bench_inference.py
+"""
+比较开启与关闭单位推断时，同一段程序在字节码解释器中的吞吐量。
+开启时类型已知的运算编译为省略运行时检查的专用指令。
+
+用法:
+    python benchmarks/bench_inference.py [--runs N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+
+from lucid.lexer import Lexer
+from lucid.parser import Parser
+from lucid.compiler import Compiler
+from lucid.vm import VM
+
+WORKLOADS = [
+    (
+        "plain numbers",
+        "let a = 7; let b = 3.5; a * 3 + b / 2 - (a - b) * 0.5 + a * b - b / a",
+    ),
+    (
+        "units",
+        "let d = 100km; let t = 2hr; let v = d / t; "
+        "let w = v * 3 + v / 2 - v; if w > v then w * t else d",
+    ),
+    (
+        "mixed",
+        "let mass = 70kg; let g = 9.81m; let h = 3m; "
+        "mass * g * h / 2 + mass * g * h / 4",
+    ),
+]
+
+
+def measure(source, infer_units, runs):
+    chunk = Compiler(infer_units=infer_units).compile(Parser(Lexer(source)).parse())
+    vm = VM(tier_threshold=None)
+    result = vm.interpret(chunk)
+    start = time.perf_counter()
+    for _ in range(runs):
+        vm.interpret(chunk)
+    return runs / (time.perf_counter() - start), result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--runs", type=int, default=50_000)
+    args = arg_parser.parse_args()
+
+    print(
+        f"{'workload':<16}{'generic runs/s':>17}{'inferred runs/s':>18}{'speedup':>10}"
+    )
+    for name, source in WORKLOADS:
+        before, expected = measure(source, False, args.runs)
+        after, result = measure(source, True, args.runs)
+        assert repr(result) == repr(expected), (result, expected)
+        print(f"{name:<16}{before:>17,.0f}{after:>18,.0f}{after / before:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
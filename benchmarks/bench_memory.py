@@ -0,0 +1,98 @@
+# benchmarks/bench_memory.py
+"""
+测量解析与运行一个大型生成脚本时，每个令牌、AST 节点与运行时值占用的字节数。
+
+用法:
+    python benchmarks/bench_memory.py [--bindings N]
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+
+from lucid.ast import ASTNode
+from lucid.lexer import Lexer
+from lucid.parser import Parser
+from lucid.compiler import Compiler
+from lucid.vm import VM
+
+
+def generate_expressions(count):
+    """生成 N 条带单位运算的表达式"""
+    return [f"{i}m * {i % 7 + 1}s / {i % 5 + 1}kg" for i in range(count)]
+
+
+def generate_script(bindings):
+    """生成 N 条 let 绑定组成的脚本"""
+    expressions = generate_expressions(bindings)
+    return ";\n".join(f"let v{i} = {expr}" for i, expr in enumerate(expressions))
+
+
+def count_nodes(node):
+    """遍历 AST（__slots__ 与 __dict__ 属性均可），统计节点数量"""
+    count, pending = 0, [node]
+    while pending:
+        current = pending.pop()
+        if isinstance(current, list):
+            pending.extend(current)
+            continue
+        if not isinstance(current, ASTNode):
+            continue
+        count += 1
+        pending.extend(getattr(current, "__dict__", {}).values())
+        for cls in type(current).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                pending.append(getattr(current, name, None))
+    return count
+
+
+def traced(fn):
+    """运行 fn，返回 (结果, 结果仍然占用的字节数)"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = fn()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return result, after - before
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--bindings", type=int, default=20000)
+    args = arg_parser.parse_args()
+
+    source = generate_script(args.bindings)
+    print(f"script: {args.bindings} bindings, {len(source):,} characters")
+
+    tokens, token_bytes = traced(lambda: list(Lexer(source).get_token_stream()))
+    print(
+        f"{'tokens':<16}{len(tokens):>12,}{token_bytes / len(tokens):>12.1f} B/each"
+    )
+    del tokens
+
+    ast, ast_bytes = traced(lambda: Parser(Lexer(source)).parse())
+    nodes = count_nodes(ast)
+    print(f"{'AST nodes':<16}{nodes:>12,}{ast_bytes / nodes:>12.1f} B/each")
+    del ast
+
+    # 每条表达式单独编译，运行结果保存在列表中（含每项 8 字节的列表槽位）
+    compiler, vm = Compiler(fold_constants=False), VM()
+    chunks = [
+        compiler.compile(Parser(Lexer(expr)).parse())
+        for expr in generate_expressions(args.bindings)
+    ]
+    values, value_bytes = traced(lambda: [vm.interpret(chunk) for chunk in chunks])
+    print(
+        f"{'runtime values':<16}{len(values):>12,}"
+        f"{value_bytes / len(values):>12.1f} B/each"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+# benchmarks/bench_parser.py
+"""
+比较优先级爬升的 Parser 与原先逐级递归下降的表达式解析的吞吐量。
+工作负载是脚本生成的大型公式：长运算符链、括号嵌套、单位字面量与函数调用。
+令牌预先切分好，只测量语法分析本身；两者生成的 AST 必须完全一致。
+
+最后报告两种解析器各自能处理的括号嵌套深度。
+
+用法:
+    python benchmarks/bench_parser.py [--operands N] [--repeat R]
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+
+from lucid.ast import *
+from lucid.lexer import Lexer
+from lucid.parser import Parser
+
+
+class RecursiveDescentParser(Parser):
+    """原先的表达式文法：每一级优先级一个方法，每个操作数九层调用"""
+
+    def _primary(self):
+        if self.current_token.type == "LPAREN":
+            self._eat("LPAREN")
+            node = self._expression()
+            self._eat("RPAREN")
+            return node
+        return super()._primary()
+
+    def _unary(self):
+        token = self.current_token
+        if token.type in ("PLUS", "MINUS"):
+            self._eat(token.type)
+            return UnaryOp(token, self._unary())
+        if token.type == "AWAIT":
+            self._eat("AWAIT")
+            return AwaitExpression(self._unary())
+        return self._calls(self._primary())
+
+    def _power(self):
+        node = self._unary()
+        if self.current_token.type == "CARET":
+            op = self.current_token
+            self._eat("CARET")
+            node = BinOp(node, op, self._power())
+        return node
+
+    def _factor(self):
+        node = self._power()
+        while self.current_token.type in ("MUL", "DIV"):
+            op = self.current_token
+            self._eat(op.type)
+            node = BinOp(node, op, self._power())
+        return node
+
+    def _term(self):
+        node = self._factor()
+        while self.current_token.type in ("PLUS", "MINUS"):
+            op = self.current_token
+            self._eat(op.type)
+            node = BinOp(node, op, self._factor())
+        return node
+
+    def _comparison(self):
+        node = self._term()
+        while self.current_token.type in ("GT", "GTE", "LT", "LTE"):
+            op = self.current_token
+            self._eat(op.type)
+            node = BinOp(node, op, self._term())
+        return node
+
+    def _equality(self):
+        node = self._comparison()
+        while self.current_token.type in ("EQ", "NE"):
+            op = self.current_token
+            self._eat(op.type)
+            node = BinOp(node, op, self._comparison())
+        return node
+
+    def _expression(self):
+        node = self._equality()
+        while self.current_token.type in ("PIPE",):
+            op = self.current_token
+            self._eat(op.type)
+            node = BinOp(node, op, self._equality())
+        return node
+
+
+class _Tokens:
+    """把预先切分好的令牌列表交给 Parser"""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+
+    def get_token_stream(self):
+        return iter(self.tokens)
+
+
+def generate_formula(operands, rng):
+    """由 operands 个操作数组成的公式，随机混合各级运算符与括号"""
+    atoms = ["x", "3", "2.5", "10m", "4s", "f(x, 2)", "-y", "(a + b)"]
+    operators = ["+", "-", "*", "/", "^", "+", "*", "<"]
+    parts, depth = [], 0
+    for i in range(operands):
+        if rng.random() < 0.15:
+            parts.append("(")
+            depth += 1
+        parts.append(rng.choice(atoms))
+        if depth and rng.random() < 0.15:
+            parts.append(")")
+            depth -= 1
+        if i < operands - 1:
+            parts.append(f" {rng.choice(operators)} ")
+    return "".join(parts) + ")" * depth
+
+
+def flatten(tree):
+    """前序展开 AST（用显式栈，长运算符链会生成很深的树）"""
+    items, pending = [], [tree]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, list):
+            items.append(len(node))
+            pending.extend(reversed(node))
+        elif isinstance(node, ASTNode):
+            fields = type(node).__slots__
+            items.append(type(node).__name__)
+            pending.extend(getattr(node, f) for f in reversed(fields))
+        elif hasattr(node, "type"):
+            items.append((node.type, node.value))
+        else:
+            items.append(node)
+    return items
+
+
+def measure(tokens, repeat):
+    """两种解析器交替运行 repeat 轮，各取最短耗时；计时期间关闭垃圾回收"""
+    best = {RecursiveDescentParser: float("inf"), Parser: float("inf")}
+    trees = {}
+    for _ in range(repeat):
+        for parser_class in best:
+            trees.pop(parser_class, None)
+            gc.collect()
+            gc.disable()
+            start = time.perf_counter()
+            trees[parser_class] = parser_class(_Tokens(tokens)).parse()
+            elapsed = time.perf_counter() - start
+            gc.enable()
+            best[parser_class] = min(best[parser_class], elapsed)
+    assert flatten(trees[Parser]) == flatten(trees[RecursiveDescentParser])
+    return best[RecursiveDescentParser], best[Parser]
+
+
+def max_depth(parser_class, limit=100_000):
+    """以倍增方式找出能解析的最大括号嵌套深度（上限 limit）"""
+    depth = 16
+    while depth < limit:
+        source = "(" * (depth * 2) + "1" + ")" * (depth * 2)
+        try:
+            parser_class(Lexer(source)).parse()
+        except RecursionError:
+            return depth
+        depth *= 2
+    return f">= {limit:,}"
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--operands", type=int, default=20_000)
+    arg_parser.add_argument("--repeat", type=int, default=15)
+    args = arg_parser.parse_args()
+
+    rng = random.Random(42)
+    workloads = [
+        ("long chain", " + ".join(["x * 2"] * args.operands)),
+        (
+            "mixed formulas",
+            "; ".join(generate_formula(50, rng) for _ in range(args.operands // 50)),
+        ),
+        ("right-assoc ^", "2 ^ " * 200 + "1"),
+    ]
+
+    print(f"{'workload':<16}{'tokens':>9}{'recursive tok/s':>18}"
+          f"{'climbing tok/s':>17}{'speedup':>10}")
+    for name, source in workloads:
+        tokens = list(Lexer(source).get_token_stream())
+        before, after = measure(tokens, args.repeat)
+        count = len(tokens)
+        print(
+            f"{name:<16}{count:>9,}{count / before:>18,.0f}"
+            f"{count / after:>17,.0f}{before / after:>9.2f}x"
+        )
+
+    print(f"\n{'max paren depth':<16}{'recursive':>12}{'climbing':>14}")
+    print(f"{'':<16}{max_depth(RecursiveDescentParser):>12}{max_depth(Parser):>14}")
+
+
+if __name__ == "__main__":
+    main()
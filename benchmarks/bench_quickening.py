@@ -0,0 +1,70 @@
+# benchmarks/bench_quickening.py
+"""
+比较开启与关闭指令加速时，操作数来自嵌入方全局变量（编译期无法推断类型）
+的程序在字节码解释器中的吞吐量。
+
+用法:
+    python benchmarks/bench_quickening.py [--runs N]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+
+from lucid.lexer import Lexer
+from lucid.parser import Parser
+from lucid.compiler import Compiler
+from lucid.runtime_types import Unit, UnitValue
+from lucid.vm import VM
+
+WORKLOADS = [
+    ("plain numbers", "a * 3 + b / 2 - (a - b) * 0.5 + a * b - b / a"),
+    (
+        "units",
+        "let v = distance / duration; "
+        "if v > limit then (v - limit) * duration else (limit - v) * duration",
+    ),
+    ("recursion", "let f = fn(n) { if n < 2 then n else f(n - 1) + f(n - 2) }; f(10)"),
+]
+
+BINDINGS = {
+    "a": 7,
+    "b": 3.5,
+    "distance": UnitValue(100.0, Unit.named("m")),
+    "duration": UnitValue(12.5, Unit.named("s")),
+    "limit": UnitValue(5.0, Unit.named("m").divide(Unit.named("s"))),
+}
+
+
+def measure(source, quicken_threshold, runs):
+    chunk = Compiler().compile(Parser(Lexer(source)).parse())
+    vm = VM(tier_threshold=None, quicken_threshold=quicken_threshold)
+    vm.globals.update(BINDINGS)
+    result = vm.interpret(chunk)
+    # 取 5 轮中最快的一轮，减少噪声的影响
+    number = max(1, runs // 5)
+    best = min(timeit.repeat(lambda: vm.interpret(chunk), number=number, repeat=5))
+    return number / best, result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--runs", type=int, default=20_000)
+    args = arg_parser.parse_args()
+
+    print(
+        f"{'workload':<16}{'generic runs/s':>17}{'quickened runs/s':>19}{'speedup':>10}"
+    )
+    for name, source in WORKLOADS:
+        before, expected = measure(source, None, args.runs)
+        after, result = measure(source, 8, args.runs)
+        assert repr(result) == repr(expected), (result, expected)
+        print(f"{name:<16}{before:>17,.0f}{after:>19,.0f}{after / before:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# benchmarks/bench_repl.py
+"""
+测量 REPL 每秒能处理的请求数：逐行重新构建 Lexer / Parser / Chunk 的旧方式，
+与共享常量池、全局槽位并缓存编译结果的 Session 进行比较。
+请求流由一组重复出现的计算与少量新的 let 绑定组成。
+
+用法:
+    python benchmarks/bench_repl.py [--requests N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+
+from lucid.lexer import Lexer
+from lucid.parser import Parser
+from lucid.compiler import Compiler
+from lucid.session import Session
+from lucid.vm import VM
+
+QUERIES = [
+    "speed * 2hr",
+    "distance / speed",
+    "if speed > 40km/hr then speed else 40km/hr",
+    "(distance + 5km) / 30min",
+]
+
+
+def generate_requests(count):
+    requests = ["let speed = 50km/hr", "let distance = 120km"]
+    for i in range(count - len(requests)):
+        if i % 50 == 0:
+            requests.append(f"let r{i} = {i}m / 3s")
+        else:
+            requests.append(QUERIES[i % len(QUERIES)])
+    return requests
+
+
+def per_line(requests):
+    compiler, vm = Compiler(), VM()
+    for text in requests:
+        vm.interpret(compiler.compile(Parser(Lexer(text)).parse()))
+
+
+def session(requests):
+    current = Session()
+    for text in requests:
+        current.execute(text)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--requests", type=int, default=50_000)
+    args = arg_parser.parse_args()
+
+    requests = generate_requests(args.requests)
+    for label, fn in (("per-line compile", per_line), ("session", session)):
+        start = time.perf_counter()
+        fn(requests)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<18}{elapsed:>10.3f} s{len(requests) / elapsed:>14,.0f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# benchmarks/bench_spawn.py
+"""
+把 N 个 CPU 密集的代码块分别放在主线程、线程池与进程池中运行并计时。
+进程池的加速比取决于可用的核心数。
+
+用法:
+    python benchmarks/bench_spawn.py [--tasks N] [--n K]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+
+from lucid.lexer import Lexer
+from lucid.parser import Parser
+from lucid.compiler import Compiler
+from lucid.vm import VM
+
+FIB = "let fib = fn(n) { if n < 2 then n else fib(n - 1) + fib(n - 2) };"
+
+
+def sequential_source(tasks, n):
+    return FIB + " + ".join(f"fib({n}) * 1m" for _ in range(tasks))
+
+
+def spawn_source(tasks, n):
+    spawns = "; ".join(f"let t{i} = spawn {{ fib({n}) * 1m }}" for i in range(tasks))
+    return f"{FIB} {spawns}; " + " + ".join(f"await t{i}" for i in range(tasks))
+
+
+def run(source, executor):
+    chunk = Compiler().compile(Parser(Lexer(source)).parse())
+    vm = VM(executor=executor)
+    try:
+        start = time.perf_counter()
+        result = vm.interpret(chunk)
+        return time.perf_counter() - start, result
+    finally:
+        vm.shutdown()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--tasks", type=int, default=os.cpu_count() or 1)
+    arg_parser.add_argument("--n", type=int, default=20)
+    args = arg_parser.parse_args()
+
+    print(f"{args.tasks} tasks of fib({args.n}) on {os.cpu_count()} cores")
+    baseline, result = run(sequential_source(args.tasks, args.n), "thread")
+    print(f"{'sequential':<14}{baseline:>10.3f} s   result={result}")
+    for executor in ("thread", "process"):
+        elapsed, result = run(spawn_source(args.tasks, args.n), executor)
+        print(
+            f"{executor + ' pool':<14}{elapsed:>10.3f} s"
+            f"{baseline / elapsed:>8.2f}x   result={result}"
+        )
+
+
+if __name__ == "__main__":
+    main()
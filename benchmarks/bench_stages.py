@@ -0,0 +1,183 @@
+# benchmarks/bench_stages.py
+"""
+分别测量流水线的每个阶段：词法分析（Lexer.get_token_stream）、语法分析
+（Parser.parse）、编译（Compiler.compile）与执行（VM.run），
+工作负载由脚本生成：深层嵌套表达式、大量 let 绑定、密集的单位运算与长 if/else 链。
+
+每个（工作负载, 阶段）先预热若干次，再重复测量，报告最小值、中位数与离散程度。
+--save 把结果保存为 JSON 基线；--compare 与基线比较，
+任一阶段的最小耗时比基线慢超过 --threshold 时以非零状态退出
+（最小值受机器上其他负载的干扰最小，比中位数更适合做回归判断）。
+
+用法:
+    python benchmarks/bench_stages.py [--scale S] [--save FILE] [--compare FILE]
+                                      [--threshold 0.10] [--warmup W] [--repeat R]
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+
+from lucid.lexer import Lexer
+from lucid.parser import Parser
+from lucid.compiler import Compiler
+from lucid.vm import VM
+
+STAGES = ("lex", "parse", "compile", "run")
+
+
+def deep_expressions(scale):
+    """每条语句是一个嵌套 20 层括号的表达式"""
+    depth = 20
+    statement = "(" * depth + "1" + "".join(f" + {i})" for i in range(depth))
+    return "; ".join(statement for _ in range(200 * scale))
+
+
+def let_bindings(scale):
+    lines = ["let v0 = 1;"]
+    lines += [f"let v{i} = v{i - 1} + {i};" for i in range(1, 2000 * scale)]
+    return "\n".join(lines)
+
+
+def unit_arithmetic(scale):
+    lines = (
+        f"let d{i} = {i}m / {i % 9 + 1}s * 2kg + {i}kg * 1m/s;"
+        for i in range(1000 * scale)
+    )
+    return "\n".join(lines)
+
+
+def if_else_chains(scale):
+    """每条语句是一条 30 个分支的 else if 链，只有最后一个分支命中"""
+    branches = 30
+    chain = " else ".join(f"if x < {i} then {i}m" for i in range(branches))
+    return "let x = 99; " + "; ".join(f"{chain} else 0m" for _ in range(100 * scale))
+
+
+WORKLOADS = {
+    "deep expressions": deep_expressions,
+    "let bindings": let_bindings,
+    "unit arithmetic": unit_arithmetic,
+    "if/else chains": if_else_chains,
+}
+
+
+class _TokenList:
+    """把预先切分好的令牌交给 Parser，使语法分析的计时不包含词法分析"""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+
+    def get_token_stream(self):
+        return iter(self.tokens)
+
+
+def stage_functions(source):
+    """返回 {阶段: 无参可调用对象}；每个阶段的输入预先由前一阶段产生"""
+    tokens = list(Lexer(source).get_token_stream())
+    ast = Parser(_TokenList(tokens)).parse()
+    chunk = Compiler().compile(ast)
+    return {
+        "lex": lambda: list(Lexer(source).get_token_stream()),
+        "parse": lambda: Parser(_TokenList(tokens)).parse(),
+        "compile": lambda: Compiler().compile(ast),
+        "run": lambda: VM().interpret(chunk),
+    }
+
+
+def measure(fn, warmup, repeat):
+    """预热 warmup 次后测量 repeat 次，返回统计值（秒）"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        # 上一次测量产生的垃圾不计入这一次
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+
+
+def run_suite(scale, warmup, repeat):
+    results = {}
+    for workload, generate in WORKLOADS.items():
+        functions = stage_functions(generate(scale))
+        for stage in STAGES:
+            results[f"{workload}/{stage}"] = measure(functions[stage], warmup, repeat)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """返回 [(名称, 基线最小值, 当前最小值, 比值)]，只包含超过阈值的项"""
+    regressions = []
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        ratio = stats["min"] / base["min"]
+        if ratio > 1 + threshold:
+            regressions.append((name, base["min"], stats["min"], ratio))
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--scale", type=int, default=1)
+    arg_parser.add_argument("--warmup", type=int, default=2)
+    arg_parser.add_argument("--repeat", type=int, default=7)
+    arg_parser.add_argument("--save", metavar="FILE")
+    arg_parser.add_argument("--compare", metavar="FILE")
+    arg_parser.add_argument("--threshold", type=float, default=0.10)
+    args = arg_parser.parse_args()
+
+    results = run_suite(args.scale, args.warmup, args.repeat)
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved["scale"] != args.scale:
+            sys.exit(f"Baseline was measured at --scale {saved['scale']}.")
+        baseline = saved["results"]
+
+    print(
+        f"{'workload/stage':<28}{'min ms':>10}{'median ms':>11}"
+        f"{'rel sd':>8}{'vs base':>10}"
+    )
+    for name, stats in results.items():
+        base = baseline.get(name)
+        change = f"{stats['min'] / base['min']:>9.2f}x" if base else ""
+        print(
+            f"{name:<28}{stats['min'] * 1e3:>10.2f}{stats['median'] * 1e3:>11.2f}"
+            f"{stats['stdev'] / stats['median']:>7.1%}{change:>10}"
+        )
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"scale": args.scale, "results": results}, f, indent=2)
+        print(f"Baseline saved to {args.save}")
+
+    regressions = compare(results, baseline, args.threshold)
+    for name, before, after, ratio in regressions:
+        print(
+            f"REGRESSION {name}: {before * 1e3:.2f} ms -> {after * 1e3:.2f} ms "
+            f"({ratio:.2f}x, threshold {1 + args.threshold:.2f}x)"
+        )
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
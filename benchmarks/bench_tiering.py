@@ -0,0 +1,66 @@
+# benchmarks/bench_tiering.py
+"""
+比较同一个公式反复执行时，字节码解释执行与翻译为 Python 函数（第二执行层）的吞吐量。
+
+用法:
+    python benchmarks/bench_tiering.py [--runs N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+
+from lucid.lexer import Lexer
+from lucid.parser import Parser
+from lucid.compiler import Compiler
+from lucid.runtime_types import Unit, UnitValue
+from lucid.vm import VM
+
+WORKLOADS = [
+    ("plain numbers", "a * 3 + b / 2 - (a - b) * 0.5"),
+    ("units", "0.5 * mass * (distance / duration)^2 + mass * 9.81m/s^2 * height"),
+    ("branch", "let v = distance / duration; if v > 3m/s then v else 0m/s"),
+]
+
+BINDINGS = {
+    "a": 7,
+    "b": 3.5,
+    "mass": UnitValue(70.0, Unit.named("kg")),
+    "distance": UnitValue(100.0, Unit.named("m")),
+    "duration": UnitValue(12.5, Unit.named("s")),
+    "height": UnitValue(3.0, Unit.named("m")),
+}
+
+
+def measure(chunk, tier_threshold, runs):
+    vm = VM(tier_threshold=tier_threshold)
+    vm.globals.update(BINDINGS)
+    result = vm.interpret(chunk)
+    start = time.perf_counter()
+    for _ in range(runs):
+        vm.interpret(chunk)
+    return runs / (time.perf_counter() - start), result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--runs", type=int, default=100_000)
+    args = arg_parser.parse_args()
+
+    print(
+        f"{'workload':<16}{'bytecode runs/s':>18}{'tiered runs/s':>16}{'speedup':>10}"
+    )
+    for name, source in WORKLOADS:
+        chunk = Compiler().compile(Parser(Lexer(source)).parse())
+        before, expected = measure(chunk, None, args.runs)
+        after, result = measure(chunk, 1, args.runs)
+        assert repr(result) == repr(expected), (result, expected)
+        print(f"{name:<16}{before:>18,.0f}{after:>16,.0f}{after / before:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
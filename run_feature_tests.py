@@ -1,16 +1,33 @@
 # run_feature_tests.py
 
+import asyncio
+import json
+import os
 import sys
+import tempfile
+from contextlib import redirect_stdout
 from io import StringIO
 
 # 这是一个技巧，确保脚本可以找到 src 目录下的模块
 sys.path.insert(0, "./src")
 
+from lucid.ast import BlockStatement, IfExpression
 from lucid.lexer import Lexer
 from lucid.parser import Parser
-from lucid.compiler import Compiler
-from lucid.vm import VM
-from lucid.runtime_types import UnitValue
+from lucid.compiler import COMPILER_VERSION, Compiler
+from lucid.chunk import GENERIC_FORMS, OpCode
+from lucid.debug import disassemble_chunk
+from lucid.optimizer import decode
+from lucid.cache import BytecodeCache
+from lucid.arrays import UnitArray, np
+from lucid.batch import BatchEvaluator, evaluate_batch
+from lucid.serialize import dump_chunk, load_chunk
+from lucid.session import Session
+from lucid.tiering import translate_chunk
+from lucid.units import register_unit, unregister_unit
+from lucid.__main__ import serve
+from lucid.vm import DEFAULT_BUDGET, VM
+from lucid.runtime_types import Unit, UnitValue
 
 # --- 测试用例定义 ---
 # 格式: ("描述", "Lucid 代码", "期望的 repr() 输出")
@@ -21,6 +38,12 @@ TEST_CASES = [
     ("Operator Precedence", "5 + 10 * 2", "25"),
     ("Parentheses", "(5 + 10) * 2", "30"),
     ("Negative Numbers", "-10", "-10"),
+    ("Right-Associative Power", "2^3^2", "512"),
+    ("Unary Binds Tighter", "-2^2", "4"),
+    ("Negative Exponent", "2^-1", "0.5"),
+    ("Left-Associative Minus", "100 - 10 - 1", "89"),
+    ("Pipe Binds Loosest", "let inc = fn(x) { x + 1 }; 1 + 2 |> inc", "4"),
+    ("Deep Parentheses", "(" * 5000 + "1 + 2" + ")" * 5000, "3"),
     # --- 单位系统 ---
     ("Unit Creation", "10m", "10m"),
     ("Unit Multiplication", "10m * 5s", "50m*s"),
@@ -30,6 +53,8 @@ TEST_CASES = [
     ("Variable Assignment", "let a = 100", "None"),
     ("Variable Access", "a", "100"),
     ("Variable in Expression", "a / 5", "20.0"),
+    ("Bare Unit Fallback", "3 * kg + 2 * kg", "5kg"),
+    ("Redefine Variable", "let b = 1; let b = b + a; b", "101"),
     # --- 比较运算 ---
     ("Equality True", "10 == 10", "True"),
     ("Equality False", "10 == 9", "False"),
@@ -42,10 +67,747 @@ TEST_CASES = [
     ("If without Else (True)", "if true then 10", "10"),
     ("If without Else (False)", "if false then 10", "None"),
     ("If with Block", "let x = if 1 > 0 { 500 }; x", "500"),
+    # --- 组合比较（窥孔优化会融合为超级指令） ---
+    ("Unit Greater or Equal", "10m >= 5m", "True"),
+    ("Unit Less or Equal", "2s <= 1s", "False"),
+    ("Jump over Fused Ops", "if 3 >= 2 then 10m != 5m else 1km", "True"),
+    ("Jump into Else Branch", "if a <= 10 then 1km else 2km >= 1km", "True"),
+    # --- 大型程序（宽操作数与常量去重） ---
+    ("Wide Constants", " + ".join(str(i) for i in range(300)), str(sum(range(300)))),
+    (
+        "Wide Globals",
+        "; ".join(f"let g{i} = {i}" for i in range(300)) + "; g299 - g1",
+        "298",
+    ),
+    ("Long Jumps", "if a > 1 { " + "1; " * 30000 + "2m } else { 3m }", "2m"),
+    ("Deduplicated Constants", "0.0 * -1 + 0.0 == 0.0 + (-0.0)", "True"),
+    # --- 深层 AST（编译器、常量折叠与单位推断都不递归） ---
+    (
+        "Local Recursive Function",
+        "let f = fn() { let g = fn(n) { if n < 1 then 0 else g(n - 1) + 1 }; g(3) }; "
+        "f()",
+        "3",
+    ),
+    (
+        "Local Rebinding Reads Outer",
+        "let f = fn(n) { let k = fn() { n }; let n = n + 1; k() + n }; f(1)",
+        "3",
+    ),
+    ("Dead Huge Power", "if false then 9^9^8 else 1", "1"),
+    ("Dead Huge Repeat", 'if false then "a" * 10000000000 else 1', "1"),
+    ("Large Power At Runtime", "let b = 2^100000; b > 1", "True"),
+    ("Deep Left Chain", "let n = 1; " + " + ".join(["n"] * 3000), "3000"),
+    ("Deep Right Nesting", "let n = 1; " + "n + (" * 3000 + "n" + ")" * 3000, "3001"),
+    ("Deep Folded Chain", " + ".join(["1"] * 3000), "3000"),
+    ("Deep Negation", "-" * 3001 + "2", "-2"),
+    # --- 常量折叠（错误必须推迟到运行时） ---
+    ("Folded Unit Expression", "-(100km / 2hr) * 2", "-100.0km/hr"),
+    ("Folded If Condition", "if 2 > 1 { 1s } else { 2s }", "1s"),
+    ("Deferred Unit Error", "if a > 1 then 1 else 1m + 1s", "1"),
+    ("Deferred Division Error", "let z = if a < 1 then 1 / 0 else 5; z", "5"),
+    ("Else Branch in Expression", "1 + (if a < 1 then 2 else 3)", "4"),
+    # --- 函数 ---
+    (
+        "Recursive Function",
+        "let fib = fn(n) { if n < 2 then n else fib(n - 1) + fib(n - 2) }; fib(15)",
+        "610",
+    ),
+    (
+        "Function with Units",
+        "let speed = fn(d, t) { d / t }; speed(100km, 2hr)",
+        "50.0km/hr",
+    ),
+    (
+        "Locals Shadow Globals",
+        "let f = fn(a) { let b = a * 2; b + 1 }; f(5) + a",
+        "111",
+    ),
+    (
+        "Captured Locals",
+        "let scale = fn(k) { fn(x) { x * k } }; let triple = scale(3); triple(2m)",
+        "6m",
+    ),
+    ("Early Return", "let f = fn(x) { if x > 0 { return 1 }; 2 }; f(5) + f(-5)", "3"),
+    ("Empty Function", "let nothing = fn() { }; nothing()", "None"),
+    # --- 并发 ---
+    ("Spawn and Await", "let t = spawn { 100km / 2hr }; await t", "50.0km/hr"),
+    (
+        "Parallel Tasks",
+        "let x = spawn { fib(12) }; let y = spawn { fib(13) }; await x + await y",
+        "377",
+    ),
+    (
+        "Spawn Captures Locals",
+        "let twice = fn(v) { await spawn { v * 2 } }; twice(3s)",
+        "6s",
+    ),
+    # --- 管道 ---
+    ("Pipe to Function", "let double = fn(x) { x * 2 }; 4m |> double", "8m"),
+    (
+        "Pipe Into Arguments",
+        "let sub = fn(a, b) { a - b }; 10 |> sub(3) |> sub(2)",
+        "5",
+    ),
+    (
+        "Streaming Pipeline",
+        "range(10) |> map(fn(x) { x * 2m }) |> filter(fn(v) { v > 10m }) |> list",
+        "[12m, 14m, 16m, 18m]",
+    ),
+    (
+        "Pipeline Is Lazy",
+        "range(1000000000) |> map(fn(x) { x * x }) |> take(3) |> list",
+        "[0, 1, 4]",
+    ),
+    ("Pipeline Sum", "range(1, 5) |> map(fn(x) { x * 1km }) |> sum", "10km"),
+    ("Builtins Can Be Shadowed", "let count = 3; count + 1", "4"),
+    # --- 单位换算 ---
+    ("Convert on Addition", "1km + 1m", "1.001km"),
+    ("Convert on Comparison", "36km/hr > 5m/s", "True"),
+    ("Equal Across Units", "1km == 1000m", "True"),
+    ("Dimensionless Ratio", "1km / 1m", "1000.0"),
+    ("Convert Builtin", "36km/hr |> convert(m/s)", "10.0m/s"),
+    ("Unregistered Units", "3 * widget + 2 * widget", "5widget"),
+    # --- 单位推断（类型已知的运算使用专用指令） ---
+    ("Inferred Unit Division", "let d = 100km; let t = 2hr; d / t", "50.0km/hr"),
+    ("Inferred Numbers", "let x = 3; let y = 4; x * y - x / y", "11.25"),
+    (
+        "Inferred Comparison",
+        "let p = 5m; let q = 2m; if p > q then p - q else q - p",
+        "3m",
+    ),
+    ("Inferred Scaling", "let v = 2m; 3 * v / 4", "1.5m"),
+    ("Inferred Conversion", "let k = 1km; let n = 1m; k + n", "1.001km"),
+    ("Inferred Error Deferred", "let p = 1m; if a > 1 then 1 else p + 1s", "1"),
 ]
 
+# 每套用例都会在以下配置下各运行一遍
+# 格式: ("配置名称", VM 构造参数, Compiler 构造参数)
+CONFIGS = [
+    ("table dispatch", {"dispatch": "table"}, {"fold_constants": False}),
+    ("switch dispatch", {"dispatch": "switch"}, {"fold_constants": False}),
+    ("constant folding", {}, {}),
+    ("peephole optimizer", {}, {"optimize": True, "fold_constants": False}),
+    # 阈值为 1：可以翻译的用例第一次执行就走第二执行层
+    ("tiered", {"tier_threshold": 1}, {"fold_constants": False}),
+    (
+        "tiered + optimizer",
+        {"tier_threshold": 1},
+        {"optimize": True, "fold_constants": False},
+    ),
+    ("generic opcodes", {}, {"infer_units": False, "fold_constants": False}),
+    # 阈值为 1：每个算术位置第一次执行后就改写为加速指令
+    (
+        "quickened",
+        {"quicken_threshold": 1, "tier_threshold": None},
+        {"infer_units": False, "fold_constants": False},
+    ),
+]
+
+
+def tokens_of(tokens):
+    return [(token.type, token.value) for token in tokens]
+
+
+def check_bulk_lexer():
+    """批量模式与逐个令牌模式必须产生完全相同的令牌序列"""
+    sources = [code for _, code, _ in TEST_CASES]
+    sources.append('let t = 10if; fn(a) { a |> f } "s t" .5 3. @ elsex else')
+    return all(
+        tokens_of(Lexer(src).tokenize_arrays())
+        == tokens_of(Lexer(src).get_token_stream())
+        for src in sources
+    )
+
+
+POSITION_SOURCE = 'let s = "a\nb";\n  é_unit + 10if\r\n  @ x'
+
+
+# 非 ASCII 字母之后的关键字不是关键字（与 str.isalnum 的判断一致）
+UNICODE_WORD_SOURCE = "let cafée = 1;\nnaïveif éthen 3 ñelse\nπfn 中let x"
+
+
+def check_file_lexer():
+    """mmap 与分块读取两种方式都必须与字符串词法分析器给出相同的令牌和位置"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "positions.lucid")
+        for source in (POSITION_SOURCE, UNICODE_WORD_SOURCE):
+            expected = [
+                (t.type, t.value, t.line, t.column)
+                for t in Lexer(source).get_token_stream()
+            ]
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                f.write(source)
+            for chunk_size, use_mmap in [(None, True), (3, False), (1, False)]:
+                lexer = Lexer.from_file(path, chunk_size, use_mmap)
+                tokens = [
+                    (t.type, t.value, t.line, t.column)
+                    for t in lexer.get_token_stream()
+                ]
+                if tokens != expected:
+                    return False
+        return True
+
+
+def check_unterminated_file_string():
+    """未闭合的字符串在引号处报错；分块读取时缓存的字符串长度有上限"""
+    errors = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "unterminated.lucid")
+        with open(path, "w") as f:
+            f.write('let a = 1;\n  "abc\n' + "x + 1; " * 2000)
+        for chunk_size, use_mmap, limit in [
+            (None, True, None),
+            (3, False, None),
+            (64, False, None),
+            (64, False, 100),
+        ]:
+            lexer = Lexer.from_file(path, chunk_size, use_mmap)
+            if limit is not None:
+                lexer.max_string_length = limit
+            try:
+                list(lexer.get_token_stream())
+            except SyntaxError as e:
+                errors.append(str(e))
+    return errors
+
+
+def token_positions(source):
+    return [(t.value, t.line, t.column) for t in Lexer(source).get_token_stream()]
+
+
+def check_serialization_round_trip():
+    """所有用例经过 dump/load 之后，运行结果必须与直接编译的结果一致"""
+    mismatches = []
+    for options in ({}, {"optimize": True}, {"fold_constants": False}):
+        direct_vm, loaded_vm = VM(), VM()
+        for desc, code, _ in TEST_CASES:
+            chunk = Compiler(**options).compile(Parser(Lexer(code)).parse())
+            data = dump_chunk(chunk)
+            loaded = load_chunk(data)
+            if (
+                repr(run_chunk(direct_vm, chunk)) != repr(run_chunk(loaded_vm, loaded))
+                or dump_chunk(loaded) != data
+            ):
+                mismatches.append(desc)
+    return mismatches
+
+
+def run_chunk(vm, chunk):
+    try:
+        return vm.interpret(chunk)
+    except Exception as e:
+        return f"ERROR: {e}"
+
+
+def check_bytecode_cache():
+    """第二次编译命中缓存；损坏的缓存文件被视为未命中并重新生成"""
+    source = "let d = 100km; d / 2hr"
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = BytecodeCache(tmp)
+        results = [VM().interpret(cache.compile_source(source)) for _ in range(2)]
+        for name in os.listdir(tmp):
+            with open(os.path.join(tmp, name), "wb") as f:
+                f.write(b"LUCIDC\0garbage")
+        results.append(VM().interpret(cache.compile_source(source)))
+        results.append(VM().interpret(BytecodeCache(tmp).compile_source(source)))
+        return results, cache.hits, cache.misses
+
+
+def check_cache_compiler_options():
+    """推断与严格检查选项不同的编译器不共用缓存；严格编译不会读到未检查的字节码"""
+    with tempfile.TemporaryDirectory() as tmp:
+        BytecodeCache(tmp).compile_source(INFERENCE_SOURCE)
+        plain = BytecodeCache(tmp, Compiler(infer_units=False))
+        plain.compile_source(INFERENCE_SOURCE)
+        strict = BytecodeCache(tmp, Compiler(strict_units=True))
+        try:
+            strict.compile_source(INFERENCE_SOURCE)
+            error = None
+        except TypeError as e:
+            error = type(e).__name__
+        return plain.misses, strict.misses, error, len(os.listdir(tmp))
+
+
+def stale_chunk_bytes():
+    """把头部的编译器版本改为 0，模拟旧版本编译器生成的缓存"""
+    data = dump_chunk(Compiler().compile(Parser(Lexer("1")).parse()))
+    return data[:9] + b"\0\0" + data[11:]
+
 
-def run_lucid_code(source_code, vm_instance):
+ARRAY_SOURCES = [
+    "d / t",
+    "d + 1km",
+    "-d * 2",
+    "(d / 1km)^2",
+    "d >= 200km",
+    "200km != d",
+    "d / t > 60km/hr",
+    "d - 500m",
+    "d / t < 20m/s",
+    "d + 1s",
+    "d / (t - t)",
+]
+
+
+def check_unit_conversion():
+    """量纲不同的运算仍然报错；注册的新单位可以与已有单位换算"""
+    register_unit("furlong", {"m": 1}, 201.168)
+    try:
+        vm = VM()
+        sources = [
+            "1km + 1s",
+            "1m > 1kg",
+            "convert(1m, 1s)",
+            "1furlong |> convert(m)",
+            "1furlong > 200m",
+        ]
+        results = [run_chunk(vm, compile_source(source)) for source in sources]
+    finally:
+        unregister_unit("furlong")
+    # 注销之后 furlong 又只与同名单位兼容
+    results.append(run_chunk(VM(), compile_source("1furlong > 200m")))
+    return results
+
+
+def check_registry_change():
+    """
+    注册或注销单位后，之前编译（或序列化）的类型专用指令退回通用指令，
+    结果与按新的注册表执行一致；缓存键随注册表变化
+    """
+    before = compile_source("let a = 2furlong; let b = 1m; a / b")
+    key = BytecodeCache("cache").key("digest")
+    register_unit("furlong", {"m": 1}, 201.168)
+    try:
+        registered = run_chunk(VM(), before)
+        after = compile_source("let x = 1furlong; let y = 1m; let q = x / y; q * 2")
+        data = dump_chunk(after)
+        changed_key = BytecodeCache("cache").key("digest") != key
+    finally:
+        unregister_unit("furlong")
+    return (
+        registered,
+        run_chunk(VM(), after),
+        run_chunk(VM(), load_chunk(data)),
+        changed_key,
+        BytecodeCache("cache").key("digest") == key,
+    )
+
+
+def check_unit_arrays(dispatch):
+    """以 UnitArray 绑定全局变量时，每个元素的结果与逐个标量求值一致"""
+    distances, hours = [100.0, 200.0, 300.0], [1, 2, 4]
+    vm = VM(dispatch=dispatch)
+    vm.globals["d"] = UnitArray(distances, "km")
+    vm.globals["t"] = UnitArray(hours, "hr")
+    results = []
+    for source in ARRAY_SOURCES:
+        chunk = Compiler().compile(Parser(Lexer(source)).parse())
+        array_result = run_chunk(vm, chunk)
+        if isinstance(array_result, str):
+            results.append(array_result)
+            continue
+        scalar_vm = VM(dispatch=dispatch)
+        scalar_results = []
+        for distance, hour in zip(distances, hours):
+            scalar_vm.globals["d"] = UnitValue(distance, vm.globals["d"].unit)
+            scalar_vm.globals["t"] = UnitValue(hour, vm.globals["t"].unit)
+            scalar_results.append(scalar_vm.interpret(chunk))
+        results.append(list(array_result) == scalar_results)
+    return results
+
+
+BATCH_SOURCE = "let v = d / t; if v > limit then v else 0"
+BATCH_ROWS = [
+    {"d": 10, "t": 2},
+    {"d": 1, "t": 0},
+    {"d": 9, "t": 3, "unused": 1},
+    {"t": 1},
+    {"d": 30, "t": 3, "limit": 20},
+]
+
+
+def check_batch_columns():
+    evaluator = BatchEvaluator.from_source("a * b + c", globals={"c": 1})
+    columns = {"a": [1, 2, 3], "unused": [0, 0, 0], "b": [4, 5, 6]}
+    return list(evaluator.evaluate_columns(columns))
+
+
+SPAWN_SOURCE = """
+let fib = fn(n) { if n < 2 then n else fib(n - 1) + fib(n - 2) };
+let base = 10m;
+let tasks = spawn { fib(10) * base };
+await tasks + await spawn { base * 2 }
+"""
+
+
+def run_with_executor(executor, source):
+    vm = VM(executor=executor)
+    try:
+        return run_chunk(vm, Compiler().compile(Parser(Lexer(source)).parse()))
+    finally:
+        vm.shutdown()
+
+
+GREEN_TASKS_SOURCE = """
+let fib = fn(n) { if n < 2 then n else fib(n - 1) + fib(n - 2) };
+let all = fn(n) {
+    if n == 0 then 0 else {
+        let t = spawn { fib(8) };
+        let rest = all(n - 1);
+        rest + await t
+    }
+};
+all(2000)
+"""
+
+
+def run_async_source(source):
+    """在事件循环中执行 source，同时确认另一个协程在此期间得到了调度"""
+    result, ticks = run_async_ticks(source)
+    return result, ticks > 1
+
+
+def run_async_ticks(source, budget=DEFAULT_BUDGET):
+    """在事件循环中执行 source，返回结果与另一个协程在此期间被调度的次数"""
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        chunk = Compiler().compile(Parser(Lexer(source)).parse())
+        task = asyncio.ensure_future(ticker())
+        try:
+            result = await VM().run_async(chunk, budget)
+        finally:
+            task.cancel()
+        return result, ticks
+
+    return asyncio.run(main())
+
+
+def check_spawn_budget():
+    """spawn 出的绿色任务沿用 run_async 的预算：预算越小，让出调度器越频繁"""
+    source = (
+        "let fib = fn(n) { if n < 2 then n else fib(n - 1) + fib(n - 2) }; "
+        "await spawn { fib(12) }"
+    )
+    result, default_ticks = run_async_ticks(source)
+    _, small_ticks = run_async_ticks(source, budget=50)
+    return result, small_ticks > 5 * default_ticks
+
+
+def check_profile():
+    source = "let f = fn(x) { x * 2m }; f(1) + f(2)"
+    vm = VM(profile=True)
+    run_chunk(vm, Compiler().compile(Parser(Lexer(source)).parse()))
+    report = json.loads(vm.profile.to_json())
+    return (
+        report["instructions"],
+        report["opcodes"]["OP_CALL"]["count"],
+        report["stack_high_water"],
+        report["frames_high_water"],
+        report["allocations"]["UnitValue"],
+        report["hot_instructions"][0]["chunk"] in ("<script>", "<Function f 1 args>"),
+    )
+
+
+def check_profile_threads():
+    """spawn 到线程池中的任务的分配不计入剖析；剖析不能使用 switch 引擎"""
+    source = (
+        "let f = fn(x) { x * 2m * 3s }; "
+        "await spawn { f(1) + f(2) + f(3) } / 1s"
+    )
+    vm = VM(profile=True, executor="thread")
+    try:
+        result = run_chunk(vm, compile_source(source))
+    finally:
+        vm.shutdown()
+    try:
+        VM(profile=True, dispatch="switch")
+        error = None
+    except ValueError as e:
+        error = str(e)
+    return result, vm.profile.allocations, error
+
+
+def check_session():
+    session = Session()
+    results = [
+        session.execute(line)
+        for line in ("let v = 100km / 2hr", "let t = 3hr", "v * t", "v * t")
+    ]
+    first, again = session.compile("v * t"), session.compile("v * t")
+    return results, first is again, first.constants is session.root.constants
+
+
+def check_serve():
+    output = StringIO()
+    serve(StringIO("let k = 2\n\n1 / 0\nk * 3m\n"), output)
+    return output.getvalue()
+
+
+def check_tier_up():
+    """越过阈值前后结果一致；翻译后的函数给出与 VM 相同的错误"""
+    chunk = Compiler().compile(Parser(Lexer("distance / duration")).parse())
+    vm, results = VM(tier_threshold=3), []
+    for i in range(6):
+        vm.globals["distance"] = UnitValue(i * 10, Unit.named("m"))
+        vm.globals["duration"] = UnitValue(i % 4, Unit.named("s"))
+        results.append(run_chunk(vm, chunk))
+    return results
+
+
+def compile_source(source):
+    return Compiler().compile(Parser(Lexer(source)).parse())
+
+
+def check_fused_specialized_comparisons():
+    """单位推断生成的比较与 OP_NOT 同样被窥孔优化器融合为一条指令"""
+    results = []
+    for source in ("1 >= 2", "1 <= 2", "2m >= 3m", "2m <= 3m"):
+        chunk = Compiler(optimize=True, fold_constants=False).compile(
+            Parser(Lexer(source)).parse()
+        )
+        names = [OpCode(ins.opcode).name for ins in decode(chunk)]
+        results.append((names[-2], run_chunk(VM(), chunk)))
+    return results
+
+
+QUICKEN_SOURCE = "let v = d / t; if v > limit then v - limit else limit - v"
+
+
+def disassembly(chunk):
+    output = StringIO()
+    with redirect_stdout(output):
+        disassemble_chunk(chunk, "quicken")
+    return output.getvalue()
+
+
+def check_quickening():
+    """
+    全局变量的类型稳定时指令被原地加速，类型改变时退回通用路径；
+    反汇编与序列化结果始终与加速前相同
+    """
+    chunk = compile_source(QUICKEN_SOURCE)
+    original, listing = bytes(chunk.code), disassembly(chunk)
+    vm = VM(quicken_threshold=2, tier_threshold=None)
+    rows = [(10, 4, 1), (9, 3, 5), (8, 2, 1)]
+    km, hr = Unit.named("km"), Unit.named("hr")
+    rows += [
+        (UnitValue(d, km), UnitValue(t, hr), UnitValue(1, km.divide(hr)))
+        for d, t in ((100, 2), (30, 1), (20, 4))
+    ]
+    results = []
+    for d, t, limit in rows:
+        vm.globals.update({"d": d, "t": t, "limit": limit})
+        results.append(vm.interpret(chunk))
+    quickened = bytes(chunk.code) != original
+    return (
+        results,
+        quickened,
+        disassembly(chunk) == listing,
+        dump_chunk(chunk) == dump_chunk(load_chunk(dump_chunk(chunk))),
+        bytes(load_chunk(dump_chunk(chunk)).code) == original,
+    )
+
+
+INFERENCE_SOURCE = """let d = 10m
+let t = 2s
+let n = 0
+if d / t > 1m/s then d + t else d / n"""
+
+
+def check_deep_if():
+    """
+    6000 层嵌套的 if（直接构造 AST，超过 Python 的递归深度）：
+    超过 64KB 的外层跳转原地加宽，内层仍是短跳转
+    """
+
+    def expression(source):
+        return Parser(Lexer(source)).parse().statements[0]
+
+    node = expression("7")
+    for i in range(6000):
+        node = IfExpression(expression("x > 1"), node, expression(str(i)))
+    program = BlockStatement()
+    program.statements = [expression("let x = 2"), node]
+    chunk = Compiler().compile(program)
+    names = {OpCode(ins.opcode).name for ins in decode(chunk)}
+    long_jump, short_jump = "OP_JUMP_IF_FALSE_LONG", "OP_JUMP_IF_FALSE"
+    return run_chunk(VM(), chunk), long_jump in names, short_jump in names
+
+
+def check_unit_inference():
+    """诊断信息、专用指令，以及专用指令的运行时错误与通用指令一致"""
+    compiler = Compiler()
+    chunk = compiler.compile(Parser(Lexer(INFERENCE_SOURCE)).parse())
+    names = [
+        OpCode(ins.opcode).name
+        for ins in decode(chunk)
+        if ins.opcode in GENERIC_FORMS
+    ]
+    try:
+        Compiler(strict_units=True).compile(Parser(Lexer(INFERENCE_SOURCE)).parse())
+        strict = None
+    except TypeError as e:
+        strict = str(e)
+    zero = run_chunk(VM(), compile_source("let z = 0; let w = 3m; w / z"))
+    return compiler.diagnostics, names, strict, zero
+
+
+# 针对 Python 接口的检查
+# 格式: ("描述", 无参可调用对象, "期望的 repr() 输出")
+API_TESTS = [
+    ("Bulk Lexer Matches Stream", check_bulk_lexer, "True"),
+    ("File Lexer Matches Text", check_file_lexer, "True"),
+    (
+        "File Lexer Unterminated String",
+        check_unterminated_file_string,
+        repr(
+            ["Lexer Error: Unterminated string at line 2, column 3."] * 3
+            + ["Lexer Error: String longer than 100 bytes at line 2, column 3."]
+        ),
+    ),
+    (
+        "Token Positions",
+        lambda: token_positions('1 +\n  "x\ny" x'),
+        "[(1, 1, 1), ('+', 1, 3), ('x\\ny', 2, 3), ('x', 3, 4), (None, 3, 5)]",
+    ),
+    ("Serialization Round Trip", check_serialization_round_trip, "[]"),
+    (
+        "Bytecode Cache",
+        check_bytecode_cache,
+        "([50.0km/hr, 50.0km/hr, 50.0km/hr, 50.0km/hr], 1, 2)",
+    ),
+    (
+        "Cache Keys Compiler Options",
+        check_cache_compiler_options,
+        "(1, 1, 'TypeError', 2)",
+    ),
+    (
+        "Rejects Other Compiler",
+        lambda: load_chunk(stale_chunk_bytes()),
+        "ERROR: ValueError('Bytecode was compiled by compiler version 0, "
+        f"expected {COMPILER_VERSION}.')",
+    ),
+]
+
+API_TESTS += [
+    (
+        "Batch Rows",
+        lambda: evaluate_batch(BATCH_SOURCE, BATCH_ROWS, globals={"limit": 2}),
+        "[5.0, Err('Division by zero.'), 3.0, "
+        "Err('Cannot compare values with different units.'), 0]",
+    ),
+    (
+        "Batch Matches Parallel",
+        lambda: evaluate_batch(BATCH_SOURCE, BATCH_ROWS, globals={"limit": 2})
+        == evaluate_batch(BATCH_SOURCE, BATCH_ROWS, 2, globals={"limit": 2}),
+        "True",
+    ),
+    ("Batch Columns", check_batch_columns, "[5, 11, 19]"),
+    ("Spawn on Thread Pool", lambda: run_with_executor("thread", SPAWN_SOURCE), "570m"),
+    (
+        "Spawn on Process Pool",
+        lambda: run_with_executor("process", SPAWN_SOURCE),
+        "570m",
+    ),
+    (
+        "Process Task Error",
+        lambda: run_with_executor("process", "await spawn { 1 / 0 }"),
+        "'ERROR: Division by zero.'",
+    ),
+    ("Session", check_session, "([None, None, 150.0km, 150.0km], True, True)"),
+    ("Quiet Serve", check_serve, "'\\nError: Division by zero.\\n6m\\n'"),
+    (
+        "Tier Up",
+        check_tier_up,
+        "['ERROR: Division by zero.', 10.0m/s, 10.0m/s, 10.0m/s, "
+        "'ERROR: Division by zero.', 50.0m/s]",
+    ),
+    (
+        "Tier Fallback",
+        lambda: translate_chunk(compile_source("let f = fn(x) { x }; f(1)")),
+        "ERROR: ValueError('OP_CLOSURE is not supported')",
+    ),
+    (
+        "Unit Conversion",
+        check_unit_conversion,
+        "['ERROR: Incompatible units for addition.', "
+        "'ERROR: Cannot compare values with different units.', "
+        "'ERROR: Cannot convert m to s.', 201.168m, True, "
+        "'ERROR: Cannot compare values with different units.']",
+    ),
+    (
+        "Registry Change Generalizes",
+        check_registry_change,
+        "(402.336, 2.0furlong/m, 2.0furlong/m, True, True)",
+    ),
+    (
+        "Unit Inference",
+        check_unit_inference,
+        "(['Incompatible units for addition: m and s at line 4, column 24'], "
+        "['OP_DIVIDE_UNIT', 'OP_DIVIDE_UNIT_NUMBER'], "
+        "'Incompatible units for addition: m and s at line 4, column 24', "
+        "'ERROR: Division by zero.')",
+    ),
+    (
+        "Quickening",
+        check_quickening,
+        "([1.5, 2.0, 3.0, 49.0km/hr, 29.0km/hr, 4.0km/hr], True, True, True, True)",
+    ),
+    (
+        "Fused Specialized Comparisons",
+        check_fused_specialized_comparisons,
+        "[('OP_GREATER_EQUAL_NUMBER', False), ('OP_LESS_EQUAL_NUMBER', True), "
+        "('OP_GREATER_EQUAL_UNIT', False), ('OP_LESS_EQUAL_UNIT', True)]",
+    ),
+    ("Deep If Nesting", check_deep_if, "(7, True, True)"),
+    (
+        "Profile Ignores Other Threads",
+        check_profile_threads,
+        "(36.0m, {'UnitValue': 2, 'Unit': 0}, "
+        "'Profiling requires the table dispatch.')",
+    ),
+    ("Profile Report", check_profile, "(22, 2, 6, 2, 5, True)"),
+    ("Green Tasks", lambda: run_async_source(GREEN_TASKS_SOURCE), "(42000, True)"),
+    (
+        "Green Task Chain",
+        lambda: run_async_source(
+            "let a = spawn { 2m }; let b = spawn { (await a) * 3 }; await b"
+        ),
+        "(6m, True)",
+    ),
+    ("Spawned Task Budget", check_spawn_budget, "(144, True)"),
+    (
+        "Green Task Error",
+        lambda: run_async_source("await spawn { 1 / 0 }"),
+        "ERROR: ZeroDivisionError('Division by zero.')",
+    ),
+]
+
+if np is not None:
+    ARRAY_EXPECTED = (
+        "[True, True, True, True, True, True, True, True, True, "
+        "'ERROR: Incompatible units for addition.', 'ERROR: Division by zero.']"
+    )
+    API_TESTS += [
+        ("Unit Arrays (table)", lambda: check_unit_arrays("table"), ARRAY_EXPECTED),
+        ("Unit Arrays (switch)", lambda: check_unit_arrays("switch"), ARRAY_EXPECTED),
+        (
+            "Unit Array Repr",
+            lambda: UnitArray([1.5, 3.0], "m") / UnitValue(2, Unit.named("s")),
+            "[0.75, 1.5 ]m/s",
+        ),
+    ]
+
+
+def run_lucid_code(source_code, vm_instance, compiler_options=None):
     """
     一个辅助函数，用于执行完整的 Lucid 代码处理流程。
     现在它接收一个 VM 实例以保持会话状态。
@@ -55,7 +817,7 @@ def run_lucid_code(source_code, vm_instance):
         parser = Parser(lexer)
         ast = parser.parse()
 
-        compiler = Compiler()
+        compiler = Compiler(**(compiler_options or {}))
         chunk = compiler.compile(ast)
 
         result_value = vm_instance.interpret(chunk)
@@ -75,21 +837,41 @@ def main():
     passed = 0
     failed = 0
 
-    # 为整个测试过程创建一个独立的VM实例
-    vm = VM()
+    for config_name, vm_options, compiler_options in CONFIGS:
+        print(f"--- {config_name} ---")
 
-    for i, (desc, code, expected_repr) in enumerate(TEST_CASES):
-        print(f"[{i+1:02d}] Running test: {desc:<25}", end="")
+        # 为每套配置创建一个独立的VM实例
+        vm = VM(**vm_options)
+
+        for i, (desc, code, expected_repr) in enumerate(TEST_CASES):
+            print(f"[{i+1:02d}] Running test: {desc:<25}", end="")
 
-        actual_result = run_lucid_code(code, vm)
-        actual_repr = repr(actual_result)
+            actual_result = run_lucid_code(code, vm, compiler_options)
+            actual_repr = repr(actual_result)
+
+            if actual_repr == expected_repr:
+                print("✅ PASS")
+                passed += 1
+            else:
+                print("❌ FAIL")
+                print(f"      Code:     {code}")
+                print(f"      Expected: {expected_repr}")
+                print(f"      Got:      {actual_repr}")
+                failed += 1
+
+    print("--- python api ---")
+    for i, (desc, check, expected_repr) in enumerate(API_TESTS):
+        print(f"[{i+1:02d}] Running test: {desc:<25}", end="")
+        try:
+            actual_repr = repr(check())
+        except Exception as e:
+            actual_repr = f"ERROR: {e!r}"
 
         if actual_repr == expected_repr:
             print("✅ PASS")
             passed += 1
         else:
             print("❌ FAIL")
-            print(f"      Code:     {code}")
             print(f"      Expected: {expected_repr}")
             print(f"      Got:      {actual_repr}")
             failed += 1
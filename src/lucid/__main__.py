@@ -1,21 +1,53 @@
 # src/lucid/__main__.py
-from .lexer import Lexer
-from .parser import Parser
-from .compiler import Compiler
-from .vm import VM, VMResult
-from .debug import disassemble_chunk  # 导入我们的新工具
+import argparse
+import os
+import sys
 
-# 添加一个调试开关
-DEBUG = True
+from .cache import BytecodeCache
+from .session import Session
+from .vm import VM
 
+# 调试开关：为 True 时 REPL 反汇编每一行新编译的输入（也可以用 --debug 打开）
+DEBUG = False
 
-def main():
+
+def run_file(path):
+    """
+    执行一个源文件。编译结果缓存在源文件旁的 __lucidcache__ 目录中，
+    源码未变化时直接加载字节码；未命中时文件通过 mmap 流式词法分析。
+    """
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), "__lucidcache__")
+    chunk = BytecodeCache(cache_dir).compile_file(path)
+    result = VM().interpret(chunk)
+    if result is not None:
+        print(result)
+
+
+def serve(input_stream, output_stream):
+    """
+    安静模式：每行输入是一个请求，每个请求输出一行结果（或 Error: ...），
+    没有提示符与横幅，适合作为管道另一端的计算服务。
+    """
+    session = Session()
+    for line in input_stream:
+        text = line.strip()
+        if not text:
+            continue
+        try:
+            result = session.execute(text)
+            output_stream.write(f"{'' if result is None else result}\n")
+        except Exception as e:
+            output_stream.write(f"Error: {e}\n")
+        output_stream.flush()
+
+
+def repl(debug=DEBUG):
     # ...
     print("Lucid Language v4.0 - Now powered by a Bytecode VM!")
     print("Enter 'exit' to quit.")
 
-    compiler = Compiler()
-    vm = VM()
+    # 会话在各行输入之间保留常量池、全局变量与编译缓存
+    session = Session(debug=debug)
 
     while True:
         try:
@@ -25,21 +57,14 @@ def main():
             if not text.strip():
                 continue
 
-            lexer = Lexer(text)
-            parser = Parser(lexer)
-            ast = parser.parse()
-
-            chunk = compiler.compile(ast)
-
-            if not chunk:
-                print("Compile Error.")
-                continue
-
-            if DEBUG:
-                disassemble_chunk(chunk, "Debug Chunk")
-
-            result = vm.interpret(chunk)
+            result = session.execute(text)
+            for diagnostic in session.diagnostics:
+                print(f"Warning: {diagnostic}")
+            if result is not None:
+                print(result)
 
+        except EOFError:
+            break
         except (
             SyntaxError,
             NameError,
@@ -52,5 +77,24 @@ def main():
             print(f"An unexpected error occurred: {e}")
 
 
+def main():
+    arg_parser = argparse.ArgumentParser(prog="lucid")
+    arg_parser.add_argument("file", nargs="?")
+    arg_parser.add_argument(
+        "--quiet", action="store_true", help="read requests from stdin, one per line"
+    )
+    arg_parser.add_argument(
+        "--debug", action="store_true", help="disassemble each input"
+    )
+    args = arg_parser.parse_args()
+
+    if args.file:
+        run_file(args.file)
+    elif args.quiet:
+        serve(sys.stdin, sys.stdout)
+    else:
+        repl(debug=args.debug or DEBUG)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,188 @@
+# src/lucid/arrays.py
+"""
+数组值的单位类型。
+
+UnitArray 保存一个 NumPy 数组和一个 Unit，单位检查在每次运算时只做一次，
+数值部分整体交给 NumPy 逐元素计算。它遵循与 UnitValue 相同的单位规则
+（见 operations.py），可以与普通数字、UnitValue 以及其他 UnitArray 混合运算；
+量纲相同而单位不同时，换算只在整个数组上乘一次系数。
+比较运算返回无量纲的布尔 UnitArray。
+
+NumPy 是可选依赖：未安装时本模块仍可导入，只是无法创建 UnitArray。
+
+嵌入方用法:
+    vm.globals["distance"] = UnitArray(column, "m")
+"""
+from .runtime_types import DIMENSIONLESS, Unit, UnitValue
+
+try:
+    import numpy as np
+except ImportError:  # numpy 是可选依赖
+    np = None
+
+
+class UnitArray:
+    __slots__ = ("values", "unit")
+
+    # 逐元素的 == 返回数组，因此不可哈希
+    __hash__ = None
+    # 让 ndarray 与 UnitArray 混合运算时由 UnitArray 的反射方法处理单位
+    __array_ufunc__ = None
+
+    def __init__(self, values, unit_obj=DIMENSIONLESS):
+        if np is None:
+            raise ImportError("UnitArray requires numpy.")
+        if isinstance(unit_obj, str):
+            unit_obj = Unit.named(unit_obj)
+        self.values, self.unit = np.asarray(values), unit_obj
+
+    @classmethod
+    def _wrap(cls, values, unit_obj):
+        # 运算结果已经是 ndarray，跳过 asarray 与单位名解析
+        array = object.__new__(cls)
+        array.values, array.unit = values, unit_obj
+        return array
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        value = self.values[index]
+        if isinstance(value, np.ndarray):
+            return UnitArray._wrap(value, self.unit)
+        value = value.item()
+        return value if self.unit.dimensionless else UnitValue(value, self.unit)
+
+    def __repr__(self):
+        values = np.array2string(self.values, separator=", ")
+        return values if self.unit.dimensionless else f"{values}{self.unit}"
+
+    # --- 算术 ---
+    def __add__(self, other):
+        a, b, unit = _matching(self, other, "Incompatible units for addition.")
+        return UnitArray._wrap(a + b, unit)
+
+    def __radd__(self, other):
+        a, b, unit = _matching(other, self, "Incompatible units for addition.")
+        return UnitArray._wrap(a + b, unit)
+
+    def __sub__(self, other):
+        a, b, unit = _matching(self, other, "Incompatible units for subtraction.")
+        return UnitArray._wrap(a - b, unit)
+
+    def __rsub__(self, other):
+        a, b, unit = _matching(other, self, "Incompatible units for subtraction.")
+        return UnitArray._wrap(a - b, unit)
+
+    def __mul__(self, other):
+        return _multiply(self, other)
+
+    def __rmul__(self, other):
+        return _multiply(other, self)
+
+    def __truediv__(self, other):
+        return _divide(self, other)
+
+    def __rtruediv__(self, other):
+        return _divide(other, self)
+
+    def __pow__(self, other):
+        return _power(self, other)
+
+    def __rpow__(self, other):
+        return _power(other, self)
+
+    def __neg__(self):
+        return UnitArray._wrap(-self.values, self.unit)
+
+    # --- 比较（逐元素） ---
+    def __eq__(self, other):
+        (a, unit_a), (b, unit_b) = _parts(self), _parts(other)
+        # 量纲不同的值永远不相等，与 UnitValue.__eq__ 一致
+        ratio = unit_a.ratio(unit_b)
+        if ratio is None:
+            equal = np.zeros(np.broadcast(a, b).shape, dtype=bool)
+        else:
+            equal = np.equal(a, b if ratio == 1 else np.multiply(b, ratio))
+        return UnitArray._wrap(equal, DIMENSIONLESS)
+
+    def __ne__(self, other):
+        different = np.logical_not(self.__eq__(other).values)
+        return UnitArray._wrap(different, DIMENSIONLESS)
+
+    def logical_not(self):
+        """逐元素的 OP_NOT"""
+        return UnitArray._wrap(np.logical_not(self.values), DIMENSIONLESS)
+
+    def __gt__(self, other):
+        return _compare(np.greater, self, other)
+
+    def __lt__(self, other):
+        return _compare(np.less, self, other)
+
+    def __ge__(self, other):
+        return _compare(np.greater_equal, self, other)
+
+    def __le__(self, other):
+        return _compare(np.less_equal, self, other)
+
+
+def _parts(value):
+    kind = type(value)
+    if kind is UnitArray:
+        return value.values, value.unit
+    if kind is UnitValue:
+        return value.value, value.unit
+    return value, DIMENSIONLESS
+
+
+def _matching(a, b, message):
+    (value_a, unit_a), (value_b, unit_b) = _parts(a), _parts(b)
+    if unit_a is not unit_b:
+        ratio = unit_a.ratio(unit_b)
+        if ratio is None:
+            raise TypeError(message)
+        value_b = np.multiply(value_b, ratio)
+    return value_a, value_b, unit_a
+
+
+def _product(values, unit):
+    # 与 operations.make_value 一致：km/m 这类量纲为零的单位乘上系数后变为无量纲
+    if unit.scale is None or unit.dimensionless:
+        return UnitArray._wrap(values, unit)
+    return UnitArray._wrap(np.multiply(values, unit.scale), DIMENSIONLESS)
+
+
+def _multiply(a, b):
+    (value_a, unit_a), (value_b, unit_b) = _parts(a), _parts(b)
+    return _product(np.multiply(value_a, value_b), unit_a.multiply(unit_b))
+
+
+def _divide(a, b):
+    (value_a, unit_a), (value_b, unit_b) = _parts(a), _parts(b)
+    if np.any(np.equal(value_b, 0)):
+        raise ZeroDivisionError("Division by zero.")
+    return _product(np.true_divide(value_a, value_b), unit_a.divide(unit_b))
+
+
+def _power(a, b):
+    (value_a, unit_a), (value_b, unit_b) = _parts(a), _parts(b)
+    if not unit_b.dimensionless:
+        raise TypeError("Exponent must be a scalar.")
+    if unit_a.dimensionless:
+        unit = DIMENSIONLESS
+    elif type(b) is UnitArray:
+        # 逐元素不同的指数无法得到同一个单位
+        raise TypeError("Exponent must be a scalar.")
+    else:
+        unit = unit_a.power(value_b)
+    return _product(np.power(value_a, value_b), unit)
+
+
+def _compare(ufunc, a, b):
+    (value_a, unit_a), (value_b, unit_b) = _parts(a), _parts(b)
+    if unit_a is not unit_b:
+        value_a, value_b, _ = _matching(
+            a, b, "Cannot compare values with different units."
+        )
+    return UnitArray._wrap(ufunc(value_a, value_b), DIMENSIONLESS)
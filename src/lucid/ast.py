@@ -1,41 +1,56 @@
 # src/lucid/ast.py
 class ASTNode:
-    pass
+    # 所有节点都使用 __slots__，避免每个实例携带一个 __dict__
+    __slots__ = ()
 
 
 # ... (BinOp, UnaryOp, Num, etc. remain the same) ...
 class BinOp(ASTNode):
+    __slots__ = ("left", "op", "right")
+
     def __init__(self, left, op_token, right):
         self.left, self.op, self.right = left, op_token, right
 
 
 class UnaryOp(ASTNode):
+    __slots__ = ("op", "expr")
+
     def __init__(self, op_token, expr):
         self.op, self.expr = op_token, expr
 
 
 class Num(ASTNode):
+    __slots__ = ("token", "value")
+
     def __init__(self, token):
         self.token, self.value = token, token.value
 
 
 class UnitNumber(ASTNode):
+    __slots__ = ("token", "value", "unit_token", "unit")
+
     def __init__(self, number_token, unit_token):
         self.token, self.value = number_token, number_token.value
         self.unit_token, self.unit = unit_token, unit_token.value
 
 
 class Boolean(ASTNode):
+    __slots__ = ("token", "value")
+
     def __init__(self, token):
         self.token, self.value = token, token.value
 
 
 class StringLiteral(ASTNode):
+    __slots__ = ("token", "value")
+
     def __init__(self, token):
         self.token, self.value = token, token.value
 
 
 class IfExpression(ASTNode):
+    __slots__ = ("condition", "then_branch", "else_branch")
+
     def __init__(self, condition, then_branch, else_branch):
         self.condition, self.then_branch, self.else_branch = (
             condition,
@@ -45,6 +60,8 @@ class IfExpression(ASTNode):
 
 
 class VarAssign(ASTNode):
+    __slots__ = ("var_token", "var_name", "value_node")
+
     def __init__(self, var_token, value_node):
         self.var_token, self.var_name, self.value_node = (
             var_token,
@@ -54,36 +71,60 @@ class VarAssign(ASTNode):
 
 
 class VarAccess(ASTNode):
+    __slots__ = ("var_token", "var_name")
+
     def __init__(self, var_token):
         self.var_token, self.var_name = var_token, var_token.value
 
 
 class BlockStatement(ASTNode):
+    __slots__ = ("statements",)
+
     def __init__(self):
         self.statements = []
 
 
 class FunctionLiteral(ASTNode):
+    __slots__ = ("parameters", "body")
+
     def __init__(self, parameters, body):
         self.parameters, self.body = parameters, body
 
 
 class CallExpression(ASTNode):
+    __slots__ = ("function", "arguments")
+
     def __init__(self, function, arguments):
         self.function, self.arguments = function, arguments
 
 
 class ReturnStatement(ASTNode):
+    __slots__ = ("return_value",)
+
     def __init__(self, return_value):
         self.return_value = return_value
 
 
 # *** NEW: Concurrency Nodes ***
 class SpawnExpression(ASTNode):
+    __slots__ = ("block",)
+
     def __init__(self, block):
         self.block = block
 
 
 class AwaitExpression(ASTNode):
+    __slots__ = ("task_expr",)
+
     def __init__(self, task_expr):
         self.task_expr = task_expr
+
+
+# *** NEW: Compile-time Nodes ***
+class Constant(ASTNode):
+    """由常量折叠生成的节点，value 是已经求值完成的运行时值"""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
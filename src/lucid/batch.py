@@ -0,0 +1,148 @@
+# src/lucid/batch.py
+"""
+一次编译、多次求值的批量接口。
+
+同一个 Chunk 对大量输入记录求值时，全局变量的链接、处理函数表等准备工作
+只做一次；每一行只需把绑定写入全局槽位并重新运行字节码。
+某一行出错不会中断整个批次，该行的结果是一个 ErrValue。
+
+用法:
+    evaluator = BatchEvaluator.from_source("distance / duration")
+    results = list(evaluator.evaluate(rows))           # rows: 可迭代的 dict
+    results = list(evaluator.evaluate_columns(cols))   # cols: {名称: 序列}
+    results = list(evaluator.evaluate_parallel(rows, processes=4))
+"""
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+from .compiler import Compiler
+from .lexer import Lexer
+from .parser import Parser
+from .runtime_types import ErrValue
+from .vm import _UNDEFINED, VM, VMResult
+
+DEFAULT_PARALLEL_CHUNK_SIZE = 1024
+
+
+class BatchEvaluator:
+    """
+    对一个编译好的 chunk 按行求值。
+    globals 为所有行共享的绑定，行中的同名绑定会覆盖它；
+    每一行开始时，上一行的绑定与 let 定义都会被清除。
+    """
+
+    def __init__(self, chunk, globals=None, dispatch="table"):
+        self.chunk = chunk
+        self.globals = dict(globals or {})
+        self.dispatch = dispatch
+        self.vm = VM(dispatch=dispatch)
+        # 这个 VM 只执行本 chunk，链接与执行引擎的选择只做一次
+        vm = self.vm
+        self._slot_map = vm._link(chunk)
+        self._execute = vm._run_table if dispatch == "table" else vm._run_switch
+        self._slots = dict(zip(chunk.global_names, self._slot_map))
+        self._initial = [
+            (slot, self.globals.get(name, _UNDEFINED))
+            for name, slot in self._slots.items()
+        ]
+
+    @classmethod
+    def from_source(cls, source, compiler=None, **options):
+        chunk = (compiler or Compiler()).compile(Parser(Lexer(source)).parse())
+        return cls(chunk, **options)
+
+    def evaluate(self, rows):
+        """rows 中每一项是一个 {名称: 值} 的映射，逐行产出结果"""
+        slots = self._slots
+        values = self.vm._global_values
+        for row in rows:
+            self._reset()
+            for name, value in row.items():
+                slot = slots.get(name)
+                if slot is not None:
+                    values[slot] = value
+            yield self._run()
+
+    def evaluate_columns(self, columns):
+        """columns 为 {名称: 等长序列}，按列对齐的第 i 个元素组成第 i 行"""
+        # 未被 chunk 引用的列不绑定，但仍参与对齐以确定行数
+        bound = [(i, self._slots.get(name)) for i, name in enumerate(columns)]
+        bound = [(i, slot) for i, slot in bound if slot is not None]
+        values = self.vm._global_values
+        for row in zip(*columns.values()):
+            self._reset()
+            for i, slot in bound:
+                values[slot] = row[i]
+            yield self._run()
+
+    def evaluate_parallel(self, rows, processes=None, chunksize=None):
+        """
+        在进程池中求值。rows 按 chunksize 行切片后分发给工作进程，
+        结果按输入顺序产出；chunk 与共享绑定在每个工作进程中只传递一次。
+        """
+        chunksize = chunksize or DEFAULT_PARALLEL_CHUNK_SIZE
+        rows = iter(rows)
+        slices = iter(lambda: list(itertools.islice(rows, chunksize)), [])
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            initializer=_init_worker,
+            initargs=(self.chunk, self.globals, self.dispatch),
+        ) as pool:
+            for results in pool.map(_evaluate_slice, slices):
+                yield from results
+
+    def _reset(self):
+        values = self.vm._global_values
+        for slot, value in self._initial:
+            values[slot] = value
+
+    def _run(self):
+        vm = self.vm
+        if vm.tier_threshold is not None:
+            # 与 VM.interpret 一样，足够热的 chunk 改由翻译出的 Python 函数执行
+            tiered = vm._tiered(self.chunk)
+            if tiered is not None:
+                try:
+                    return tiered()
+                except Exception as e:
+                    return ErrValue(str(e))
+        # 上一行可能在函数调用中途出错，需要恢复到顶层帧
+        vm.chunk, vm._slot_map = self.chunk, self._slot_map
+        vm.ip = vm.base = 0
+        vm.function = None
+        vm.frames.clear()
+        vm.stack.clear()
+        try:
+            status = self._execute()
+        except Exception as e:
+            return ErrValue(str(e))
+        if status is not VMResult.OK:
+            return ErrValue(f"VM finished with {status.name}.")
+        return vm.stack.pop() if vm.stack else None
+
+
+def evaluate_batch(source, rows, processes=None, **options):
+    """
+    便捷函数：编译 source（也可以直接传入 Chunk）并对 rows 求值，返回结果列表。
+    processes 不为 None 时使用进程池。
+    """
+    if isinstance(source, str):
+        evaluator = BatchEvaluator.from_source(source, **options)
+    else:
+        evaluator = BatchEvaluator(source, **options)
+    if processes is None:
+        return list(evaluator.evaluate(rows))
+    return list(evaluator.evaluate_parallel(rows, processes))
+
+
+# --- 进程池工作函数 ---
+_worker_evaluator = None
+
+
+def _init_worker(chunk, globals, dispatch):
+    global _worker_evaluator
+    _worker_evaluator = BatchEvaluator(chunk, globals, dispatch)
+
+
+def _evaluate_slice(rows):
+    return list(_worker_evaluator.evaluate(rows))
@@ -0,0 +1,84 @@
+# src/lucid/builtins.py
+"""
+Lucid 的内建函数。
+
+内建函数不占用全局变量：只有当一个全局名称未被定义时，VM 才会在这里查找它
+（找不到时再把它当作单位，例如 m）。因此用户可以用 let 覆盖任何内建函数。
+
+map / filter / take / range 返回惰性迭代器，与 |> 组合成流水线时
+逐个元素向后传递，任何一级都不会把整个序列物化：
+
+    range(1000000) |> map(fn(x) { x * 2m }) |> filter(fn(v) { v > 10m }) |> take(3)
+
+list / sum / count 消费迭代器并产出最终结果。
+
+convert 把带单位的值换算到量纲相同的另一个单位，目标单位用一个值给出：
+
+    36km/hr |> convert(m/s)     # 10.0m/s
+"""
+import itertools
+
+from . import operations
+from .runtime_types import BuiltinFunction, UnitValue
+
+
+def bind_builtins(vm):
+    """返回 {名称: BuiltinFunction}；需要回调 Lucid 函数的内建函数绑定到 vm"""
+    call = vm.call_function
+
+    def lucid_map(source, function):
+        return (call(function, item) for item in source)
+
+    def lucid_filter(source, predicate):
+        # 与 if 一致：只有 nil 与 false 为假
+        for item in source:
+            keep = call(predicate, item)
+            if keep is not None and keep is not False:
+                yield item
+
+    functions = {
+        "range": _range,
+        "map": lucid_map,
+        "filter": lucid_filter,
+        "take": _take,
+        "list": list,
+        "sum": _sum,
+        "count": _count,
+        "convert": _convert,
+    }
+    return {name: BuiltinFunction(fn, name) for name, fn in functions.items()}
+
+
+def _range(start, stop=None):
+    if stop is None:
+        start, stop = 0, start
+    return iter(range(_integer(start), _integer(stop)))
+
+
+def _take(source, n):
+    return itertools.islice(source, _integer(n))
+
+
+def _sum(source):
+    # 从 0 开始会与带单位的元素不兼容，因此用第一个元素作为初值
+    items = iter(source)
+    total = next(items, 0)
+    for item in items:
+        total = operations.add(total, item)
+    return total
+
+
+def _convert(value, target):
+    if type(value) is not UnitValue or type(target) is not UnitValue:
+        raise TypeError("convert expects two values with units.")
+    return value.to(target.unit)
+
+
+def _count(source):
+    return sum(1 for _ in source)
+
+
+def _integer(value):
+    if type(value) is not int:
+        raise TypeError(f"Expected an integer, got {value!r}.")
+    return value
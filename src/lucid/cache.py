@@ -0,0 +1,100 @@
+# src/lucid/cache.py
+"""
+磁盘字节码缓存。
+
+缓存文件以 "源码内容哈希 + 编译器版本 + 编译选项 + 单位注册表指纹"
+为键保存在一个目录中，
+命中时直接反序列化 Chunk，跳过词法分析、语法分析与编译。
+损坏或由旧版本编译器生成的缓存文件视为未命中，并在重新编译后被覆盖。
+"""
+import hashlib
+import os
+import tempfile
+
+from .compiler import COMPILER_VERSION, Compiler
+from .units import registry_fingerprint
+from .lexer import Lexer
+from .parser import Parser
+from .serialize import dump_chunk, load_chunk
+
+CACHE_SUFFIX = ".lucidc"
+
+# 对文件计算哈希时每次读取的字节数
+_HASH_BLOCK_SIZE = 1 << 20
+
+
+class BytecodeCache:
+    """
+    用法:
+        cache = BytecodeCache("/var/cache/lucid")
+        chunk = cache.compile_source(source)   # 或 cache.compile_file(path)
+    """
+
+    def __init__(self, directory, compiler=None):
+        self.directory = directory
+        self.compiler = compiler or Compiler()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, digest):
+        """由源码哈希、编译器版本、编译选项与单位注册表指纹组成缓存键"""
+        compiler = self.compiler
+        return (
+            f"{digest}-v{COMPILER_VERSION}"
+            f"-o{int(compiler.optimize)}f{int(compiler.fold_constants)}"
+            f"i{int(compiler.infer_units)}s{int(compiler.strict_units)}"
+            f"-u{registry_fingerprint()[:16]}"
+        )
+
+    def path_for(self, digest):
+        return os.path.join(self.directory, self.key(digest) + CACHE_SUFFIX)
+
+    def compile_source(self, source):
+        """编译源码字符串，优先使用缓存"""
+        digest = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        return self._compile(digest, lambda: Lexer(source))
+
+    def compile_file(self, path):
+        """编译源文件，优先使用缓存；未命中时以流式方式进行词法分析"""
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+                sha.update(block)
+        return self._compile(sha.hexdigest(), lambda: Lexer.from_file(path))
+
+    def load(self, digest):
+        """返回缓存中的 Chunk；不存在或无法读取时返回 None"""
+        try:
+            with open(self.path_for(digest), "rb") as f:
+                return load_chunk(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def store(self, digest, chunk):
+        """
+        原子地写入缓存文件：先写临时文件再重命名，
+        并发的读者只会看到完整的旧文件或新文件。
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(dump_chunk(chunk))
+            os.replace(tmp_path, self.path_for(digest))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _compile(self, digest, make_lexer):
+        chunk = self.load(digest)
+        if chunk is not None:
+            self.hits += 1
+            return chunk
+        self.misses += 1
+        chunk = self.compiler.compile(Parser(make_lexer()).parse())
+        try:
+            self.store(digest, chunk)
+        except OSError:
+            # 缓存目录不可写时仍然返回编译结果
+            pass
+        return chunk
@@ -1,11 +1,15 @@
 # src/lucid/chunk.py
 
 import enum
+import weakref
+
+from . import units
+from .runtime_types import UnitValue
 
 
 class OpCode(enum.IntEnum):
     """
-    定义虚拟机可以理解的指令操作码。(v6 - 支持if/else)
+    定义虚拟机可以理解的指令操作码。(v7 - 支持超级指令)
     """
 
     # --- 常量操作 ---
@@ -41,16 +45,300 @@ class OpCode(enum.IntEnum):
     OP_JUMP_IF_FALSE = 19
     OP_JUMP = 20
 
+    # --- 超级指令（由窥孔优化器生成） ---
+    OP_NOT_EQUAL = 21
+    OP_GREATER_EQUAL = 22
+    OP_LESS_EQUAL = 23
+    OP_UNIT_CONSTANT = 24
+
+    # --- 宽操作数指令（仅在索引或跳转距离超出短编码范围时使用） ---
+    OP_CONSTANT_LONG = 25
+    OP_DEFINE_GLOBAL_LONG = 26
+    OP_GET_GLOBAL_LONG = 27
+    OP_JUMP_IF_FALSE_LONG = 28
+    OP_JUMP_LONG = 29
+
+    # --- 函数与局部变量 ---
+    OP_GET_LOCAL = 30
+    OP_SET_LOCAL = 31
+    OP_GET_CAPTURE = 32
+    OP_CALL = 33
+    OP_CLOSURE = 34
+    OP_CLOSURE_LONG = 35
+
+    # --- 并发 ---
+    OP_SPAWN = 36
+    OP_AWAIT = 37
+
+    # --- 类型专用指令（由单位推断生成，操作数类型已知，省略运行时检查） ---
+    # *_NUMBER：两个操作数都是 int / float
+    OP_ADD_NUMBER = 38
+    OP_SUBTRACT_NUMBER = 39
+    OP_MULTIPLY_NUMBER = 40
+    OP_DIVIDE_NUMBER = 41
+    OP_GREATER_NUMBER = 42
+    OP_LESS_NUMBER = 43
+    # *_UNIT：两个操作数都是 UnitValue（加减与比较时单位相同）
+    OP_ADD_UNIT = 44
+    OP_SUBTRACT_UNIT = 45
+    OP_MULTIPLY_UNIT = 46
+    OP_DIVIDE_UNIT = 47
+    OP_GREATER_UNIT = 48
+    OP_LESS_UNIT = 49
+    # UnitValue 与普通数字相乘除，单位不变
+    OP_MULTIPLY_UNIT_NUMBER = 50
+    OP_MULTIPLY_NUMBER_UNIT = 51
+    OP_DIVIDE_UNIT_NUMBER = 52
+
+    # --- 加速指令（由 VM 按运行时类型反馈原地改写，带类型守卫） ---
+    # 守卫失败时执行通用路径，并把指令改写回通用指令
+    OP_QUICK_ADD_NUMBER = 53
+    OP_QUICK_SUBTRACT_NUMBER = 54
+    OP_QUICK_MULTIPLY_NUMBER = 55
+    OP_QUICK_DIVIDE_NUMBER = 56
+    OP_QUICK_GREATER_NUMBER = 57
+    OP_QUICK_LESS_NUMBER = 58
+    OP_QUICK_ADD_UNIT = 59
+    OP_QUICK_SUBTRACT_UNIT = 60
+    OP_QUICK_MULTIPLY_UNIT = 61
+    OP_QUICK_DIVIDE_UNIT = 62
+    OP_QUICK_GREATER_UNIT = 63
+    OP_QUICK_LESS_UNIT = 64
+
+    # --- 类型专用的取反比较（窥孔优化器融合 *_NUMBER / *_UNIT 比较与 OP_NOT） ---
+    OP_GREATER_EQUAL_NUMBER = 65
+    OP_LESS_EQUAL_NUMBER = 66
+    OP_GREATER_EQUAL_UNIT = 67
+    OP_LESS_EQUAL_UNIT = 68
+
+
+# 每条指令的操作数字节数，未列出的指令没有操作数
+OPERAND_WIDTHS = {
+    OpCode.OP_CONSTANT: 1,
+    OpCode.OP_DEFINE_GLOBAL: 1,
+    OpCode.OP_GET_GLOBAL: 1,
+    OpCode.OP_JUMP_IF_FALSE: 2,
+    OpCode.OP_JUMP: 2,
+    OpCode.OP_UNIT_CONSTANT: 1,
+    OpCode.OP_CONSTANT_LONG: 3,
+    OpCode.OP_DEFINE_GLOBAL_LONG: 3,
+    OpCode.OP_GET_GLOBAL_LONG: 3,
+    OpCode.OP_JUMP_IF_FALSE_LONG: 4,
+    OpCode.OP_JUMP_LONG: 4,
+    OpCode.OP_GET_LOCAL: 1,
+    OpCode.OP_SET_LOCAL: 1,
+    OpCode.OP_GET_CAPTURE: 1,
+    OpCode.OP_CALL: 1,
+    OpCode.OP_CLOSURE: 1,
+    OpCode.OP_CLOSURE_LONG: 3,
+}
+
+# 操作数为相对跳转距离的指令
+JUMP_OPCODES = (
+    OpCode.OP_JUMP_IF_FALSE,
+    OpCode.OP_JUMP,
+    OpCode.OP_JUMP_IF_FALSE_LONG,
+    OpCode.OP_JUMP_LONG,
+)
+
+# 操作数为全局变量槽位（chunk.global_names 的索引）的指令
+GLOBAL_OPCODES = (
+    OpCode.OP_DEFINE_GLOBAL,
+    OpCode.OP_GET_GLOBAL,
+    OpCode.OP_DEFINE_GLOBAL_LONG,
+    OpCode.OP_GET_GLOBAL_LONG,
+)
+
+# 操作数直接是一个数字（局部变量槽位、捕获变量索引、参数个数）的指令
+NUMERIC_OPCODES = (
+    OpCode.OP_GET_LOCAL,
+    OpCode.OP_SET_LOCAL,
+    OpCode.OP_GET_CAPTURE,
+    OpCode.OP_CALL,
+)
+
+# 类型专用指令到对应通用指令的映射（语义相同，只是省略了检查）
+GENERIC_FORMS = {
+    OpCode.OP_ADD_NUMBER: OpCode.OP_ADD,
+    OpCode.OP_SUBTRACT_NUMBER: OpCode.OP_SUBTRACT,
+    OpCode.OP_MULTIPLY_NUMBER: OpCode.OP_MULTIPLY,
+    OpCode.OP_DIVIDE_NUMBER: OpCode.OP_DIVIDE,
+    OpCode.OP_GREATER_NUMBER: OpCode.OP_GREATER,
+    OpCode.OP_LESS_NUMBER: OpCode.OP_LESS,
+    OpCode.OP_ADD_UNIT: OpCode.OP_ADD,
+    OpCode.OP_SUBTRACT_UNIT: OpCode.OP_SUBTRACT,
+    OpCode.OP_MULTIPLY_UNIT: OpCode.OP_MULTIPLY,
+    OpCode.OP_DIVIDE_UNIT: OpCode.OP_DIVIDE,
+    OpCode.OP_GREATER_UNIT: OpCode.OP_GREATER,
+    OpCode.OP_LESS_UNIT: OpCode.OP_LESS,
+    OpCode.OP_MULTIPLY_UNIT_NUMBER: OpCode.OP_MULTIPLY,
+    OpCode.OP_MULTIPLY_NUMBER_UNIT: OpCode.OP_MULTIPLY,
+    OpCode.OP_DIVIDE_UNIT_NUMBER: OpCode.OP_DIVIDE,
+    OpCode.OP_GREATER_EQUAL_NUMBER: OpCode.OP_GREATER_EQUAL,
+    OpCode.OP_LESS_EQUAL_NUMBER: OpCode.OP_LESS_EQUAL,
+    OpCode.OP_GREATER_EQUAL_UNIT: OpCode.OP_GREATER_EQUAL,
+    OpCode.OP_LESS_EQUAL_UNIT: OpCode.OP_LESS_EQUAL,
+}
+
+# 加速指令到对应通用指令的映射。加速只改写 chunk.code 中的操作码字节，
+# 反汇编、序列化与第二执行层都按通用指令处理它们
+QUICKENED_FORMS = {
+    OpCode.OP_QUICK_ADD_NUMBER: OpCode.OP_ADD,
+    OpCode.OP_QUICK_SUBTRACT_NUMBER: OpCode.OP_SUBTRACT,
+    OpCode.OP_QUICK_MULTIPLY_NUMBER: OpCode.OP_MULTIPLY,
+    OpCode.OP_QUICK_DIVIDE_NUMBER: OpCode.OP_DIVIDE,
+    OpCode.OP_QUICK_GREATER_NUMBER: OpCode.OP_GREATER,
+    OpCode.OP_QUICK_LESS_NUMBER: OpCode.OP_LESS,
+    OpCode.OP_QUICK_ADD_UNIT: OpCode.OP_ADD,
+    OpCode.OP_QUICK_SUBTRACT_UNIT: OpCode.OP_SUBTRACT,
+    OpCode.OP_QUICK_MULTIPLY_UNIT: OpCode.OP_MULTIPLY,
+    OpCode.OP_QUICK_DIVIDE_UNIT: OpCode.OP_DIVIDE,
+    OpCode.OP_QUICK_GREATER_UNIT: OpCode.OP_GREATER,
+    OpCode.OP_QUICK_LESS_UNIT: OpCode.OP_LESS,
+}
+
+# 短指令到对应宽指令的映射
+LONG_FORMS = {
+    OpCode.OP_CONSTANT: OpCode.OP_CONSTANT_LONG,
+    OpCode.OP_DEFINE_GLOBAL: OpCode.OP_DEFINE_GLOBAL_LONG,
+    OpCode.OP_GET_GLOBAL: OpCode.OP_GET_GLOBAL_LONG,
+    OpCode.OP_JUMP_IF_FALSE: OpCode.OP_JUMP_IF_FALSE_LONG,
+    OpCode.OP_JUMP: OpCode.OP_JUMP_LONG,
+    OpCode.OP_CLOSURE: OpCode.OP_CLOSURE_LONG,
+}
+
+# 宽操作数指令能表示的最大索引
+MAX_LONG_INDEX = 0xFFFFFF
+
+
+def instruction_length(opcode):
+    """返回一条指令（操作码加操作数）占用的总字节数"""
+    return 1 + OPERAND_WIDTHS.get(opcode, 0)
+
+
+def read_operand(code, offset):
+    """读取 offset 处指令的操作数（大端序），没有操作数时返回 None"""
+    width = OPERAND_WIDTHS.get(code[offset], 0)
+    if not width:
+        return None
+    return int.from_bytes(code[offset + 1 : offset + 1 + width], "big")
+
+
+def unquickened(code):
+    """返回把加速指令还原为通用指令后的字节码副本"""
+    code = bytearray(code)
+    offset = 0
+    while offset < len(code):
+        opcode = code[offset]
+        if opcode in QUICKENED_FORMS:
+            code[offset] = QUICKENED_FORMS[opcode]
+        offset += instruction_length(opcode)
+    return code
+
+
+# 含有类型专用指令的 Chunk。这些指令依据编译时的单位注册表生成，
+# 注册表变化后它们被原地改写回通用指令
+_specialized_chunks = weakref.WeakSet()
+
+
+def has_specialized(code):
+    """code 中是否含有类型专用指令"""
+    offset = 0
+    while offset < len(code):
+        opcode = code[offset]
+        if opcode in GENERIC_FORMS:
+            return True
+        offset += instruction_length(opcode)
+    return False
+
+
+def mark_specialized(chunk):
+    """登记一个含有类型专用指令的 Chunk"""
+    _specialized_chunks.add(chunk)
+
+
+def generalize(chunk):
+    """
+    把 chunk 中的类型专用指令原地改写为对应的通用指令。
+    两者都没有操作数，指令长度与跳转距离不变。
+    """
+    code = chunk.code
+    offset = 0
+    while offset < len(code):
+        opcode = code[offset]
+        if opcode in GENERIC_FORMS:
+            code[offset] = GENERIC_FORMS[opcode]
+        offset += instruction_length(opcode)
+    _specialized_chunks.discard(chunk)
+
+
+def _registry_changed(name):
+    for chunk in list(_specialized_chunks):
+        generalize(chunk)
+
+
+units._listeners.append(_registry_changed)
+
+
+def _constant_key(value):
+    """
+    常量去重使用的键。类型参与比较，避免 1、1.0 与 True 被合并；
+    浮点数按其精确的十六进制表示比较，以区分 0.0 与 -0.0。
+    """
+    kind = type(value)
+    if kind is UnitValue:
+        return (kind, _constant_key(value.value), value.unit)
+    if kind is float:
+        return (kind, value.hex())
+    return (kind, value)
+
 
 class Chunk:
     """
     一个 Chunk 代表一段编译好的字节码。
-    它包含了指令序列和与之关联的常量池。
+    它包含了指令序列、与之关联的常量池，以及它引用的全局变量名表。
+    函数体的 Chunk 通过 parent 与所在脚本的 Chunk 共享同一张全局变量名表，
+    因此同一次编译产生的所有 Chunk 使用相同的全局槽位编号。
+    share_constants=True 时还与 parent 共享常量池（REPL 会话中逐行增长）。
     """
 
-    def __init__(self):
+    def __init__(self, parent=None, share_constants=False):
         self.code = bytearray()
-        self.constants = []
+        # VM 记录的运行时类型反馈：{偏移量: [操作数类型, 连续次数, 放弃计数]}
+        self.feedback = None
+        if parent is None:
+            self.global_names = []
+            self._global_slots = {}
+        else:
+            self.global_names = parent.global_names
+            self._global_slots = parent._global_slots
+        if share_constants:
+            self.constants = parent.constants
+            self._constant_index = parent._constant_index
+        else:
+            self.constants = []
+            self._constant_index = {}
+
+    def __reduce__(self):
+        # pickle（例如发送给进程池的工作进程）时使用 .lucidc 格式
+        from .serialize import dump_chunk, load_chunk
+
+        return (load_chunk, (dump_chunk(self),))
+
+    @classmethod
+    def from_parts(cls, code, constants, global_names=(), parent=None):
+        """由已有的字节码、常量池与全局变量名表重建 Chunk（用于反序列化）"""
+        chunk = cls(parent)
+        chunk.code = bytearray(code)
+        chunk.constants = list(constants)
+        for index, value in enumerate(chunk.constants):
+            try:
+                chunk._constant_index.setdefault(_constant_key(value), index)
+            except TypeError:
+                pass
+        for name in global_names:
+            chunk.add_global(name)
+        return chunk
 
     def write_byte(self, byte):
         """写入单个字节到 code 中"""
@@ -61,16 +349,47 @@ class Chunk:
         将一个常量添加到常量池中，并返回其索引。
         如果常量已存在，则直接返回现有索引。
         """
-        # 为了简化，我们暂时允许重复，因为处理不可哈希的类型（如列表）作为常量会更复杂
-        self.constants.append(value)
-        return len(self.constants) - 1
+        try:
+            key = _constant_key(value)
+            index = self._constant_index.get(key)
+        except TypeError:
+            # 不可哈希的常量（例如列表）不参与去重，直接追加
+            key = index = None
+        if index is None:
+            index = len(self.constants)
+            self.constants.append(value)
+            if key is not None:
+                self._constant_index[key] = index
+        return index
+
+    def add_global(self, name):
+        """
+        返回全局变量名在本 chunk 中的槽位编号，同名变量共享同一个槽位。
+        虚拟机在执行前会把这些局部槽位链接到它自己的全局槽位。
+        """
+        slot = self._global_slots.get(name)
+        if slot is None:
+            slot = len(self.global_names)
+            self.global_names.append(name)
+            self._global_slots[name] = slot
+        return slot
 
     def write_constant(self, value):
         """
         一个辅助方法，用于方便地添加常量并写入 OP_CONSTANT 指令。
         """
-        constant_index = self.add_constant(value)
-        if constant_index > 255:
-            raise ValueError("Constant index exceeds 256 limit.")
-        self.write_byte(OpCode.OP_CONSTANT)
-        self.write_byte(constant_index)
+        self.write_indexed(OpCode.OP_CONSTANT, self.add_constant(value))
+
+    def write_indexed(self, opcode, index):
+        """
+        写入一条带索引操作数的指令。索引不超过 255 时使用1字节的短编码，
+        否则改用对应的宽指令（3字节操作数）。
+        """
+        if index <= 255:
+            self.write_byte(opcode)
+            self.write_byte(index)
+        elif index <= MAX_LONG_INDEX:
+            self.write_byte(LONG_FORMS[opcode])
+            self.code.extend(index.to_bytes(3, "big"))
+        else:
+            raise ValueError(f"Operand index {index} exceeds {MAX_LONG_INDEX}.")
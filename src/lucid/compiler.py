@@ -1,8 +1,89 @@
 # src/lucid/compiler.py
 
 from .ast import *
-from .chunk import Chunk, OpCode
+from .chunk import LONG_FORMS, OPERAND_WIDTHS, Chunk, OpCode, mark_specialized
 from .core_types import Token
+from .folding import fold_constants
+from .inference import NUMBER, infer_units
+from .optimizer import optimize_chunk
+from .runtime_types import CompiledFunction, Unit
+from .traversal import DispatchCache, walk
+
+# 编译器输出格式的版本号；字节码生成方式发生变化时必须递增，
+# 以使旧的 .lucidc 缓存失效
+COMPILER_VERSION = 5
+
+# 二元运算符 -> 通用指令（以及之后追加的 OP_NOT）
+_BINARY_OPCODES = {
+    "PLUS": (OpCode.OP_ADD, False),
+    "MINUS": (OpCode.OP_SUBTRACT, False),
+    "MUL": (OpCode.OP_MULTIPLY, False),
+    "DIV": (OpCode.OP_DIVIDE, False),
+    "CARET": (OpCode.OP_POWER, False),
+    "EQ": (OpCode.OP_EQUAL, False),
+    "NE": (OpCode.OP_EQUAL, True),
+    "GT": (OpCode.OP_GREATER, False),
+    "GTE": (OpCode.OP_LESS, True),
+    "LT": (OpCode.OP_LESS, False),
+    "LTE": (OpCode.OP_GREATER, True),
+}
+
+# (通用指令, 左操作数, 右操作数) -> 类型专用指令；
+# "unit" 表示操作数是 UnitValue，加减与比较还要求两边单位相同
+_SPECIALIZED = {
+    (OpCode.OP_ADD, "number", "number"): OpCode.OP_ADD_NUMBER,
+    (OpCode.OP_SUBTRACT, "number", "number"): OpCode.OP_SUBTRACT_NUMBER,
+    (OpCode.OP_MULTIPLY, "number", "number"): OpCode.OP_MULTIPLY_NUMBER,
+    (OpCode.OP_DIVIDE, "number", "number"): OpCode.OP_DIVIDE_NUMBER,
+    (OpCode.OP_GREATER, "number", "number"): OpCode.OP_GREATER_NUMBER,
+    (OpCode.OP_LESS, "number", "number"): OpCode.OP_LESS_NUMBER,
+    (OpCode.OP_ADD, "unit", "unit"): OpCode.OP_ADD_UNIT,
+    (OpCode.OP_SUBTRACT, "unit", "unit"): OpCode.OP_SUBTRACT_UNIT,
+    (OpCode.OP_MULTIPLY, "unit", "unit"): OpCode.OP_MULTIPLY_UNIT,
+    (OpCode.OP_DIVIDE, "unit", "unit"): OpCode.OP_DIVIDE_UNIT,
+    (OpCode.OP_GREATER, "unit", "unit"): OpCode.OP_GREATER_UNIT,
+    (OpCode.OP_LESS, "unit", "unit"): OpCode.OP_LESS_UNIT,
+    (OpCode.OP_MULTIPLY, "unit", "number"): OpCode.OP_MULTIPLY_UNIT_NUMBER,
+    (OpCode.OP_MULTIPLY, "number", "unit"): OpCode.OP_MULTIPLY_NUMBER_UNIT,
+    (OpCode.OP_DIVIDE, "unit", "number"): OpCode.OP_DIVIDE_UNIT_NUMBER,
+}
+
+
+class _FunctionState:
+    """
+    正在编译的函数。locals 把局部变量名映射到栈槽位（槽位 0 是函数本身，
+    参数从槽位 1 开始）；captures 记录从外层函数按值捕获的变量。
+    函数内 let 定义的函数可以用 self_name 引用自身，编译为读取槽位 0。
+    """
+
+    def __init__(self, enclosing, chunk, parameters, self_name=None):
+        self.enclosing, self.chunk = enclosing, chunk
+        self.self_name = self_name
+        self.locals = {}
+        self.captures = []
+        self.capture_index = {}
+        for token in parameters:
+            self.declare(token.value)
+
+    def declare(self, name):
+        slot = self.locals.get(name)
+        if slot is None:
+            slot = len(self.locals) + 1
+            if slot > 255:
+                raise ValueError("Too many local variables in function.")
+            self.locals[name] = slot
+        return slot
+
+    def capture(self, name, is_local, index):
+        """登记一个捕获变量，返回它在 captures 中的索引"""
+        position = self.capture_index.get(name)
+        if position is None:
+            position = len(self.captures)
+            if position > 255:
+                raise ValueError("Too many captured variables in function.")
+            self.captures.append((is_local, index))
+            self.capture_index[name] = position
+        return position
 
 
 class Compiler:
@@ -10,19 +91,46 @@ class Compiler:
     编译器，负责将 AST 翻译成字节码。(v3.5 - 稳定版)
     """
 
-    def __init__(self):
+    def __init__(
+        self, optimize=False, fold_constants=True, infer_units=True, strict_units=False
+    ):
+        # optimize=True 时在编译结束后运行窥孔优化，生成超级指令
+        # fold_constants=True 时在生成字节码前折叠字面量组成的子树
+        # infer_units=True 时推断操作数类型，已知时生成类型专用指令；
+        # 推断发现的单位错误记录在 diagnostics 中，strict_units=True 时直接抛出
         self.chunk = None
+        self.optimize = optimize
+        self.fold_constants = fold_constants
+        self.infer_units = infer_units
+        self.strict_units = strict_units
+        self.diagnostics = []
+        self._visitors = DispatchCache(self, "visit_", self.generic_visit)
 
-    def compile(self, program_node):
-        self.chunk = Chunk()
+    def compile(self, program_node, chunk=None):
+        """编译整个程序；传入 chunk 时把字节码写入它（它的常量池与全局名表可能已有内容）"""
+        self.chunk = Chunk() if chunk is None else chunk
+        # 当前正在编译的函数，None 表示顶层脚本（变量均为全局变量）
+        self._function = None
+        if self.fold_constants:
+            program_node = fold_constants(program_node)
+        self._types = {}
+        self.diagnostics = []
+        if self.infer_units:
+            self._types, self.diagnostics = infer_units(program_node)
+            if self.strict_units and self.diagnostics:
+                raise TypeError(self.diagnostics[0])
         self.visit(program_node)
         self.emit_byte(OpCode.OP_RETURN)
+        if self.optimize:
+            optimize_chunk(self.chunk)
         return self.chunk
 
     def visit(self, node):
-        method_name = f"visit_{type(node).__name__}"
-        visitor = getattr(self, method_name, self.generic_visit)
-        return visitor(node)
+        """
+        为 node 生成字节码。有子节点的访问方法是生成器，yield 子节点即编译它；
+        walk 用显式栈驱动这些生成器，AST 的深度不受 Python 递归深度限制。
+        """
+        walk(node, self._visitors)
 
     def generic_visit(self, node):
         raise NotImplementedError(
@@ -40,50 +148,179 @@ class Compiler:
     def emit_constant(self, value):
         self.chunk.write_constant(value)
 
-    def emit_jump(self, instruction):
+    def emit_global(self, instruction, name):
+        self.chunk.write_indexed(instruction, self.chunk.add_global(name))
+
+    def emit_jump(self, instruction, long=False):
+        if long:
+            instruction = LONG_FORMS[instruction]
+        width = OPERAND_WIDTHS[instruction]
         self.emit_byte(instruction)
-        self.emit_byte(0xFF)
-        self.emit_byte(0xFF)
-        return len(self.chunk.code) - 2
+        self.chunk.code.extend(b"\xff" * width)
+        return len(self.chunk.code) - width
 
     def patch_jump(self, offset):
-        jump = len(self.chunk.code) - offset - 2
-        if jump > 65535:
-            raise ValueError("Too much code to jump over.")
-        self.chunk.code[offset] = (jump >> 8) & 0xFF
-        self.chunk.code[offset + 1] = jump & 0xFF
+        """
+        让 offset 处的跳转跳到当前末尾。短跳转放不下时原地改为宽跳转：
+        在操作数处插入字节，被跳过的代码整体后移（其中的跳转都是相对的，
+        不受影响）。返回插入的字节数，调用方据此修正之后记录的偏移量。
+        """
+        code = self.chunk.code
+        width = OPERAND_WIDTHS[code[offset - 1]]
+        jump = len(code) - offset - width
+        inserted = 0
+        if jump >= 1 << (8 * width):
+            long_form = LONG_FORMS.get(code[offset - 1])
+            if long_form is None:
+                raise ValueError("Too much code to jump over.")
+            inserted = OPERAND_WIDTHS[long_form] - width
+            code[offset:offset] = bytes(inserted)
+            code[offset - 1] = long_form
+            width += inserted
+            if jump >= 1 << (8 * width):
+                raise ValueError("Too much code to jump over.")
+        code[offset : offset + width] = jump.to_bytes(width, "big")
+        return inserted
 
     # --- 节点访问者 ---
     def visit_BlockStatement(self, node):
         statements = node.statements
         for i, statement in enumerate(statements):
-            self.visit(statement)
+            yield statement
             # If it's an expression statement and not the last one, pop its value.
             # let statements are handled in visit_VarAssign.
             if not isinstance(statement, VarAssign) and i < len(statements) - 1:
                 self.emit_byte(OpCode.OP_POP)
+        # 代码块是表达式：为空或以 let 结尾时它的值是 nil
+        if not statements or isinstance(statements[-1], VarAssign):
+            self.emit_byte(OpCode.OP_NIL)
 
     def visit_VarAssign(self, node):
-        self.visit(node.value_node)
-        var_name_index = self.chunk.add_constant(node.var_name)
-        self.emit_bytes(OpCode.OP_DEFINE_GLOBAL, var_name_index)
+        function = self._function
+        if function is not None:
+            # 函数内的 let 定义局部变量（作用域为整个函数）
+            if isinstance(node.value_node, FunctionLiteral):
+                # 槽位先于函数体分配；函数体中的同名引用指向函数自身，
+                # 而不是按值捕获这个尚未赋值的槽位
+                slot = function.declare(node.var_name)
+                yield from self._compile_function(
+                    node.value_node, node.var_name, recursive=True
+                )
+            else:
+                # 值中的同名引用仍然指向外层的变量，例如 let n = n + 1
+                yield node.value_node
+                slot = function.declare(node.var_name)
+            self.emit_bytes(OpCode.OP_SET_LOCAL, slot)
+            return
+        if isinstance(node.value_node, FunctionLiteral):
+            yield from self._compile_function(node.value_node, node.var_name)
+        else:
+            yield node.value_node
+        self.emit_global(OpCode.OP_DEFINE_GLOBAL, node.var_name)
         # *** BUG FIX: After a `let` statement, the value should be consumed. ***
         # However, since the VM's OP_DEFINE_GLOBAL will now pop it,
         # we don't need an extra pop here. This logic is now cleaner.
 
     def visit_VarAccess(self, node):
-        var_name_index = self.chunk.add_constant(node.var_name)
-        self.emit_bytes(OpCode.OP_GET_GLOBAL, var_name_index)
+        function = self._function
+        if function is not None:
+            slot = function.locals.get(node.var_name)
+            if slot is None and node.var_name == function.self_name:
+                slot = 0
+            if slot is not None:
+                self.emit_bytes(OpCode.OP_GET_LOCAL, slot)
+                return
+            position = self._resolve_capture(function, node.var_name)
+            if position is not None:
+                self.emit_bytes(OpCode.OP_GET_CAPTURE, position)
+                return
+        self.emit_global(OpCode.OP_GET_GLOBAL, node.var_name)
+
+    def _resolve_capture(self, function, name):
+        """在外层函数中查找 name，找到时登记为 function 的捕获变量"""
+        enclosing = function.enclosing
+        if enclosing is None:
+            return None
+        slot = enclosing.locals.get(name)
+        if slot is None and name == enclosing.self_name:
+            slot = 0
+        if slot is not None:
+            return function.capture(name, True, slot)
+        position = self._resolve_capture(enclosing, name)
+        if position is not None:
+            return function.capture(name, False, position)
+        return None
+
+    def visit_FunctionLiteral(self, node):
+        yield from self._compile_function(node, None)
+
+    def _compile_function(self, node, name, recursive=False):
+        """
+        把函数体编译到独立的 Chunk，并在当前位置生成创建函数对象的指令。
+        recursive 为 True 时函数体中的 name 指向函数自身
+        """
+        enclosing, outer_chunk = self._function, self.chunk
+        self.chunk = Chunk(parent=outer_chunk)
+        function = _FunctionState(
+            enclosing, self.chunk, node.parameters, name if recursive else None
+        )
+        self._function = function
+        try:
+            yield node.body
+            self.emit_byte(OpCode.OP_RETURN)
+            if self.optimize:
+                optimize_chunk(self.chunk)
+        finally:
+            self._function, self.chunk = enclosing, outer_chunk
+
+        compiled = CompiledFunction(
+            name,
+            len(node.parameters),
+            len(function.locals),
+            function.chunk,
+            len(function.captures),
+        )
+        # 捕获的值按顺序压栈，由 OP_CLOSURE 取走
+        for is_local, index in function.captures:
+            if is_local:
+                self.emit_bytes(OpCode.OP_GET_LOCAL, index)
+            else:
+                self.emit_bytes(OpCode.OP_GET_CAPTURE, index)
+        self.chunk.write_indexed(OpCode.OP_CLOSURE, self.chunk.add_constant(compiled))
+
+    def visit_SpawnExpression(self, node):
+        # spawn 代码块编译为一个无参函数，由 OP_SPAWN 交给执行器运行
+        yield from self._compile_function(FunctionLiteral([], node.block), "spawn")
+        self.emit_byte(OpCode.OP_SPAWN)
+
+    def visit_AwaitExpression(self, node):
+        yield node.task_expr
+        self.emit_byte(OpCode.OP_AWAIT)
+
+    def visit_CallExpression(self, node):
+        if len(node.arguments) > 255:
+            raise ValueError("Too many arguments.")
+        yield node.function
+        for argument in node.arguments:
+            yield argument
+        self.emit_bytes(OpCode.OP_CALL, len(node.arguments))
+
+    def visit_ReturnStatement(self, node):
+        yield node.return_value
+        self.emit_byte(OpCode.OP_RETURN)
 
     def visit_IfExpression(self, node):
-        self.visit(node.condition)
+        # 先生成2字节的短跳转；分支超过 64KB 时由 patch_jump 原地加宽，
+        # 每个节点只编译一次，不会为加宽跳转而重新编译整个分支
+        yield node.condition
         else_jump = self.emit_jump(OpCode.OP_JUMP_IF_FALSE)
         self.emit_byte(OpCode.OP_POP)
-        self.visit(node.then_branch)
+        yield node.then_branch
         end_jump = self.emit_jump(OpCode.OP_JUMP)
-        self.patch_jump(else_jump)
+        end_jump += self.patch_jump(else_jump)
+        self.emit_byte(OpCode.OP_POP)
         if node.else_branch is not None:
-            self.visit(node.else_branch)
+            yield node.else_branch
         else:
             self.emit_byte(OpCode.OP_NIL)
         self.patch_jump(end_jump)
@@ -94,6 +331,17 @@ class Compiler:
     def visit_StringLiteral(self, node):
         self.emit_constant(node.value)
 
+    def visit_Constant(self, node):
+        value = node.value
+        if value is None:
+            self.emit_byte(OpCode.OP_NIL)
+        elif value is True:
+            self.emit_byte(OpCode.OP_TRUE)
+        elif value is False:
+            self.emit_byte(OpCode.OP_FALSE)
+        else:
+            self.emit_constant(value)
+
     def visit_Boolean(self, node):
         if node.value:
             self.emit_byte(OpCode.OP_TRUE)
@@ -106,7 +354,7 @@ class Compiler:
         self.emit_byte(OpCode.OP_BUILD_UNIT_VALUE)
 
     def visit_UnaryOp(self, node):
-        self.visit(node.expr)
+        yield node.expr
         op_type = node.op.type
         if op_type == "MINUS":
             self.emit_byte(OpCode.OP_NEGATE)
@@ -116,35 +364,62 @@ class Compiler:
             raise NotImplementedError(f"Unary operator '{op_type}' not supported.")
 
     def visit_BinOp(self, node):
-        self.visit(node.left)
-        self.visit(node.right)
+        if node.op.type == "PIPE":
+            yield from self.visit_CallExpression(_pipe_call(node))
+            return
+        yield node.left
+        yield node.right
         op_type = node.op.type
-        if op_type == "PLUS":
-            self.emit_byte(OpCode.OP_ADD)
-        elif op_type == "MINUS":
-            self.emit_byte(OpCode.OP_SUBTRACT)
-        elif op_type == "MUL":
-            self.emit_byte(OpCode.OP_MULTIPLY)
-        elif op_type == "DIV":
-            self.emit_byte(OpCode.OP_DIVIDE)
-        elif op_type == "CARET":
-            self.emit_byte(OpCode.OP_POWER)
-        elif op_type == "EQ":
-            self.emit_byte(OpCode.OP_EQUAL)
-        elif op_type == "NE":
-            self.emit_byte(OpCode.OP_EQUAL)
-            self.emit_byte(OpCode.OP_NOT)
-        elif op_type == "GT":
-            self.emit_byte(OpCode.OP_GREATER)
-        elif op_type == "GTE":
-            self.emit_byte(OpCode.OP_LESS)
-            self.emit_byte(OpCode.OP_NOT)
-        elif op_type == "LT":
-            self.emit_byte(OpCode.OP_LESS)
-        elif op_type == "LTE":
-            self.emit_byte(OpCode.OP_GREATER)
-            self.emit_byte(OpCode.OP_NOT)
-        else:
+        if op_type not in _BINARY_OPCODES:
             raise NotImplementedError(
                 f"Binary operator '{op_type}' not supported by compiler."
             )
+        opcode, negate = _BINARY_OPCODES[op_type]
+        self.emit_byte(self._specialize(opcode, node))
+        if negate:
+            self.emit_byte(OpCode.OP_NOT)
+
+    def _specialize(self, opcode, node):
+        """操作数类型都已知时返回类型专用指令，否则返回通用指令本身"""
+        left = _operand_kind(self._types.get(id(node.left)))
+        right = _operand_kind(self._types.get(id(node.right)))
+        specialized = _SPECIALIZED.get((opcode, left, right))
+        if specialized is None:
+            return opcode
+        unit_a, unit_b = self._types[id(node.left)], self._types[id(node.right)]
+        if left == right == "unit":
+            if opcode == OpCode.OP_MULTIPLY:
+                result = unit_a.multiply(unit_b)
+            elif opcode == OpCode.OP_DIVIDE:
+                result = unit_a.divide(unit_b)
+            elif unit_a is not unit_b:
+                # 单位不同但可以换算，由通用指令负责换算
+                return opcode
+            else:
+                result = unit_a
+            # 结果会退化为普通数字的运算交给通用指令
+            if result.scale is not None:
+                return opcode
+        # 单位注册表变化时这个 chunk 中的类型专用指令会被改写回通用指令
+        mark_specialized(self.chunk)
+        return specialized
+
+
+def _operand_kind(kind):
+    """类型专用指令关心的操作数类别："number"、"unit" 或 None"""
+    if kind == NUMBER:
+        return "number"
+    if isinstance(kind, Unit) and kind.scale is None:
+        return "unit"
+    return None
+
+
+def _pipe_call(node):
+    """
+    x |> f 等价于 f(x)，x |> f(a, b) 等价于 f(x, a, b)。
+    管道直接编译为一次 OP_CALL，不构造中间的元组或列表。
+    """
+    stage = node.right
+    if isinstance(stage, CallExpression):
+        return CallExpression(stage.function, [node.left, *stage.arguments])
+    return CallExpression(stage, [node.left])
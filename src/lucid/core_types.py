@@ -1,4 +1,7 @@
 # src/lucid/core_types.py
+import re
+from array import array
+from bisect import bisect_right
 
 
 class Token:
@@ -7,6 +10,8 @@ class Token:
     它包含类型、值以及可选的位置信息。
     """
 
+    __slots__ = ("type", "value", "line", "column")
+
     def __init__(self, type, value, line=0, column=0):
         self.type = type
         self.value = value
@@ -19,3 +24,60 @@ class Token:
 
     def __repr__(self):
         return self.__str__()
+
+
+class TokenArrays:
+    """
+    批量词法分析的结果：令牌以并行数组的形式存放。
+    types[i] 是类型编码（type_names[types[i]] 为类型名），values[i] 是令牌值，
+    offsets[i] 是令牌在源码中的起始偏移量。
+    """
+
+    __slots__ = ("type_names", "types", "values", "offsets", "source", "_lines")
+
+    def __init__(self, type_names, types, values, offsets, source=None):
+        self.type_names = type_names
+        self.types = types
+        self.values = values
+        self.offsets = offsets
+        self.source = source
+        self._lines = None
+
+    def __len__(self):
+        return len(self.types)
+
+    def position(self, index):
+        """
+        返回第 index 个令牌的 (行号, 列号)。行起始偏移表在第一次调用时才构建。
+        """
+        if self._lines is None:
+            self._lines = LineIndex(self.source)
+        return self._lines.position(self.offsets[index])
+
+    def token(self, index):
+        """按需构造第 index 个令牌的 Token 对象（包含位置信息）"""
+        line, column = self.position(index) if self.source is not None else (0, 0)
+        return Token(
+            self.type_names[self.types[index]], self.values[index], line, column
+        )
+
+    def __iter__(self):
+        names, values = self.type_names, self.values
+        return (Token(names[code], values[i]) for i, code in enumerate(self.types))
+
+
+class LineIndex:
+    """
+    行起始偏移表：记录每一行第一个字符的偏移量，
+    之后任意偏移量都可以通过二分查找换算成 (行号, 列号)，两者都从 1 开始。
+    """
+
+    __slots__ = ("line_starts",)
+
+    def __init__(self, text):
+        self.line_starts = array("q", [0])
+        self.line_starts.extend(match.end() for match in re.finditer("\n", text))
+
+    def position(self, offset):
+        line = bisect_right(self.line_starts, offset)
+        return line, offset - self.line_starts[line - 1] + 1
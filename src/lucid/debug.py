@@ -1,16 +1,35 @@
 # src/lucid/debug.py
 
-from .chunk import OpCode
+from .chunk import (
+    GLOBAL_OPCODES,
+    JUMP_OPCODES,
+    NUMERIC_OPCODES,
+    OPERAND_WIDTHS,
+    QUICKENED_FORMS,
+    OpCode,
+    read_operand,
+)
+from .runtime_types import CompiledFunction
 
 
-def disassemble_chunk(chunk, name):
+def disassemble_chunk(chunk, name, profile=None):
     """
     反汇编一个完整的字节码块。
+    传入 profiler.Profile 时，每条指令前标注执行次数与占总耗时的百分比。
     """
     print(f"== {name} ==")
+    total_time = profile.total_time if profile else 0
     offset = 0
     while offset < len(chunk.code):
+        if profile:
+            count, time = profile.instruction(chunk, offset)
+            share = 100 * time / total_time if total_time else 0.0
+            print(f"{count:>10} {share:5.1f}% ", end="")
         offset = disassemble_instruction(chunk, offset)
+    # 函数体编译在各自的 chunk 中，依次反汇编
+    for constant in chunk.constants:
+        if isinstance(constant, CompiledFunction):
+            disassemble_chunk(constant.chunk, f"{name} / {constant!r}", profile)
 
 
 def disassemble_instruction(chunk, offset):
@@ -20,20 +39,27 @@ def disassemble_instruction(chunk, offset):
     print(f"{offset:04d} ", end="")
 
     instruction = chunk.code[offset]
-    op_name = OpCode(instruction).name
-
-    # 根据指令是否有参数，进行不同的打印
-    if instruction in (
-        OpCode.OP_CONSTANT,
-        OpCode.OP_DEFINE_GLOBAL,
-        OpCode.OP_GET_GLOBAL,
-    ):
-        # 这些指令有一个1字节的参数（常量池索引）
-        constant_index = chunk.code[offset + 1]
-        constant_value = chunk.constants[constant_index]
-        print(f"{op_name:<16} {constant_index:4d} '{constant_value}'")
-        return offset + 2
+    # VM 原地改写出的加速指令按对应的通用指令显示
+    op_name = OpCode(QUICKENED_FORMS.get(instruction, instruction)).name
+
+    width = OPERAND_WIDTHS.get(instruction, 0)
+    operand = read_operand(chunk.code, offset)
+    next_offset = offset + 1 + width
+
+    # 根据指令的操作数类型，进行不同的打印
+    if instruction in JUMP_OPCODES:
+        # 跳转指令的参数是相对跳转距离
+        print(f"{op_name:<16} {offset:4d} -> {next_offset + operand}")
+    elif instruction in NUMERIC_OPCODES:
+        # 局部变量槽位、捕获变量索引或参数个数
+        print(f"{op_name:<16} {operand:4d}")
+    elif instruction in GLOBAL_OPCODES:
+        # 全局变量指令的参数是全局变量名表索引
+        print(f"{op_name:<16} {operand:4d} '{chunk.global_names[operand]}'")
+    elif width:
+        # 其余带参数的指令，参数都是常量池索引
+        print(f"{op_name:<16} {operand:4d} '{chunk.constants[operand]}'")
     else:
         # 无参数指令
         print(f"{op_name}")
-        return offset + 1
+    return next_offset
@@ -0,0 +1,208 @@
+# src/lucid/folding.py
+"""
+编译期常量折叠。
+
+在生成字节码之前遍历 AST，把只由字面量组成的子树求值为 Constant 节点。
+求值使用与虚拟机相同的 operations 语义；任何求值错误（单位不匹配、
+除以零、类型错误）都会让该子树保持原样，错误因此仍在运行时抛出。
+结果过大（大整数的幂、重复很多次的字符串）的运算同样留到运行时，
+条件已知的 if 表达式中不会执行的分支不被折叠。
+"""
+from . import operations
+from .ast import *
+from .runtime_types import Unit, UnitValue
+from .traversal import DispatchCache, walk
+
+_BINARY_OPERATIONS = {
+    "PLUS": operations.add,
+    "MINUS": operations.subtract,
+    "MUL": operations.multiply,
+    "DIV": operations.divide,
+    "CARET": operations.power,
+    "EQ": operations.equal,
+    "NE": operations.not_equal,
+    "GT": operations.greater,
+    "GTE": operations.greater_equal,
+    "LT": operations.less,
+    "LTE": operations.less_equal,
+}
+
+# 折叠过程中可能出现、但应推迟到运行时再报告的错误
+_DEFERRED_ERRORS = (
+    TypeError,
+    ZeroDivisionError,
+    ValueError,
+    OverflowError,
+    MemoryError,
+)
+
+# 折叠结果的上限：整数的位数，以及字符串等序列的长度。
+# 超过上限的运算不在编译期求值
+MAX_FOLDED_BITS = 1 << 16
+MAX_FOLDED_LENGTH = 1 << 16
+
+
+def fold_constants(node):
+    """返回折叠后的 AST；原始 AST 不会被修改"""
+    return ConstantFolder().fold(node)
+
+
+def constant_value(node):
+    """
+    如果节点是编译期已知的常量，返回 (True, 值)，否则返回 (False, None)。
+    """
+    if isinstance(node, (Constant, Num, Boolean, StringLiteral)):
+        return True, node.value
+    if isinstance(node, UnitNumber):
+        return True, UnitValue(node.value, Unit.named(node.unit))
+    return False, None
+
+
+def _unchanged(node):
+    return node
+
+
+def _magnitude(value):
+    return value.value if type(value) is UnitValue else value
+
+
+def _too_large(op_type, left, right):
+    """估计运算结果的大小，超过折叠上限时返回 True（不实际求值）"""
+    left, right = _magnitude(left), _magnitude(right)
+    if op_type == "CARET":
+        if type(left) is int and type(right) is int and right > 0:
+            return abs(left).bit_length() * right > MAX_FOLDED_BITS
+        return False
+    if op_type == "MUL":
+        for sequence, count in ((left, right), (right, left)):
+            if isinstance(sequence, (str, bytes, list, tuple)) and isinstance(
+                count, int
+            ):
+                return len(sequence) * count > MAX_FOLDED_LENGTH
+    return False
+
+
+class ConstantFolder:
+    """
+    fold_<节点类>(node) 返回折叠后的节点。需要先折叠子节点的方法是生成器：
+    yield 子节点后从 folded 中按 id(子节点) 取出它折叠后的结果，
+    结束前把自己的结果写入 folded[id(node)]（见 traversal.walk）。
+    """
+
+    def __init__(self):
+        self.folded = {}
+        self._folders = DispatchCache(self, "fold_", _unchanged)
+
+    def fold(self, node):
+        walk(node, self._folders, self.folded)
+        return self.folded[id(node)]
+
+    def fold_BlockStatement(self, node):
+        block = BlockStatement()
+        for statement in node.statements:
+            yield statement
+        folded = self.folded
+        block.statements = [folded[id(statement)] for statement in node.statements]
+        folded[id(node)] = block
+
+    def fold_VarAssign(self, node):
+        yield node.value_node
+        value_node = self.folded[id(node.value_node)]
+        result = node
+        if value_node is not node.value_node:
+            result = VarAssign(node.var_token, value_node)
+        self.folded[id(node)] = result
+
+    def fold_UnaryOp(self, node):
+        yield node.expr
+        self.folded[id(node)] = self._unary(node, self.folded[id(node.expr)])
+
+    @staticmethod
+    def _unary(node, expr):
+        is_constant, value = constant_value(expr)
+        if is_constant and node.op.type in ("PLUS", "MINUS"):
+            try:
+                if node.op.type == "MINUS":
+                    value = operations.negate(value)
+                return Constant(value)
+            except _DEFERRED_ERRORS:
+                pass
+        return node if expr is node.expr else UnaryOp(node.op, expr)
+
+    def fold_BinOp(self, node):
+        yield node.left
+        yield node.right
+        folded = self.folded
+        left, right = folded[id(node.left)], folded[id(node.right)]
+        folded[id(node)] = self._binary(node, left, right)
+
+    @staticmethod
+    def _binary(node, left, right):
+        operation = _BINARY_OPERATIONS.get(node.op.type)
+        left_constant, left_value = constant_value(left)
+        right_constant, right_value = constant_value(right)
+        if (
+            operation
+            and left_constant
+            and right_constant
+            and not _too_large(node.op.type, left_value, right_value)
+        ):
+            try:
+                return Constant(operation(left_value, right_value))
+            except _DEFERRED_ERRORS:
+                pass
+        if left is node.left and right is node.right:
+            return node
+        return BinOp(left, node.op, right)
+
+    def fold_FunctionLiteral(self, node):
+        yield node.body
+        body = self.folded[id(node.body)]
+        self.folded[id(node)] = FunctionLiteral(node.parameters, body)
+
+    def fold_CallExpression(self, node):
+        yield node.function
+        for argument in node.arguments:
+            yield argument
+        folded = self.folded
+        arguments = [folded[id(argument)] for argument in node.arguments]
+        folded[id(node)] = CallExpression(folded[id(node.function)], arguments)
+
+    def fold_ReturnStatement(self, node):
+        yield node.return_value
+        value = self.folded[id(node.return_value)]
+        self.folded[id(node)] = ReturnStatement(value)
+
+    def fold_SpawnExpression(self, node):
+        yield node.block
+        self.folded[id(node)] = SpawnExpression(self.folded[id(node.block)])
+
+    def fold_AwaitExpression(self, node):
+        yield node.task_expr
+        self.folded[id(node)] = AwaitExpression(self.folded[id(node.task_expr)])
+
+    def fold_IfExpression(self, node):
+        yield node.condition
+        folded = self.folded
+        condition = folded[id(node.condition)]
+        is_constant, value = constant_value(condition)
+        if is_constant:
+            # 条件已知时只折叠并保留会被执行的分支，另一个分支直接丢弃
+            if not operations.is_falsy(value):
+                branch = node.then_branch
+            else:
+                branch = node.else_branch
+            if branch is None:
+                folded[id(node)] = Constant(None)
+                return
+            yield branch
+            folded[id(node)] = folded[id(branch)]
+            return
+        yield node.then_branch
+        else_branch = None
+        if node.else_branch is not None:
+            yield node.else_branch
+            else_branch = folded[id(node.else_branch)]
+        folded[id(node)] = IfExpression(
+            condition, folded[id(node.then_branch)], else_branch
+        )
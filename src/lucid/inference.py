@@ -0,0 +1,228 @@
+# src/lucid/inference.py
+"""
+编译期的类型与单位推断。
+
+在常量折叠之后、生成字节码之前遍历 AST，为每个表达式节点推断静态类型：
+NUMBER（int 或 float）、某个 Unit（值一定是该单位的 UnitValue）、
+BOOL、STRING、NIL，或者未知（None）。编译器据此为操作数类型已知的
+运算生成省略运行时检查的专用指令，类型未知的地方仍然生成通用指令。
+
+只有字面量以及由它们经 let 定义的变量能推断出类型：读取在本段程序中
+尚未定义的全局变量、函数参数、捕获变量、函数调用与 await 的结果都是未知的。
+函数体在独立的作用域中推断，其中的全局变量一律视为未知。
+
+可以证明一定会失败的单位运算（例如 1m + 1s）记录为诊断信息；
+与常量折叠一样，错误本身仍然推迟到运行时抛出。
+"""
+from .ast import *
+from .runtime_types import DIMENSIONLESS, Unit, UnitValue
+from .traversal import DispatchCache, walk
+
+NUMBER, BOOL, STRING, NIL = "number", "bool", "string", "nil"
+
+_ADDITIVE = {"PLUS": "addition", "MINUS": "subtraction"}
+_ORDERING = ("GT", "GTE", "LT", "LTE")
+
+
+def infer_units(node):
+    """返回 (types, diagnostics)：types 把 id(节点) 映射到推断出的类型"""
+    inferrer = UnitInferrer()
+    inferrer.infer(node, {})
+    return inferrer.types, inferrer.diagnostics
+
+
+def type_of_value(value):
+    """运行时值的静态类型；bool 不是 NUMBER"""
+    kind = type(value)
+    if kind is int or kind is float:
+        return NUMBER
+    if kind is UnitValue:
+        return value.unit
+    if kind is bool:
+        return BOOL
+    if kind is str:
+        return STRING
+    if value is None:
+        return NIL
+    return None
+
+
+def _is_unit(kind):
+    return kind is not None and not isinstance(kind, str)
+
+
+def _operand_unit(kind):
+    """参与单位运算时操作数的单位；普通数字是无量纲的，其他类型为 None"""
+    if kind == NUMBER:
+        return DIMENSIONLESS
+    return kind if _is_unit(kind) else None
+
+
+def _describe(unit):
+    return "a plain number" if unit.dimensionless else str(unit)
+
+
+def _location(token):
+    if token.line:
+        return f" at line {token.line}, column {token.column}"
+    return ""
+
+
+def _unknown(node):
+    return None
+
+
+class UnitInferrer:
+    """
+    infer_<节点类>(node) 返回节点的类型。需要子节点类型的方法是生成器：
+    yield 子节点后从 types 中按 id(子节点) 读取它的类型，
+    结束前把自己的类型写入 types[id(node)]（见 traversal.walk）。
+    env 是当前作用域，把变量名映射到类型。
+    """
+
+    def __init__(self):
+        self.types = {}
+        self.diagnostics = []
+        self.env = {}
+        self._inferrers = DispatchCache(self, "infer_", _unknown)
+
+    def infer(self, node, env):
+        """推断 node 的类型并记录到 types 中；env 把变量名映射到类型"""
+        self.env = env
+        walk(node, self._inferrers, self.types)
+        return self.types[id(node)]
+
+    def _scoped(self, node, env):
+        """在作用域 env 中推断 node，之后恢复当前作用域"""
+        outer, self.env = self.env, env
+        try:
+            yield node
+        finally:
+            self.env = outer
+
+    def report(self, message, token):
+        self.diagnostics.append(message + _location(token))
+
+    def infer_Num(self, node):
+        return type_of_value(node.value)
+
+    def infer_Constant(self, node):
+        return type_of_value(node.value)
+
+    def infer_Boolean(self, node):
+        return BOOL
+
+    def infer_StringLiteral(self, node):
+        return STRING
+
+    def infer_UnitNumber(self, node):
+        if type_of_value(node.value) != NUMBER:
+            return None
+        return Unit.named(node.unit)
+
+    def infer_VarAccess(self, node):
+        return self.env.get(node.var_name)
+
+    def infer_VarAssign(self, node):
+        env = self.env
+        yield node.value_node
+        env[node.var_name] = self.types[id(node.value_node)]
+        self.types[id(node)] = None
+
+    def infer_BlockStatement(self, node):
+        for statement in node.statements:
+            yield statement
+        statements = node.statements
+        kind = NIL
+        if statements and not isinstance(statements[-1], VarAssign):
+            kind = self.types[id(statements[-1])]
+        self.types[id(node)] = kind
+
+    def infer_IfExpression(self, node):
+        env = self.env
+        yield node.condition
+        then_env, else_env = dict(env), dict(env)
+        yield from self._scoped(node.then_branch, then_env)
+        then_kind, else_kind = self.types[id(node.then_branch)], NIL
+        if node.else_branch is not None:
+            yield from self._scoped(node.else_branch, else_env)
+            else_kind = self.types[id(node.else_branch)]
+        # 只有两个分支之后类型一致的变量保留已知类型
+        for name in then_env.keys() | else_env.keys():
+            then_type, else_type = then_env.get(name), else_env.get(name)
+            env[name] = then_type if then_type == else_type else None
+        self.types[id(node)] = then_kind if then_kind == else_kind else None
+
+    def infer_FunctionLiteral(self, node):
+        yield from self._scoped(node.body, {})
+        self.types[id(node)] = None
+
+    def infer_SpawnExpression(self, node):
+        yield from self._scoped(node.block, {})
+        self.types[id(node)] = None
+
+    def infer_AwaitExpression(self, node):
+        yield node.task_expr
+        self.types[id(node)] = None
+
+    def infer_CallExpression(self, node):
+        yield node.function
+        for argument in node.arguments:
+            yield argument
+        self.types[id(node)] = None
+
+    def infer_ReturnStatement(self, node):
+        yield node.return_value
+        self.types[id(node)] = None
+
+    def infer_UnaryOp(self, node):
+        yield node.expr
+        kind = self.types[id(node.expr)]
+        if node.op.type in ("PLUS", "MINUS") and (kind == NUMBER or _is_unit(kind)):
+            self.types[id(node)] = kind
+        else:
+            self.types[id(node)] = None
+
+    def infer_BinOp(self, node):
+        yield node.left
+        yield node.right
+        types = self.types
+        left, right = types[id(node.left)], types[id(node.right)]
+        types[id(node)] = self._binary(node, left, right)
+
+    def _binary(self, node, left, right):
+        op_type = node.op.type
+        if op_type in ("EQ", "NE"):
+            # 任一操作数未知时可能是 UnitArray，结果是逐元素的数组
+            return BOOL if left is not None and right is not None else None
+        unit_a, unit_b = _operand_unit(left), _operand_unit(right)
+        if unit_a is None or unit_b is None:
+            return None
+        if op_type in _ADDITIVE or op_type in _ORDERING:
+            if unit_a.ratio(unit_b) is None:
+                if op_type in _ADDITIVE:
+                    message = f"Incompatible units for {_ADDITIVE[op_type]}"
+                else:
+                    message = "Cannot compare values with different units"
+                described = f"{_describe(unit_a)} and {_describe(unit_b)}"
+                self.report(f"{message}: {described}", node.op)
+                return None
+            return BOOL if op_type in _ORDERING else _result(unit_a)
+        if op_type == "MUL":
+            return _result(unit_a.multiply(unit_b))
+        if op_type == "DIV":
+            return _result(unit_a.divide(unit_b))
+        if op_type == "CARET":
+            if not unit_b.dimensionless:
+                self.report(f"Exponent must be a scalar: {_describe(unit_b)}", node.op)
+                return None
+            # 结果的单位取决于指数的值，只有整数常量指数可以推断
+            exponent = node.right
+            if isinstance(exponent, (Num, Constant)) and type(exponent.value) is int:
+                return _result(unit_a.power(exponent.value))
+        return None
+
+
+def _result(unit):
+    # 与 operations.make_value 一致：量纲为零的结果是普通数字
+    return NUMBER if unit.scale is not None else unit
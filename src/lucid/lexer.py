@@ -1,72 +1,394 @@
 # src/lucid/lexer.py
+import mmap
 import re
-from .core_types import Token
+import string
+from array import array
+from .core_types import Token, TokenArrays
+
+# 令牌规则只在模块加载时编译一次，所有 Lexer 实例共享。
+# 关键字不再单独写成 \bfn\b 这样的分支，而是先匹配 IDENTIFIER，再查 KEYWORDS 表。
+TOKEN_SPECS = [
+    ("STRING", r'"[^"]*"'),
+    # *** BUG FIX: 使用更强大的正则表达式来同时匹配浮点数和整数 ***
+    # 我们将 'INTEGER' 重命名为 'NUMBER'
+    ("NUMBER", r"\d+(?:\.\d*)?|\.\d+"),
+    ("IDENTIFIER", r"[a-zA-Z_][a-zA-Z0-9_]*"),
+    ("PIPE", r"\|>"),
+    ("EQ", r"=="),
+    ("NE", r"!="),
+    ("GTE", r">="),
+    ("LTE", r"<="),
+    ("GT", r">"),
+    ("LT", r"<"),
+    ("PLUS", r"\+"),
+    ("MINUS", r"-"),
+    ("MUL", r"\*"),
+    ("DIV", r"/"),
+    ("CARET", r"\^"),
+    ("EQUALS", r"="),
+    ("LPAREN", r"\("),
+    ("RPAREN", r"\)"),
+    ("LBRACE", r"\{"),
+    ("RBRACE", r"\}"),
+    ("COMMA", r","),
+    ("SEMICOLON", r";"),
+]
+
+KEYWORDS = {
+    "fn": "FN",
+    "let": "LET",
+    "true": "TRUE",
+    "false": "FALSE",
+    "if": "IF",
+    "else": "ELSE",
+    "then": "THEN",
+    "return": "RETURN",
+    "spawn": "SPAWN",
+    "await": "AWAIT",
+}
+
+# 空白作为每个令牌的前缀一起被吞掉，不再单独产生 SKIP 匹配；
+# 无法识别的字符和以前一样被跳过
+SKIP_PATTERN = r"[ \t\r\n\u00A0]*"
+TOKEN_PATTERN = SKIP_PATTERN + "(?:" + "|".join(
+    f"(?P<{name}>{pattern})" for name, pattern in TOKEN_SPECS
+) + ")"
+MASTER_REGEX = re.compile(TOKEN_PATTERN)
+
+# 批量模式中令牌类型用小整数编码，TOKEN_TYPES[code] 即类型名
+TOKEN_TYPES = [name for name, _ in TOKEN_SPECS] + sorted(set(KEYWORDS.values()))
+TOKEN_TYPES.append("EOF")
+TOKEN_TYPE_CODES = {name: code for code, name in enumerate(TOKEN_TYPES)}
+_KEYWORD_CODES = {word: TOKEN_TYPE_CODES[kind] for word, kind in KEYWORDS.items()}
+_IDENTIFIER_CODE = TOKEN_TYPE_CODES["IDENTIFIER"]
+_NUMBER_CODE = TOKEN_TYPE_CODES["NUMBER"]
+_STRING_CODE = TOKEN_TYPE_CODES["STRING"]
+_TRUE_CODE = TOKEN_TYPE_CODES["TRUE"]
+_FALSE_CODE = TOKEN_TYPE_CODES["FALSE"]
+_EOF_CODE = TOKEN_TYPE_CODES["EOF"]
+
+# 批量模式使用 findall：每个匹配返回 (前导空白, 令牌文本)，末尾的 "." 分支
+# 吞掉无法识别的字符，从而可以用累加长度的方式得到精确的偏移量
+_BULK_REGEX = re.compile(
+    f"({SKIP_PATTERN})(" + "|".join(pattern for _, pattern in TOKEN_SPECS) + "|.)",
+    re.DOTALL,
+)
+# 运算符与标点的文本是固定的，直接查表得到类型编码
+_PUNCTUATION_CODES = {
+    pattern.replace("\\", ""): TOKEN_TYPE_CODES[name]
+    for name, pattern in TOKEN_SPECS
+    if name not in ("STRING", "NUMBER", "IDENTIFIER")
+}
+_IDENTIFIER_START = frozenset(string.ascii_letters + "_")
+_NUMBER_START = frozenset(string.digits + ".")
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == "_"
+
+
+def convert_value(type, value):
+    """把匹配到的原始文本转换为令牌值"""
+    if type == "NUMBER":
+        # 如果值包含小数点，就转换为 float，否则转换为 int
+        return float(value) if "." in value else int(value)
+    if type == "TRUE":
+        return True
+    if type == "FALSE":
+        return False
+    if type == "STRING":
+        return value[1:-1]
+    return value
 
 
 class Lexer:
-    """词法分析器 (v4.0 - 最终修复版，支持浮点数)"""
+    """词法分析器 (v5.0 - 预编译正则与关键字表)"""
 
     def __init__(self, text):
         self.text = text
-        self.token_specs = [
-            ("SKIP", r"[ \t\r\n\u00A0]+"),
-            ("STRING", r'"[^"]*"'),
-            # *** BUG FIX: 使用更强大的正则表达式来同时匹配浮点数和整数 ***
-            # 我们将 'INTEGER' 重命名为 'NUMBER'
-            ("NUMBER", r"\d+(\.\d*)?|\.\d+"),
-            ("FN", r"\bfn\b"),
-            ("LET", r"\blet\b"),
-            ("TRUE", r"\btrue\b"),
-            ("FALSE", r"\bfalse\b"),
-            ("IF", r"\bif\b"),
-            ("ELSE", r"\belse\b"),
-            ("THEN", r"\bthen\b"),
-            ("RETURN", r"\breturn\b"),
-            ("SPAWN", r"\bspawn\b"),
-            ("AWAIT", r"\bawait\b"),
-            ("IDENTIFIER", r"[a-zA-Z_][a-zA-Z0-9_]*"),
-            ("PIPE", r"\|>"),
-            ("EQ", r"=="),
-            ("NE", r"!="),
-            ("GTE", r">="),
-            ("LTE", r"<="),
-            ("GT", r">"),
-            ("LT", r"<"),
-            ("PLUS", r"\+"),
-            ("MINUS", r"-"),
-            ("MUL", r"\*"),
-            ("DIV", r"/"),
-            ("CARET", r"\^"),
-            ("EQUALS", r"="),
-            ("LPAREN", r"\("),
-            ("RPAREN", r"\)"),
-            ("LBRACE", r"\{"),
-            ("RBRACE", r"\}"),
-            ("COMMA", r","),
-            ("SEMICOLON", r";"),
-        ]
-        self.token_regex = "|".join(
-            f"(?P<{name}>{pattern})" for name, pattern in self.token_specs
+        self.token_specs = TOKEN_SPECS
+        self.token_regex = TOKEN_PATTERN
+
+    @classmethod
+    def from_file(cls, path, chunk_size=None, use_mmap=True):
+        """
+        返回一个从文件流式读取的 FileLexer，适合无法整体载入内存的大型源文件。
+        """
+        return FileLexer(path, chunk_size or DEFAULT_CHUNK_SIZE, use_mmap)
+
+    def get_token_stream(self):
+        text = self.text
+        # 行号与列号从 1 开始，边扫描边累计，不需要第二遍扫描
+        line, line_start, pos = 1, 0, 0
+        for match in MASTER_REGEX.finditer(text):
+            type = match.lastgroup
+            start, pos_end = match.span(type)
+            newlines = text.count("\n", pos, start)
+            if newlines:
+                line += newlines
+                line_start = text.rfind("\n", pos, start) + 1
+            column = start - line_start + 1
+            value = match.group(type)
+            if type == "IDENTIFIER":
+                kind = KEYWORDS.get(value)
+                # 与旧的单词边界规则保持一致：紧跟在数字后面的单词（如 10if）不是关键字
+                if kind is not None:
+                    if not (start > 0 and _is_word_char(text[start - 1])):
+                        type, value = kind, convert_value(kind, value)
+            elif type == "NUMBER":
+                # *** BUG FIX: 正确转换数字类型 ***
+                value = float(value) if "." in value else int(value)
+            elif type == "STRING":
+                value = value[1:-1]
+            yield Token(type, value, line, column)
+            if type == "STRING" and "\n" in value:
+                # 字符串字面量可以跨行；+2 跳过开头的引号与换行符本身
+                line += value.count("\n")
+                line_start = start + value.rfind("\n") + 2
+            pos = pos_end
+        newlines = text.count("\n", pos)
+        if newlines:
+            line += newlines
+            line_start = text.rfind("\n", pos) + 1
+        yield Token("EOF", None, line, len(text) - line_start + 1)
+
+    def tokenize_arrays(self):
+        """
+        批量模式：一次性扫描整个源码，返回 TokenArrays。
+        类型、值与起始偏移量分别存放在三个并行数组中，不创建 Token 对象。
+        """
+        text = self.text
+        types = array("B")
+        offsets = array("q")
+        values = []
+        append_type, append_offset, append_value = (
+            types.append,
+            offsets.append,
+            values.append,
         )
+        pos = 0
+        for skipped, lexeme in _BULK_REGEX.findall(text):
+            start = pos + len(skipped)
+            pos = start + len(lexeme)
+            code = _PUNCTUATION_CODES.get(lexeme)
+            if code is not None:
+                value = lexeme
+            else:
+                first = lexeme[0]
+                if first in _IDENTIFIER_START:
+                    code, value = _IDENTIFIER_CODE, lexeme
+                    keyword = _KEYWORD_CODES.get(lexeme)
+                    if keyword is not None and not (
+                        start > 0 and _is_word_char(text[start - 1])
+                    ):
+                        code = keyword
+                        if code == _TRUE_CODE:
+                            value = True
+                        elif code == _FALSE_CODE:
+                            value = False
+                elif first in _NUMBER_START and lexeme != ".":
+                    code = _NUMBER_CODE
+                    value = float(lexeme) if "." in lexeme else int(lexeme)
+                elif first == '"' and len(lexeme) > 1:
+                    code, value = _STRING_CODE, lexeme[1:-1]
+                else:
+                    # 无法识别的字符，与 get_token_stream 一样跳过
+                    continue
+            append_type(code)
+            append_offset(start)
+            append_value(value)
+        append_type(_EOF_CODE)
+        append_offset(len(text))
+        append_value(None)
+        return TokenArrays(TOKEN_TYPES, types, values, offsets, text)
+
+
+# --- 基于文件的流式词法分析 ---
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+# 流式词法分析中字符串字面量（含引号）的最大字节数；
+# 分块读取时未读完的字符串最多缓存这么多字节
+MAX_STRING_LENGTH = 1 << 20
+
+# 字节版本的令牌规则；不间断空格在 UTF-8 中占两个字节
+_BYTES_REGEX = re.compile(
+    rb"(?:[ \t\r\n]|\xc2\xa0)*(?:"
+    + b"|".join(
+        f"(?P<{name}>{pattern})".encode("ascii") for name, pattern in TOKEN_SPECS
+    )
+    + b")"
+)
+_WORD_BYTES = frozenset((string.ascii_letters + string.digits + "_").encode("ascii"))
+
+
+def _last_char(data, end):
+    """data[:end] 中最后一个 UTF-8 字符；data[:end] 为空时返回 None"""
+    if end <= 0:
+        return None
+    start = end - 1
+    while start > 0 and end - start < 4 and 0x80 <= data[start] < 0xC0:
+        start -= 1
+    return data[start:end].decode("utf-8", "replace")[-1]
+
+
+def _continuation_bytes(data):
+    """统计 UTF-8 续字节的数量，用来把字节列号换算成字符列号"""
+    if data.isascii():
+        return 0
+    return sum(1 for byte in data if 0x80 <= byte < 0xC0)
+
+
+class FileLexer:
+    """
+    从文件流式读取源码的词法分析器。
+
+    优先使用 mmap 直接在文件映射上匹配令牌，不会把整个文件复制进内存；
+    文件无法映射时（例如空文件、管道）退化为按块读取，内存占用以
+    chunk_size 加上一个未完成令牌的长度为上限。
+    令牌的 line / column 在扫描时增量计算，列号按字符计数。
+
+    为了让未完成令牌的长度有上限，字符串字面量不能超过 max_string_length
+    字节；未闭合或过长的字符串在其开头引号处报告 SyntaxError，
+    而不是像字符串词法分析器那样把引号当作无法识别的字符跳过。
+    """
+
+    max_string_length = MAX_STRING_LENGTH
+
+    def __init__(self, path, chunk_size=DEFAULT_CHUNK_SIZE, use_mmap=True):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.use_mmap = use_mmap
 
     def get_token_stream(self):
-        for match in re.finditer(self.token_regex, self.text):
-            type, value = match.lastgroup, match.group()
-            if type == "SKIP":
+        # 当前行号、当前行起始的字节偏移，以及该行中已出现的 UTF-8 续字节数
+        self._line, self._line_start, self._wide = 1, 0, 0
+        # 上一块最后一个字符，用于判断块首的关键字是否紧跟在单词字符之后
+        self._previous_char = None
+        with open(self.path, "rb") as source:
+            mapped = self._map(source) if self.use_mmap else None
+            if mapped is not None:
+                with mapped:
+                    end = yield from self._scan(mapped, 0, final=True)
+            else:
+                end = yield from self._scan_chunks(source)
+        yield Token("EOF", None, self._line, self._column(end))
+
+    @staticmethod
+    def _map(source):
+        try:
+            return mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # 空文件或不支持映射的文件对象
+            return None
+
+    def _scan_chunks(self, source):
+        leftover, base = bytearray(), 0
+        # 为 True 时 leftover 是一个以引号开头、尚未闭合的字符串
+        self._string_open = False
+        while True:
+            block = source.read(self.chunk_size)
+            if self._string_open and block and b'"' not in block:
+                # 字符串仍未闭合，只追加新块，不重新扫描
+                leftover += block
+                if len(leftover) > self.max_string_length:
+                    self._string_error(self._line, self._column(base))
                 continue
+            data = bytes(leftover) + block
+            self._string_open = False
+            consumed = yield from self._scan(data, base, final=not block)
+            if not block:
+                return base + consumed
+            if consumed:
+                self._previous_char = _last_char(data, consumed)
+            leftover, base = bytearray(data[consumed:]), base + consumed
 
-            # *** BUG FIX: 正确转换数字类型 ***
-            if type == "NUMBER":
-                # 如果值包含小数点，就转换为 float，否则转换为 int
-                if "." in value:
-                    value = float(value)
-                else:
-                    value = int(value)
-            elif type == "TRUE":
-                value = True
-            elif type == "FALSE":
-                value = False
+    def _column(self, offset):
+        return offset - self._line_start - self._wide + 1
+
+    def _advance(self, data, offset):
+        """越过一段不产生令牌的字节（空白、无法识别的字符或字符串内容）"""
+        newline = data.rfind(b"\n")
+        if newline >= 0:
+            self._line += data.count(b"\n")
+            self._line_start = offset + newline + 1
+            self._wide = _continuation_bytes(data[newline + 1 :])
+        else:
+            self._wide += _continuation_bytes(data)
+
+    def _follows_word(self, data, start):
+        """与字符串词法分析器相同的单词边界规则，前一个字符可以是非 ASCII 字母"""
+        if start > 0 and data[start - 1] < 0x80:
+            return data[start - 1] in _WORD_BYTES
+        previous = _last_char(data, start) if start > 0 else self._previous_char
+        return previous is not None and _is_word_char(previous)
+
+    def _scan(self, data, base, final):
+        """
+        扫描 data 中的令牌并逐个产出，返回已消费的字节数。
+        final 为 False 时，可能被块边界截断的最后一个令牌会留给下一块。
+        """
+        pos = 0
+        for match in _BYTES_REGEX.finditer(data):
+            type = match.lastgroup
+            start, end = match.span(type)
+            gap = data[pos:start]
+            if b'"' in gap:
+                # 跳过的引号之后没有闭合引号：字符串还没读完，或者未闭合
+                return self._open_string(data, base, pos, gap, final)
+            if not final and end == len(data):
+                # 令牌可能被块边界截断
+                break
+            if b"\n" in gap or not gap.isascii():
+                self._advance(gap, base + pos)
+            column = self._column(base + start)
+            line = self._line
+            lexeme = data[start:end]
+            if type == "IDENTIFIER":
+                value = lexeme.decode("ascii")
+                kind = KEYWORDS.get(value)
+                if kind is not None and not self._follows_word(data, start):
+                    type, value = kind, convert_value(kind, value)
+            elif type == "NUMBER":
+                value = float(lexeme) if b"." in lexeme else int(lexeme)
             elif type == "STRING":
-                value = value[1:-1]
-            yield Token(type, value)
-        yield Token("EOF", None)
+                if end - start > self.max_string_length:
+                    self._string_error(line, column)
+                self._advance(lexeme, base + start)
+                value = lexeme[1:-1].decode("utf-8")
+            else:
+                value = lexeme.decode("ascii")
+            yield Token(type, value, line, column)
+            pos = end
+        tail = data[pos:]
+        if b'"' in tail:
+            return self._open_string(data, base, pos, tail, final)
+        if final:
+            self._advance(tail, base + pos)
+            return len(data)
+        return pos
+
+    def _open_string(self, data, base, pos, gap, final):
+        """
+        处理 gap 中没有闭合引号的 "。不是最后一块且缓存未超过上限时，
+        只消费到引号为止，引号之后的内容与下一块拼接后重新扫描；
+        否则在引号处报错。
+        """
+        quote = pos + gap.index(b'"')
+        self._advance(data[pos:quote], base + pos)
+        length = len(data) - quote
+        if not final and length <= self.max_string_length:
+            self._string_open = True
+            return quote
+        line, column = self._line, self._column(base + quote)
+        if length > self.max_string_length:
+            self._string_error(line, column)
+        raise SyntaxError(
+            f"Lexer Error: Unterminated string at line {line}, column {column}."
+        )
+
+    def _string_error(self, line, column):
+        raise SyntaxError(
+            f"Lexer Error: String longer than {self.max_string_length} bytes "
+            f"at line {line}, column {column}."
+        )
@@ -0,0 +1,167 @@
+# src/lucid/operations.py
+"""
+虚拟机与编译期共享的运算语义。
+
+所有算术与比较都遵循同一套单位规则：普通数字视为无量纲的 UnitValue，
+加减与比较要求量纲一致（单位不同时右操作数先换算到左操作数的单位），
+乘除合并单位，结果若为无量纲则退化为普通数字。
+
+UnitArray 通过自身的运算符方法实现同样的规则；这里只在它与 UnitValue
+相遇时把运算转交给它。
+"""
+from .arrays import UnitArray
+from .runtime_types import DIMENSIONLESS, Unit, UnitValue
+
+
+def _parts(value):
+    if type(value) is UnitValue:
+        return value.value, value.unit
+    return value, DIMENSIONLESS
+
+
+def _has_array(a, b):
+    return type(a) is UnitArray or type(b) is UnitArray
+
+
+def make_value(value, unit):
+    """
+    由数值与单位构造运算结果。无量纲的结果退化为普通数字；
+    km/m 这类量纲为零的单位先乘上换算系数。
+    """
+    if unit.scale is None:
+        return UnitValue(value, unit)
+    return value if unit.dimensionless else value * unit.scale
+
+
+def _convert(value, unit, target, message):
+    # 把以 unit 为单位的 value 换算到 target，量纲不同时报告 message
+    ratio = target.ratio(unit)
+    if ratio is None:
+        raise TypeError(message)
+    return value * ratio
+
+
+def add(a, b):
+    if type(a) is not UnitValue and type(b) is not UnitValue:
+        return a + b
+    if _has_array(a, b):
+        return a + b
+    (value_a, unit_a), (value_b, unit_b) = _parts(a), _parts(b)
+    if unit_a is not unit_b:
+        value_b = _convert(
+            value_b, unit_b, unit_a, "Incompatible units for addition."
+        )
+    return make_value(value_a + value_b, unit_a)
+
+
+def subtract(a, b):
+    if type(a) is not UnitValue and type(b) is not UnitValue:
+        return a - b
+    if _has_array(a, b):
+        return a - b
+    (value_a, unit_a), (value_b, unit_b) = _parts(a), _parts(b)
+    if unit_a is not unit_b:
+        value_b = _convert(
+            value_b, unit_b, unit_a, "Incompatible units for subtraction."
+        )
+    return make_value(value_a - value_b, unit_a)
+
+
+def multiply(a, b):
+    if type(a) is not UnitValue and type(b) is not UnitValue:
+        return a * b
+    if _has_array(a, b):
+        return a * b
+    (value_a, unit_a), (value_b, unit_b) = _parts(a), _parts(b)
+    return make_value(value_a * value_b, unit_a.multiply(unit_b))
+
+
+def divide(a, b):
+    if type(a) is not UnitValue and type(b) is not UnitValue:
+        if type(b) is not UnitArray and b == 0:
+            raise ZeroDivisionError("Division by zero.")
+        return a / b
+    if _has_array(a, b):
+        return a / b
+    (value_a, unit_a), (value_b, unit_b) = _parts(a), _parts(b)
+    if value_b == 0:
+        raise ZeroDivisionError("Division by zero.")
+    return make_value(value_a / value_b, unit_a.divide(unit_b))
+
+
+def power(a, b):
+    if type(a) is not UnitValue and type(b) is not UnitValue:
+        return a**b
+    if _has_array(a, b):
+        return a**b
+    (value_a, unit_a), (value_b, unit_b) = _parts(a), _parts(b)
+    if not unit_b.dimensionless:
+        raise TypeError("Exponent must be a scalar.")
+    return make_value(value_a**value_b, unit_a.power(value_b))
+
+
+def negate(value):
+    if isinstance(value, UnitValue):
+        return UnitValue(-value.value, value.unit)
+    return -value
+
+
+def equal(a, b):
+    if type(b) is UnitArray:
+        # UnitValue.__eq__ 不认识 UnitArray，交换操作数由数组逐元素比较
+        return b == a
+    return a == b
+
+
+def greater(a, b):
+    if type(a) is not UnitValue and type(b) is not UnitValue:
+        return a > b
+    if _has_array(a, b):
+        return a > b
+    (value_a, unit_a), (value_b, unit_b) = _parts(a), _parts(b)
+    if unit_a is not unit_b:
+        value_b = _convert(
+            value_b, unit_b, unit_a, "Cannot compare values with different units."
+        )
+    return value_a > value_b
+
+
+def less(a, b):
+    if type(a) is not UnitValue and type(b) is not UnitValue:
+        return a < b
+    if _has_array(a, b):
+        return a < b
+    (value_a, unit_a), (value_b, unit_b) = _parts(a), _parts(b)
+    if unit_a is not unit_b:
+        value_b = _convert(
+            value_b, unit_b, unit_a, "Cannot compare values with different units."
+        )
+    return value_a < value_b
+
+
+def not_equal(a, b):
+    if _has_array(a, b):
+        return b != a if type(b) is UnitArray else a != b
+    return is_falsy(a == b)
+
+
+def greater_equal(a, b):
+    if _has_array(a, b):
+        return a >= b
+    return is_falsy(less(a, b))
+
+
+def less_equal(a, b):
+    if _has_array(a, b):
+        return a <= b
+    return is_falsy(greater(a, b))
+
+
+def logical_not(value):
+    if type(value) is UnitArray:
+        return value.logical_not()
+    return is_falsy(value)
+
+
+def is_falsy(value):
+    return value is None or value is False
@@ -0,0 +1,129 @@
+# src/lucid/optimizer.py
+"""
+字节码窥孔优化器。
+
+在 Compiler.compile 之后运行，把编译器输出的固定指令序列融合为超级指令：
+
+    OP_EQUAL,   OP_NOT                        -> OP_NOT_EQUAL
+    OP_LESS,    OP_NOT                        -> OP_GREATER_EQUAL
+    OP_GREATER, OP_NOT                        -> OP_LESS_EQUAL
+    （单位推断生成的 *_NUMBER / *_UNIT 比较同样融合为对应的类型专用指令）
+    OP_CONSTANT, OP_CONSTANT, OP_BUILD_UNIT_VALUE -> OP_UNIT_CONSTANT
+
+融合不会跨越跳转目标，重新布局后所有跳转距离都会被重新计算。
+"""
+from .chunk import JUMP_OPCODES, OpCode, instruction_length
+from .runtime_types import Unit, UnitValue
+
+_NEGATED_COMPARISONS = {
+    OpCode.OP_EQUAL: OpCode.OP_NOT_EQUAL,
+    OpCode.OP_LESS: OpCode.OP_GREATER_EQUAL,
+    OpCode.OP_GREATER: OpCode.OP_LESS_EQUAL,
+    OpCode.OP_LESS_NUMBER: OpCode.OP_GREATER_EQUAL_NUMBER,
+    OpCode.OP_GREATER_NUMBER: OpCode.OP_LESS_EQUAL_NUMBER,
+    OpCode.OP_LESS_UNIT: OpCode.OP_GREATER_EQUAL_UNIT,
+    OpCode.OP_GREATER_UNIT: OpCode.OP_LESS_EQUAL_UNIT,
+}
+
+
+class Instruction:
+    """解码后的一条指令：原始偏移量、操作码与操作数字节"""
+
+    def __init__(self, offset, opcode, operands):
+        self.offset, self.opcode, self.operands = offset, opcode, operands
+
+    def jump_target(self):
+        """跳转指令的绝对目标偏移量（基于原始布局）"""
+        distance = int.from_bytes(self.operands, "big")
+        return self.offset + 1 + len(self.operands) + distance
+
+
+def decode(chunk):
+    """把 chunk.code 解码为 Instruction 列表"""
+    code = chunk.code
+    instructions = []
+    offset = 0
+    while offset < len(code):
+        opcode = code[offset]
+        length = instruction_length(opcode)
+        operands = bytes(code[offset + 1 : offset + length])
+        instructions.append(Instruction(offset, opcode, operands))
+        offset += length
+    return instructions
+
+
+def optimize_chunk(chunk):
+    """
+    对 chunk 原地执行窥孔优化并返回它。
+    """
+    instructions = decode(chunk)
+    jump_targets = {
+        ins.jump_target() for ins in instructions if ins.opcode in JUMP_OPCODES
+    }
+
+    fused = []
+    i = 0
+    while i < len(instructions):
+        ins = instructions[i]
+        nxt = instructions[i + 1] if i + 1 < len(instructions) else None
+
+        # 比较 + 取反 -> 单条比较指令
+        if (
+            ins.opcode in _NEGATED_COMPARISONS
+            and nxt is not None
+            and nxt.opcode == OpCode.OP_NOT
+            and nxt.offset not in jump_targets
+        ):
+            opcode = _NEGATED_COMPARISONS[ins.opcode]
+            fused.append(Instruction(ins.offset, opcode, b""))
+            i += 2
+            continue
+
+        # 数值常量 + 单位名常量 + 构建 -> 预构建的 UnitValue 常量
+        if ins.opcode == OpCode.OP_CONSTANT and i + 2 < len(instructions):
+            unit_ins, build_ins = nxt, instructions[i + 2]
+            if (
+                unit_ins.opcode == OpCode.OP_CONSTANT
+                and build_ins.opcode == OpCode.OP_BUILD_UNIT_VALUE
+                and unit_ins.offset not in jump_targets
+                and build_ins.offset not in jump_targets
+                and len(chunk.constants) <= 255
+            ):
+                value = UnitValue(
+                    chunk.constants[ins.operands[0]],
+                    Unit.named(chunk.constants[unit_ins.operands[0]]),
+                )
+                index = chunk.add_constant(value)
+                fused.append(
+                    Instruction(ins.offset, OpCode.OP_UNIT_CONSTANT, bytes([index]))
+                )
+                i += 3
+                continue
+
+        fused.append(ins)
+        i += 1
+
+    chunk.code = _assemble(fused, len(chunk.code))
+    return chunk
+
+
+def _assemble(instructions, old_length):
+    """按新布局重新编码指令，并修正所有跳转距离"""
+    new_offsets = {}
+    offset = 0
+    for ins in instructions:
+        new_offsets[ins.offset] = offset
+        offset += 1 + len(ins.operands)
+    new_offsets[old_length] = offset
+
+    code = bytearray()
+    for ins in instructions:
+        code.append(ins.opcode)
+        if ins.opcode in JUMP_OPCODES:
+            # 融合只会缩短代码，原宽度一定放得下新的跳转距离
+            width = len(ins.operands)
+            distance = new_offsets[ins.jump_target()] - (len(code) + width)
+            code.extend(distance.to_bytes(width, "big"))
+        else:
+            code.extend(ins.operands)
+    return code
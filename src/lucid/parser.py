@@ -2,6 +2,28 @@
 from .core_types import Token
 from .ast import *
 
+# 二元运算符的 (左结合力, 右结合力)，数值越大结合越紧。
+# 左结合运算符的右结合力高于左结合力，使 a - b - c 先归约左侧；
+# 右结合的 ^ 相反，2 ^ 3 ^ 2 先归约右侧。
+# 一元运算符比所有二元运算符结合得更紧（-2^2 是 (-2)^2），不在表中。
+_BINDING_POWERS = {
+    "PIPE": (1, 2),
+    "EQ": (3, 4),
+    "NE": (3, 4),
+    "GT": (5, 6),
+    "GTE": (5, 6),
+    "LT": (5, 6),
+    "LTE": (5, 6),
+    "PLUS": (7, 8),
+    "MINUS": (7, 8),
+    "MUL": (9, 10),
+    "DIV": (9, 10),
+    "CARET": (12, 11),
+}
+
+# 可以出现在操作数之前的令牌：一元运算符与左括号
+_OPERAND_PREFIXES = frozenset(("PLUS", "MINUS", "AWAIT", "LPAREN"))
+
 
 class Parser:
     """语法分析器 (v3.5 - 最终修复版)"""
@@ -16,10 +38,18 @@ class Parser:
         else:
             raise SyntaxError(
                 f"Parser Error: Expected {token_type}, but found {self.current_token.type} ({self.current_token.value})"
+                + self._location(self.current_token)
             )
 
+    @staticmethod
+    def _location(token):
+        """令牌带有位置信息时，返回附加到错误信息中的位置描述"""
+        if token.line:
+            return f" at line {token.line}, column {token.column}"
+        return ""
+
     def _primary(self):
-        """处理原子表达式，这是语法的最高优先级部分"""
+        """处理原子表达式；括号分组由 _expression 处理"""
         token = self.current_token
         if token.type == "NUMBER":
             self._eat("NUMBER")
@@ -37,11 +67,6 @@ class Parser:
         elif token.type == "STRING":
             self._eat("STRING")
             return StringLiteral(token)
-        elif token.type == "LPAREN":
-            self._eat("LPAREN")
-            node = self._expression()
-            self._eat("RPAREN")
-            return node
         elif token.type == "FN":
             return self._function()
         elif token.type == "IF":
@@ -50,11 +75,12 @@ class Parser:
             return self._block()
         elif token.type == "SPAWN":
             return self._spawn()
-        raise SyntaxError(f"Invalid primary expression at {token}")
+        raise SyntaxError(
+            f"Invalid primary expression at {token}" + self._location(token)
+        )
 
-    def _call(self):
-        """处理函数调用"""
-        node = self._primary()
+    def _calls(self, node):
+        """处理紧跟在操作数之后的函数调用（可以连续调用）"""
         while self.current_token.type == "LPAREN":
             self._eat("LPAREN")
             args = []
@@ -67,69 +93,65 @@ class Parser:
             node = CallExpression(node, args)
         return node
 
-    def _unary(self):
-        """处理一元运算符，包括 await"""
-        token = self.current_token
-        if token.type in ("PLUS", "MINUS"):
-            self._eat(token.type)
-            return UnaryOp(token, self._unary())
-        if token.type == "AWAIT":
-            self._eat("AWAIT")
-            return AwaitExpression(self._unary())
-        return self._call()
-
-    def _power(self):
-        """处理幂运算 (右结合)"""
-        node = self._unary()
-        if self.current_token.type == "CARET":
-            op = self.current_token
-            self._eat("CARET")
-            node = BinOp(node, op, self._power())
-        return node
-
-    def _factor(self):
-        node = self._power()
-        while self.current_token.type in ("MUL", "DIV"):
-            op = self.current_token
-            self._eat(op.type)
-            node = BinOp(node, op, self._power())
-        return node
-
-    def _term(self):
-        node = self._factor()
-        while self.current_token.type in ("PLUS", "MINUS"):
-            op = self.current_token
-            self._eat(op.type)
-            node = BinOp(node, op, self._factor())
-        return node
-
-    def _comparison(self):
-        node = self._term()
-        while self.current_token.type in ("GT", "GTE", "LT", "LTE"):
-            op = self.current_token
-            self._eat(op.type)
-            node = BinOp(node, op, self._term())
-        return node
-
-    def _equality(self):
-        # *** BUG FIX: 使用 '_comparison' 而不是 'comparison' ***
-        node = self._comparison()
-        while self.current_token.type in ("EQ", "NE"):
-            op = self.current_token
-            self._eat(op.type)
-            node = BinOp(node, op, self._comparison())
-        return node
-
-    def _pipe(self):
-        node = self._equality()
-        while self.current_token.type == "PIPE":
-            op = self.current_token
-            self._eat("PIPE")
-            node = BinOp(node, op, self._equality())
+    @staticmethod
+    def _apply_prefixes(node, stack):
+        """把栈顶等待操作数的一元运算符作用到刚完成的操作数上"""
+        while stack and stack[-1][0] is None and stack[-1][1].type != "LPAREN":
+            token = stack.pop()[1]
+            if token.type == "AWAIT":
+                node = AwaitExpression(node)
+            else:
+                node = UnaryOp(token, node)
         return node
 
     def _expression(self):
-        return self._pipe()
+        """
+        优先级爬升：按 _BINDING_POWERS 归约二元运算，用显式栈代替逐级递归，
+        每个操作数只需解析原子与调用，括号嵌套也不消耗 Python 调用栈。
+
+        栈中的项都是 (左操作数, 令牌, 右结合力)：
+        左操作数为 None 的是一元运算符或尚未闭合的左括号，
+        其余是等待右操作数的二元运算符。
+        """
+        binding_powers = _BINDING_POWERS
+        stack = []
+        while True:
+            # 操作数位置：一元运算符与左括号入栈，然后解析原子
+            token = self.current_token
+            while token.type in _OPERAND_PREFIXES:
+                self._eat(token.type)
+                stack.append((None, token, 0))
+                token = self.current_token
+            node = self._primary()
+            if self.current_token.type == "LPAREN":
+                node = self._calls(node)
+            if stack and stack[-1][0] is None:
+                node = self._apply_prefixes(node, stack)
+
+            # 运算符位置：遇到二元运算符时先归约结合力更高的项
+            while True:
+                token = self.current_token
+                powers = binding_powers.get(token.type)
+                if powers is not None:
+                    left_power, right_power = powers
+                    while stack:
+                        left, op, power = stack[-1]
+                        if left is None or left_power >= power:
+                            break
+                        stack.pop()
+                        node = BinOp(left, op, node)
+                    self._eat(token.type)
+                    stack.append((node, token, right_power))
+                    break
+                # 表达式在此结束，或者闭合最近的左括号
+                while stack and stack[-1][0] is not None:
+                    left, op, _ = stack.pop()
+                    node = BinOp(left, op, node)
+                if not stack:
+                    return node
+                self._eat("RPAREN")
+                stack.pop()
+                node = self._apply_prefixes(self._calls(node), stack)
 
     def _block(self):
         self._eat("LBRACE")
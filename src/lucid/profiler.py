@@ -0,0 +1,155 @@
+# src/lucid/profiler.py
+"""
+VM 的执行剖析数据。
+
+VM(profile=True) 时，run() 改用一个单独的插桩执行循环，记录：
+  - 每条指令（按 chunk 与偏移量）的执行次数与累计耗时；
+  - 由此汇总出的每个操作码的执行次数与累计耗时；
+  - 值栈与调用帧的最大深度；
+  - 运行期间新建的 UnitValue 与 Unit 的数量（只统计执行剖析的线程，
+    spawn 到线程池中的任务不计入）。
+未开启时普通执行循环不做任何检查，没有额外开销。
+
+耗时是包含式的：OP_CALL 调用内建函数时，内建函数（以及它回调的 Lucid 函数）
+的耗时都计入这条 OP_CALL。
+
+用法:
+    vm = VM(profile=True)
+    vm.interpret(chunk)
+    print(vm.profile.to_json())
+    disassemble_chunk(chunk, "script", profile=vm.profile)
+"""
+import json
+import threading
+from contextlib import contextmanager
+
+from .chunk import OpCode
+from .runtime_types import Unit, UnitValue
+
+DEFAULT_HOT_LIMIT = 10
+
+# 线程 id -> 该线程上正在统计的 Profile.allocations。
+# 有线程在统计时 UnitValue.__init__ 与 Unit._resolve 被替换为计数版本
+_counters = {}
+_counters_lock = threading.Lock()
+_original_init = UnitValue.__init__
+_original_resolve = Unit._resolve
+
+
+def _counting_init(value, *args):
+    allocations = _counters.get(threading.get_ident())
+    if allocations is not None:
+        allocations["UnitValue"] += 1
+    _original_init(value, *args)
+
+
+def _counting_resolve(unit):
+    # 新建的单位在驻留前解析一次；注册表变化时的重新解析不计入
+    allocations = _counters.get(threading.get_ident())
+    if allocations is not None and not hasattr(unit, "scale"):
+        allocations["Unit"] += 1
+    _original_resolve(unit)
+
+
+class Profile:
+    def __init__(self):
+        # id(chunk) -> (chunk, 名称, 每个偏移量的执行次数, 每个偏移量的累计纳秒)
+        self.chunks = {}
+        self.stack_high_water = 0
+        self.frames_high_water = 0
+        self.allocations = {"UnitValue": 0, "Unit": 0}
+
+    def site(self, chunk, function):
+        """返回 chunk 的 (次数, 耗时) 计数列表，首次遇到时创建"""
+        entry = self.chunks.get(id(chunk))
+        if entry is None:
+            size = len(chunk.code)
+            name = repr(function) if function is not None else "<script>"
+            entry = (chunk, name, [0] * size, [0] * size)
+            self.chunks[id(chunk)] = entry
+        return entry[2], entry[3]
+
+    def instruction(self, chunk, offset):
+        """(次数, 耗时纳秒)；chunk 未被执行过时为 (0, 0)"""
+        entry = self.chunks.get(id(chunk))
+        if entry is None:
+            return 0, 0
+        return entry[2][offset], entry[3][offset]
+
+    @property
+    def total_time(self):
+        return sum(sum(times) for _, _, _, times in self.chunks.values())
+
+    def opcodes(self):
+        """{操作码名称: [次数, 耗时纳秒]}，按耗时从高到低排列"""
+        totals = {}
+        for chunk, _, counts, times in self.chunks.values():
+            code = chunk.code
+            for offset, count in enumerate(counts):
+                if count:
+                    entry = totals.setdefault(OpCode(code[offset]).name, [0, 0])
+                    entry[0] += count
+                    entry[1] += times[offset]
+        return dict(sorted(totals.items(), key=lambda item: -item[1][1]))
+
+    def hot_instructions(self, limit=DEFAULT_HOT_LIMIT):
+        """耗时最多的 limit 条指令：[(chunk 名称, 偏移量, 操作码, 次数, 耗时纳秒)]"""
+        sites = [
+            (name, offset, OpCode(chunk.code[offset]).name, count, times[offset])
+            for chunk, name, counts, times in self.chunks.values()
+            for offset, count in enumerate(counts)
+            if count
+        ]
+        sites.sort(key=lambda site: -site[4])
+        return sites[:limit]
+
+    def to_dict(self, hot_limit=DEFAULT_HOT_LIMIT):
+        opcodes = self.opcodes()
+        hot = self.hot_instructions(hot_limit)
+        return {
+            "instructions": sum(count for count, _ in opcodes.values()),
+            "time_ns": self.total_time,
+            "opcodes": {
+                name: {"count": count, "time_ns": time}
+                for name, (count, time) in opcodes.items()
+            },
+            "hot_instructions": [
+                {
+                    "chunk": name,
+                    "offset": offset,
+                    "opcode": opcode,
+                    "count": count,
+                    "time_ns": time,
+                }
+                for name, offset, opcode, count, time in hot
+            ],
+            "stack_high_water": self.stack_high_water,
+            "frames_high_water": self.frames_high_water,
+            "allocations": dict(self.allocations),
+        }
+
+    def to_json(self, hot_limit=DEFAULT_HOT_LIMIT, **options):
+        return json.dumps(self.to_dict(hot_limit), **options)
+
+    @contextmanager
+    def counting_allocations(self):
+        """
+        在 with 块中统计当前线程新建的 UnitValue 与 Unit，其他线程的分配不计入。
+        同一线程上嵌套统计时只计入最内层的 Profile。
+        """
+        ident = threading.get_ident()
+        with _counters_lock:
+            outer = _counters.get(ident)
+            _counters[ident] = self.allocations
+            UnitValue.__init__, Unit._resolve = _counting_init, _counting_resolve
+        try:
+            yield
+        finally:
+            with _counters_lock:
+                if outer is None:
+                    del _counters[ident]
+                else:
+                    _counters[ident] = outer
+                if not _counters:
+                    UnitValue.__init__ = _original_init
+                    Unit._resolve = _original_resolve
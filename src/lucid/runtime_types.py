@@ -1,8 +1,12 @@
 # src/lucid/runtime_types.py
 from collections import Counter
 
+from . import units
+
 
 class OkValue:
+    __slots__ = ("value",)
+
     def __init__(self, value):
         self.value = value
 
@@ -14,6 +18,8 @@ class OkValue:
 
 
 class ErrValue:
+    __slots__ = ("message",)
+
     def __init__(self, message):
         self.message = message
 
@@ -25,17 +31,140 @@ class ErrValue:
 
 
 class Unit:
-    def __init__(self, numerators=None, denominators=None):
-        self.numerators = Counter(numerators or [])
-        self.denominators = Counter(denominators or [])
-        self._simplify()
+    """
+    物理单位。Unit 是规范化并驻留（interned）的：相同的单位只会创建一次，
+    因此可以直接用 `is` / `==`（按身份）比较。乘、除、幂的结果会被缓存。
+    numerators / denominators 只应被读取，不要原地修改。
+
+    dimension / factor 是由单位注册表（units.py）预先算好的 SI 量纲向量与
+    换算系数，含未注册名称的单位两者都为 None。量纲为零的单位（例如 km/m）
+    的 scale 等于 factor，运算结果会按它退化为普通数字；其他单位为 None。
+    """
+
+    __slots__ = (
+        "numerators",
+        "denominators",
+        "dimensionless",
+        "dimension",
+        "factor",
+        "scale",
+        "_repr",
+    )
+
+    _interned = {}
+    _named = {}
+    _products = {}
+    _quotients = {}
+    _powers = {}
+    _ratios = {}
+
+    def __new__(cls, numerators=None, denominators=None):
+        num = Counter(numerators or [])
+        den = Counter(denominators or [])
+        common = num & den
+        num -= common
+        den -= common
+        key = (cls._canonical(num), cls._canonical(den))
+        unit = cls._interned.get(key)
+        if unit is None:
+            unit = object.__new__(cls)
+            unit.numerators, unit.denominators = num, den
+            unit.dimensionless = not num and not den
+            unit._resolve()
+            unit._repr = None
+            # setdefault 保证并发创建时所有线程拿到同一个实例
+            unit = cls._interned.setdefault(key, unit)
+        return unit
+
+    def _resolve(self):
+        self.dimension, self.factor = units.dimension_of(
+            self.numerators, self.denominators
+        )
+        zero = self.dimension is not None and not any(self.dimension)
+        self.scale = self.factor if zero else None
+
+    @classmethod
+    def _refresh(cls, name):
+        # 注册表变化后重新计算用到该名称的单位，并丢弃缓存的换算比例
+        for unit in list(cls._interned.values()):
+            if name in unit.numerators or name in unit.denominators:
+                unit._resolve()
+        cls._ratios.clear()
+
+    @staticmethod
+    def _canonical(counter):
+        # 幂次的类型也参与比较，避免 m^2 与 m^2.0 被合并
+        return tuple(sorted((u, p, type(p).__name__) for u, p in counter.items()))
+
+    @classmethod
+    def named(cls, name):
+        """返回由单个名称组成的单位，例如 Unit.named("m")"""
+        unit = cls._named.get(name)
+        if unit is None:
+            unit = cls._named.setdefault(name, cls([name]))
+        return unit
+
+    def multiply(self, other):
+        key = (self, other)
+        unit = Unit._products.get(key)
+        if unit is None:
+            unit = Unit(
+                self.numerators + other.numerators,
+                self.denominators + other.denominators,
+            )
+            Unit._products[key] = unit
+        return unit
+
+    def divide(self, other):
+        key = (self, other)
+        unit = Unit._quotients.get(key)
+        if unit is None:
+            unit = Unit(
+                self.numerators + other.denominators,
+                self.denominators + other.numerators,
+            )
+            Unit._quotients[key] = unit
+        return unit
+
+    def power(self, exponent):
+        key = (self, exponent, type(exponent))
+        unit = Unit._powers.get(key)
+        if unit is None:
+            unit = Unit(
+                {u: p * exponent for u, p in self.numerators.items()},
+                {u: p * exponent for u, p in self.denominators.items()},
+            )
+            Unit._powers[key] = unit
+        return unit
+
+    def ratio(self, other):
+        """
+        把以 other 为单位的数值换算到本单位时需要乘的系数；
+        两者量纲不同（或含有未注册的名称）时为 None
+        """
+        key = (self, other)
+        try:
+            return Unit._ratios[key]
+        except KeyError:
+            pass
+        ratio = None
+        if self is other:
+            ratio = 1
+        elif self.dimension is not None and self.dimension == other.dimension:
+            ratio = units.conversion_ratio(other.factor, self.factor)
+        Unit._ratios[key] = ratio
+        return ratio
 
-    def _simplify(self):
-        common = self.numerators & self.denominators
-        self.numerators -= common
-        self.denominators -= common
+    def __reduce__(self):
+        # 反序列化时重新走驻留流程
+        return (Unit, (dict(self.numerators), dict(self.denominators)))
 
     def __repr__(self):
+        if self._repr is None:
+            self._repr = self._format()
+        return self._repr
+
+    def _format(self):
         def format_part(counter):
             parts = [
                 f"{unit}^{power}" if power > 1 else unit
@@ -52,37 +181,39 @@ class Unit:
         )
         return f"{num_str}/{den_str}" if is_simple_den else f"{num_str}/({den_str})"
 
-    def __eq__(self, other):
-        return (
-            isinstance(other, Unit)
-            and self.numerators == other.numerators
-            and self.denominators == other.denominators
-        )
+
+DIMENSIONLESS = Unit()
+units._listeners.append(Unit._refresh)
 
 
 class UnitValue:
+    __slots__ = ("value", "unit")
+
     def __init__(self, value, unit_obj):
         self.value, self.unit = value, unit_obj
 
     def __repr__(self):
         return (
-            str(self.value)
-            if not self.unit.numerators and not self.unit.denominators
-            else f"{self.value}{self.unit}"
+            str(self.value) if self.unit.dimensionless else f"{self.value}{self.unit}"
         )
 
     def __eq__(self, other):
         if isinstance(other, int):
-            return (
-                self.value == other
-                and not self.unit.numerators
-                and not self.unit.denominators
-            )
-        return (
-            isinstance(other, UnitValue)
-            and self.value == other.value
-            and self.unit == other.unit
-        )
+            return self.value == other and self.unit.dimensionless
+        if not isinstance(other, UnitValue):
+            return False
+        if self.unit is other.unit:
+            return self.value == other.value
+        # 量纲相同的单位换算后比较，例如 1km == 1000m
+        ratio = self.unit.ratio(other.unit)
+        return ratio is not None and self.value == other.value * ratio
+
+    def to(self, unit_obj):
+        """换算到量纲相同的另一个单位，例如 UnitValue(1, km).to(Unit.named("m"))"""
+        ratio = unit_obj.ratio(self.unit)
+        if ratio is None:
+            raise TypeError(f"Cannot convert {self.unit} to {unit_obj}.")
+        return UnitValue(self.value * ratio, unit_obj)
 
 
 class Function:
@@ -93,6 +224,33 @@ class Function:
         return f"<Function {len(self.parameters)} args>"
 
 
+class CompiledFunction:
+    """
+    编译到字节码的函数。local_count 是参数在内的局部变量槽位数（不含槽位 0
+    中的函数本身）；captures 保存创建闭包时按值捕获的外层局部变量。
+    """
+
+    __slots__ = ("name", "arity", "local_count", "chunk", "capture_count", "captures")
+
+    def __init__(self, name, arity, local_count, chunk, capture_count=0, captures=()):
+        self.name, self.arity, self.local_count = name, arity, local_count
+        self.chunk, self.capture_count, self.captures = chunk, capture_count, captures
+
+    def bind(self, captures):
+        """返回捕获了给定值的同一函数"""
+        return CompiledFunction(
+            self.name,
+            self.arity,
+            self.local_count,
+            self.chunk,
+            self.capture_count,
+            tuple(captures),
+        )
+
+    def __repr__(self):
+        return f"<Function {self.name or 'anonymous'} {self.arity} args>"
+
+
 class BuiltinFunction:
     def __init__(self, fn, name="<builtin>"):
         self.fn, self.name = fn, name
@@ -106,7 +264,8 @@ class Task:
         self.future = future
 
     def __repr__(self):
-        return f"<Task running={self.future.running()}>"
+        # future 可以是 concurrent.futures.Future，也可以是 asyncio 的 Task
+        return f"<Task done={self.future.done()}>"
 
 
 class ReturnValue:
@@ -0,0 +1,220 @@
+# src/lucid/serialize.py
+"""
+Chunk 的二进制序列化格式（.lucidc）。
+
+布局（整数均为大端序）:
+
+    magic             b"LUCIDC\\0"
+    format version    u16
+    compiler version  u16
+    units fingerprint 字符串：写出时单位注册表的指纹
+    global names      u32 个数 + 字符串
+    units             u32 个数 + 单位表（每个单位的分子、分母表）
+    body              code（u32 长度 + 字节码）+ constants（u32 个数 + 常量）
+
+常量标签: n=None, t=True, f=False, i=整数, d=浮点数, s=字符串,
+u=UnitValue（数值 + u32 单位表索引）, c=CompiledFunction（名称、参数个数、
+局部变量数、捕获变量数 + 函数体的 body）。每个不同的单位只写入并构造一次；
+函数体与脚本共享同一张全局变量名表。
+
+类型专用指令依据单位注册表生成。读入时注册表的指纹与写出时不同，
+这些指令被改写回通用指令。
+"""
+import struct
+
+from . import units as unit_registry
+from .chunk import Chunk, generalize, has_specialized, mark_specialized, unquickened
+from .compiler import COMPILER_VERSION
+from .runtime_types import CompiledFunction, Unit, UnitValue
+
+MAGIC = b"LUCIDC\0"
+FORMAT_VERSION = 3
+
+_HEADER = struct.Struct(">7sHH")
+_U32 = struct.Struct(">I")
+_DOUBLE = struct.Struct(">d")
+
+
+def dump_chunk(chunk):
+    """把 chunk 序列化为 bytes"""
+    out = bytearray(_HEADER.pack(MAGIC, FORMAT_VERSION, COMPILER_VERSION))
+    # 注册表变化时类型专用指令已被改写，现存的都依据当前的注册表
+    _write_str(out, unit_registry.registry_fingerprint())
+    out += _U32.pack(len(chunk.global_names))
+    for name in chunk.global_names:
+        _write_str(out, name)
+    units = {}
+    _collect_units(chunk, units)
+    out += _U32.pack(len(units))
+    for unit in units:
+        for counter in (unit.numerators, unit.denominators):
+            out += _U32.pack(len(counter))
+            for name, power in sorted(counter.items()):
+                _write_str(out, name)
+                _write_value(out, power, units)
+    _write_body(out, chunk, units)
+    return bytes(out)
+
+
+def load_chunk(data):
+    """
+    从 bytes 重建 Chunk。格式不正确、被截断或由其他版本的编译器生成时
+    抛出 ValueError。
+    """
+    reader = _Reader(data)
+    magic, format_version, compiler_version = reader.unpack(_HEADER)
+    if magic != MAGIC:
+        raise ValueError("Not a compiled Lucid chunk.")
+    if format_version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported bytecode format version {format_version}.")
+    if compiler_version != COMPILER_VERSION:
+        raise ValueError(
+            f"Bytecode was compiled by compiler version {compiler_version}, "
+            f"expected {COMPILER_VERSION}."
+        )
+    reader.same_units = reader.string() == unit_registry.registry_fingerprint()
+    global_names = [reader.string() for _ in range(reader.u32())]
+    # 所有 chunk 都通过 parent 共享这张全局变量名表
+    reader.root = Chunk.from_parts(b"", [], global_names)
+    reader.units = [reader.unit() for _ in range(reader.u32())]
+    chunk = reader.body()
+    if reader.offset != len(reader.data):
+        raise ValueError("Trailing data after compiled chunk.")
+    return chunk
+
+
+def _collect_units(chunk, units):
+    for value in chunk.constants:
+        if type(value) is UnitValue:
+            units.setdefault(value.unit, len(units))
+        elif type(value) is CompiledFunction:
+            _collect_units(value.chunk, units)
+
+
+def _write_body(out, chunk, units):
+    out += _U32.pack(len(chunk.code))
+    # VM 加速过的指令按通用指令写出，序列化结果与执行历史无关
+    out += unquickened(chunk.code)
+    out += _U32.pack(len(chunk.constants))
+    for value in chunk.constants:
+        _write_value(out, value, units)
+
+
+def _write_str(out, text):
+    encoded = text.encode("utf-8")
+    out += _U32.pack(len(encoded))
+    out += encoded
+
+
+def _write_value(out, value, units):
+    kind = type(value)
+    if value is None:
+        out += b"n"
+    elif value is True:
+        out += b"t"
+    elif value is False:
+        out += b"f"
+    elif kind is int:
+        encoded = value.to_bytes((value.bit_length() + 8) // 8, "big", signed=True)
+        out += b"i"
+        out += _U32.pack(len(encoded))
+        out += encoded
+    elif kind is float:
+        out += b"d"
+        out += _DOUBLE.pack(value)
+    elif kind is str:
+        out += b"s"
+        _write_str(out, value)
+    elif kind is UnitValue:
+        out += b"u"
+        _write_value(out, value.value, units)
+        out += _U32.pack(units[value.unit])
+    elif kind is CompiledFunction:
+        out += b"c"
+        _write_value(out, value.name, units)
+        out += _U32.pack(value.arity)
+        out += _U32.pack(value.local_count)
+        out += _U32.pack(value.capture_count)
+        _write_body(out, value.chunk, units)
+    else:
+        raise TypeError(f"Cannot serialize constant of type {kind.__name__}.")
+
+
+class _Reader:
+    """按顺序读取序列化数据，越界时抛出 ValueError"""
+
+    def __init__(self, data):
+        self.data, self.offset = data, 0
+        self.units = []
+        self.root = None
+        self.same_units = True
+
+    def take(self, size):
+        end = self.offset + size
+        if end > len(self.data):
+            raise ValueError("Truncated compiled chunk.")
+        chunk = self.data[self.offset : end]
+        self.offset = end
+        return chunk
+
+    def unpack(self, fmt):
+        offset = self.offset
+        self.offset = offset + fmt.size
+        if self.offset > len(self.data):
+            raise ValueError("Truncated compiled chunk.")
+        return fmt.unpack_from(self.data, offset)
+
+    def u32(self):
+        return self.unpack(_U32)[0]
+
+    def string(self):
+        return self.take(self.u32()).decode("utf-8")
+
+    def body(self):
+        code = self.take(self.u32())
+        constants = [self.value() for _ in range(self.u32())]
+        chunk = Chunk.from_parts(code, constants, parent=self.root)
+        if has_specialized(chunk.code):
+            if self.same_units:
+                mark_specialized(chunk)
+            else:
+                generalize(chunk)
+        return chunk
+
+    def unit(self):
+        numerators = self.powers()
+        denominators = self.powers()
+        return Unit(numerators, denominators)
+
+    def powers(self):
+        return {self.string(): self.value() for _ in range(self.u32())}
+
+    def value(self):
+        tag = self.take(1)
+        if tag == b"n":
+            return None
+        if tag == b"t":
+            return True
+        if tag == b"f":
+            return False
+        if tag == b"i":
+            return int.from_bytes(self.take(self.u32()), "big", signed=True)
+        if tag == b"d":
+            return self.unpack(_DOUBLE)[0]
+        if tag == b"s":
+            return self.string()
+        if tag == b"u":
+            value = self.value()
+            index = self.u32()
+            if index >= len(self.units):
+                raise ValueError(f"Unknown unit index {index}.")
+            return UnitValue(value, self.units[index])
+        if tag == b"c":
+            name = self.value()
+            arity = self.u32()
+            local_count = self.u32()
+            capture_count = self.u32()
+            return CompiledFunction(
+                name, arity, local_count, self.body(), capture_count
+            )
+        raise ValueError(f"Unknown constant tag {tag!r}.")
@@ -0,0 +1,71 @@
+# src/lucid/session.py
+"""
+持久的 REPL 会话。
+
+每一行输入都编译进一个新的 Chunk，但这些 Chunk 与会话的根 Chunk 共享
+同一个常量池与全局变量名表，全局槽位在 VM 中只解析新增的名称；
+编译结果按源码文本缓存，重复的输入直接执行缓存的字节码。
+
+用法:
+    session = Session()
+    session.execute("let v = 100km / 2hr")
+    session.execute("v * 3hr")     # 150.0km
+"""
+from collections import OrderedDict
+
+from .chunk import Chunk
+from .compiler import Compiler
+from .debug import disassemble_chunk
+from .lexer import Lexer
+from .parser import Parser
+from .vm import VM, VMResult
+
+DEFAULT_CACHE_SIZE = 1024
+
+
+class Session:
+    """
+    debug=True 时执行前反汇编每一段新编译的字节码。
+    cache_size 为编译缓存保留的输入条数（最近最少使用的先被淘汰）。
+    """
+
+    def __init__(
+        self, vm=None, compiler=None, cache_size=DEFAULT_CACHE_SIZE, debug=False
+    ):
+        self.vm = vm or VM()
+        self.compiler = compiler or Compiler()
+        self.cache_size = cache_size
+        self.debug = debug
+        # 所有输入共享的常量池与全局变量名表
+        self.root = Chunk()
+        self._cache = OrderedDict()
+        # 最近一次编译时单位推断发现的问题（命中缓存时为空）
+        self.diagnostics = []
+
+    def compile(self, text):
+        """返回 text 编译后的 Chunk；相同的源码文本只编译一次"""
+        chunk = self._cache.get(text)
+        self.diagnostics = []
+        if chunk is not None:
+            self._cache.move_to_end(text)
+            return chunk
+        ast = Parser(Lexer(text)).parse()
+        chunk = self.compiler.compile(ast, Chunk(self.root, share_constants=True))
+        self.diagnostics = list(self.compiler.diagnostics)
+        if self.debug:
+            disassemble_chunk(chunk, "Debug Chunk")
+        self._cache[text] = chunk
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return chunk
+
+    def execute(self, text):
+        """编译（或取出缓存的字节码）并执行一行输入，返回结果"""
+        chunk = self.compile(text)
+        vm = self.vm
+        # 所有输入共用根 Chunk 的槽位映射，只有新出现的名称需要解析
+        vm._links[chunk] = vm._link(self.root)
+        result = vm.interpret(chunk)
+        if isinstance(result, VMResult):
+            raise RuntimeError(f"VM finished with {result.name}.")
+        return result
@@ -0,0 +1,402 @@
+# src/lucid/tiering.py
+"""
+第二执行层：把热点 Chunk 翻译成 Python 函数。
+
+VM.interpret 统计每个 Chunk 的执行次数，达到阈值后调用 compile_chunk，
+把字节码翻译成一段 Python 源码并用 compile() 编译：
+  - 值栈被消去，每条指令的结果存入一个局部变量；
+  - if 表达式（只有向前的跳转）翻译为 Python 的 if / else；
+  - 加减与比较内联了单位检查的快速路径，操作数为常量时按已知类型省略检查；
+  - 其余情况调用 operations 中的通用实现，因此语义与错误信息与 VM 完全一致。
+函数调用、局部变量、闭包、spawn / await 等不支持的指令使翻译失败，
+这样的 Chunk 继续由 VM 执行。
+
+生成的函数绑定到某个 VM 的全局槽位，只能由该 VM 使用。
+"""
+from . import operations
+from .arrays import UnitArray
+from .chunk import (
+    GENERIC_FORMS,
+    QUICKENED_FORMS,
+    OpCode,
+    instruction_length,
+    read_operand,
+)
+from .runtime_types import Unit, UnitValue
+
+# 操作数的静态类型：一定不是 UnitValue / 一定是 int 或 float /
+# 一定是 UnitValue / 未知（None）。NUMBER 是 PLAIN 的特例
+PLAIN, NUMBER, UNIT = "plain", "number", "unit"
+
+_HELPERS = {
+    OpCode.OP_ADD: "_add",
+    OpCode.OP_SUBTRACT: "_subtract",
+    OpCode.OP_MULTIPLY: "_multiply",
+    OpCode.OP_DIVIDE: "_divide",
+    OpCode.OP_POWER: "_power",
+    OpCode.OP_GREATER: "_greater",
+    OpCode.OP_LESS: "_less",
+}
+
+_SYMBOLS = {
+    OpCode.OP_ADD: "+",
+    OpCode.OP_SUBTRACT: "-",
+    OpCode.OP_MULTIPLY: "*",
+    OpCode.OP_DIVIDE: "/",
+    OpCode.OP_POWER: "**",
+    OpCode.OP_GREATER: ">",
+    OpCode.OP_LESS: "<",
+}
+
+_COMPARISON_HELPERS = {
+    OpCode.OP_EQUAL: "_equal",
+    OpCode.OP_NOT_EQUAL: "_not_equal",
+    OpCode.OP_GREATER_EQUAL: "_greater_equal",
+    OpCode.OP_LESS_EQUAL: "_less_equal",
+}
+
+# 取反比较 -> 被取反的比较；类型专用的取反比较按 not (被取反的比较) 翻译
+_NEGATED_COMPARISONS = {
+    OpCode.OP_GREATER_EQUAL: OpCode.OP_LESS,
+    OpCode.OP_LESS_EQUAL: OpCode.OP_GREATER,
+}
+
+# 类型专用指令名称的后缀 -> 编译器已证明的 (左, 右) 操作数类型
+_SPECIALIZED_KINDS = {
+    "NUMBER": (NUMBER, NUMBER),
+    "UNIT": (UNIT, UNIT),
+    "UNIT_NUMBER": (UNIT, NUMBER),
+    "NUMBER_UNIT": (NUMBER, UNIT),
+}
+
+_CONSTANTS = (OpCode.OP_CONSTANT, OpCode.OP_CONSTANT_LONG, OpCode.OP_UNIT_CONSTANT)
+_JUMP_IF_FALSE = (OpCode.OP_JUMP_IF_FALSE, OpCode.OP_JUMP_IF_FALSE_LONG)
+_JUMP = (OpCode.OP_JUMP, OpCode.OP_JUMP_LONG)
+
+_RUNTIME = {
+    "_UV": UnitValue,
+    "_UA": UnitArray,
+    "_named": Unit.named,
+    "_make_value": operations.make_value,
+    "_add": operations.add,
+    "_subtract": operations.subtract,
+    "_multiply": operations.multiply,
+    "_divide": operations.divide,
+    "_power": operations.power,
+    "_negate": operations.negate,
+    "_greater": operations.greater,
+    "_less": operations.less,
+    "_equal": operations.equal,
+    "_not_equal": operations.not_equal,
+    "_greater_equal": operations.greater_equal,
+    "_less_equal": operations.less_equal,
+}
+
+
+class _Unsupported(Exception):
+    """Chunk 中含有第二层无法翻译的指令"""
+
+
+def compile_chunk(chunk, slot_map, global_values, fallback, undefined):
+    """
+    把 chunk 翻译为一个无参的 Python 函数，调用它等价于 VM 执行 chunk 并返回结果。
+    slot_map / global_values / fallback / undefined 来自执行它的 VM。
+    含有不支持的指令时返回 None。
+    """
+    translator = _Translator(chunk, slot_map)
+    try:
+        source = translator.translate()
+    except _Unsupported:
+        return None
+    namespace = dict(_RUNTIME, **translator.prebuilt)
+    namespace.update(
+        {"_values": global_values, "_fallback": fallback, "_UNDEFINED": undefined}
+    )
+    for index, value in enumerate(chunk.constants):
+        namespace[f"_k{index}"] = value
+    exec(compile(source, "<lucid tier>", "exec"), namespace)
+    return namespace["_tiered"]
+
+
+def translate_chunk(chunk, slot_map=None):
+    """返回 chunk 翻译成的 Python 源码（用于调试）；不支持时抛出 ValueError"""
+    if slot_map is None:
+        slot_map = range(len(chunk.global_names))
+    try:
+        return _Translator(chunk, slot_map).translate()
+    except _Unsupported as e:
+        raise ValueError(str(e)) from None
+
+
+class _Translator:
+    def __init__(self, chunk, slot_map):
+        self.chunk = chunk
+        self.code = chunk.code
+        self.slot_map = slot_map
+        # 翻译时预先构建的 UnitValue 常量：名称 -> 值
+        self.prebuilt = {}
+        self._temps = 0
+
+    def translate(self):
+        lines, stack = self._region(0, len(self.code), [])
+        if not lines or not lines[-1].startswith("return "):
+            # 没有以 OP_RETURN 结束（例如手工构建的 chunk）
+            lines.append(f"return {stack[-1][0] if stack else None}")
+        body = "\n".join("    " + line for line in lines)
+        return f"def _tiered():\n{body}\n"
+
+    def _temp(self):
+        self._temps += 1
+        return f"t{self._temps}"
+
+    def _region(self, start, end, stack):
+        """翻译 [start, end) 内的指令，返回 (代码行, 结束时的符号栈)"""
+        code, lines = self.code, []
+        pc = start
+        while pc < end:
+            op = code[pc]
+            operand = read_operand(code, pc)
+            nxt = pc + instruction_length(op)
+            if op in _JUMP_IF_FALSE:
+                pc = self._branch(nxt, nxt + operand, stack, lines)
+                continue
+            if op == OpCode.OP_RETURN:
+                if nxt != len(code):
+                    raise _Unsupported("return before the end of the chunk")
+                lines.append(f"return {stack[-1][0] if stack else None}")
+            else:
+                self._instruction(op, operand, stack, lines)
+            pc = nxt
+        return lines, stack
+
+    def _branch(self, then_start, else_start, stack, lines):
+        """
+        翻译 if 表达式的两个分支，返回汇合点。then 分支以一条跳到汇合点的
+        OP_JUMP 结束；两个分支结束时栈深度相同，不同的栈位置汇合到新的局部变量
+        """
+        jump_at = self._last_instruction(then_start, else_start)
+        if self.code[jump_at] not in _JUMP:
+            raise _Unsupported("unstructured jump")
+        join = else_start + read_operand(self.code, jump_at)
+        condition = stack[-1][0]
+        then_lines, then_stack = self._region(then_start, jump_at, list(stack))
+        else_lines, else_stack = self._region(else_start, join, list(stack))
+        if len(then_stack) != len(else_stack):
+            raise _Unsupported("branches leave different stack depths")
+        for i, (then_value, else_value) in enumerate(zip(then_stack, else_stack)):
+            if then_value != else_value:
+                merged = self._temp()
+                then_lines.append(f"{merged} = {then_value[0]}")
+                else_lines.append(f"{merged} = {else_value[0]}")
+                kind = then_value[1] if then_value[1] == else_value[1] else None
+                then_stack[i] = (merged, kind)
+        lines.append(f"if {condition} is not None and {condition} is not False:")
+        lines.extend("    " + line for line in then_lines or ["pass"])
+        lines.append("else:")
+        lines.extend("    " + line for line in else_lines or ["pass"])
+        stack[:] = then_stack
+        return join
+
+    def _last_instruction(self, start, end):
+        pc = start
+        while True:
+            nxt = pc + instruction_length(self.code[pc])
+            if nxt >= end:
+                if nxt != end:
+                    raise _Unsupported("jump into an instruction")
+                return pc
+            pc = nxt
+
+    def _instruction(self, op, operand, stack, lines):
+        if op in _CONSTANTS:
+            kind = _kind_of(self.chunk.constants[operand])
+            stack.append((f"_k{operand}", kind))
+        elif op == OpCode.OP_NIL:
+            stack.append(("None", PLAIN))
+        elif op == OpCode.OP_TRUE:
+            stack.append(("True", PLAIN))
+        elif op == OpCode.OP_FALSE:
+            stack.append(("False", PLAIN))
+        elif op == OpCode.OP_POP:
+            stack.pop()
+        elif op in (OpCode.OP_GET_GLOBAL, OpCode.OP_GET_GLOBAL_LONG):
+            slot, temp = self.slot_map[operand], self._temp()
+            lines.append(f"{temp} = _values[{slot}]")
+            lines.append(f"if {temp} is None or {temp} is _UNDEFINED:")
+            lines.append(f"    {temp} = _fallback({slot})")
+            stack.append((temp, None))
+        elif op in (OpCode.OP_DEFINE_GLOBAL, OpCode.OP_DEFINE_GLOBAL_LONG):
+            lines.append(f"_values[{self.slot_map[operand]}] = {stack.pop()[0]}")
+        elif op == OpCode.OP_BUILD_UNIT_VALUE:
+            unit, (value, _) = stack.pop()[0], stack.pop()
+            if unit.startswith("_k") and value.startswith("_k"):
+                # 数值与单位名都是常量：与窥孔优化器一样预先构建 UnitValue
+                constants = self.chunk.constants
+                name = f"_u{len(self.prebuilt)}"
+                self.prebuilt[name] = UnitValue(
+                    constants[int(value[2:])], Unit.named(constants[int(unit[2:])])
+                )
+                stack.append((name, UNIT))
+                return
+            temp = self._temp()
+            lines.append(f"{temp} = _UV({value}, _named({unit}))")
+            stack.append((temp, UNIT))
+        elif op == OpCode.OP_NEGATE:
+            (a, kind), temp = stack.pop(), self._temp()
+            if kind == PLAIN:
+                lines.append(f"{temp} = -{a}")
+            else:
+                lines.append(f"{temp} = _negate({a})")
+            stack.append((temp, kind))
+        elif op == OpCode.OP_NOT:
+            (a, kind), temp = stack.pop(), self._temp()
+            lines.append(
+                f"{temp} = {a}.logical_not() if type({a}) is _UA "
+                f"else {a} is None or {a} is False"
+            )
+            stack.append((temp, PLAIN))
+        elif op in _HELPERS:
+            self._binary(op, stack, lines)
+        elif op in QUICKENED_FORMS:
+            # VM 原地加速过的指令：守卫与通用实现等价，按通用指令翻译
+            self._binary(QUICKENED_FORMS[op], stack, lines)
+        elif op in GENERIC_FORMS:
+            # 类型专用指令：按通用指令翻译，操作数类型直接取编译器的结论
+            generic = GENERIC_FORMS[op]
+            suffix = OpCode(op).name[len(generic.name) + 1 :]
+            kind_a, kind_b = _SPECIALIZED_KINDS[suffix]
+            stack[-2], stack[-1] = (stack[-2][0], kind_a), (stack[-1][0], kind_b)
+            negated = _NEGATED_COMPARISONS.get(generic)
+            if negated is None:
+                self._binary(generic, stack, lines)
+            else:
+                self._binary(negated, stack, lines)
+                (a, _), temp = stack.pop(), self._temp()
+                lines.append(f"{temp} = not {a}")
+                stack.append((temp, PLAIN))
+        elif op in _COMPARISON_HELPERS:
+            b, a, temp = stack.pop()[0], stack.pop()[0], self._temp()
+            lines.append(f"{temp} = {_COMPARISON_HELPERS[op]}({a}, {b})")
+            stack.append((temp, PLAIN))
+        else:
+            raise _Unsupported(f"{OpCode(op).name} is not supported")
+
+    def _binary(self, op, stack, lines):
+        """
+        依次尝试若干条快速路径，都不满足时调用 operations 中的通用实现。
+        每条路径要求操作数具有某种类型；静态类型已知时相应的检查被省略，
+        或者整条路径被丢弃
+        """
+        (b, kind_b), (a, kind_a) = stack.pop(), stack.pop()
+        kinds = {a: kind_a, b: kind_b}
+        temp = self._temp()
+        branches = []
+        for requirements, extra, statements in _fast_paths(op, a, b, temp):
+            checks = [_type_check(x, kinds[x], wanted) for x, wanted in requirements]
+            if False not in checks:
+                checks = [check for check in checks if check is not True] + extra
+                branches.append((checks, statements))
+                if not checks:
+                    break
+        else:
+            branches.append(([], [f"{temp} = {_HELPERS[op]}({a}, {b})"]))
+        if len(branches) == 1:
+            lines.extend(branches[0][1])
+        else:
+            for i, (checks, statements) in enumerate(branches):
+                if not checks:
+                    lines.append("else:")
+                else:
+                    keyword = "if" if i == 0 else "elif"
+                    lines.append(f"{keyword} {' and '.join(checks)}:")
+                lines.extend("    " + line for line in statements)
+        if op in (OpCode.OP_GREATER, OpCode.OP_LESS):
+            kind = PLAIN
+        elif kind_a == kind_b == NUMBER and op != OpCode.OP_POWER:
+            kind = NUMBER
+        elif kind_a in (PLAIN, NUMBER) and kind_b in (PLAIN, NUMBER):
+            kind = PLAIN
+        else:
+            kind = None
+        stack.append((temp, kind))
+
+
+def _kind_of(value):
+    if type(value) is UnitValue:
+        return UNIT
+    if type(value) in (int, float):
+        return NUMBER
+    return PLAIN
+
+
+def _type_check(operand, kind, wanted):
+    """
+    操作数需要满足 wanted（UNIT / PLAIN / NUMBER）时的检查表达式；
+    静态类型已经保证满足时返回 True，不可能满足时返回 False
+    """
+    if wanted == UNIT:
+        if kind is not None:
+            return kind == UNIT
+        return f"type({operand}) is _UV"
+    if wanted == PLAIN:
+        if kind is not None:
+            return kind != UNIT
+        return f"type({operand}) is not _UV"
+    if kind in (NUMBER, UNIT):
+        return kind == NUMBER
+    return f"type({operand}) in (int, float)"
+
+
+def _fast_paths(op, a, b, temp):
+    """[(类型要求, 额外条件, 语句)]，按顺序尝试"""
+    units = [(a, UNIT), (b, UNIT)]
+    symbol = _SYMBOLS[op]
+    plain = [f"{temp} = {a} {symbol} {b}"]
+    if op in (OpCode.OP_ADD, OpCode.OP_SUBTRACT):
+        # 单位相同时直接在数值上计算；无量纲的结果要退化为普通数字，交给通用实现
+        same = [f"{a}.unit is {b}.unit", f"{a}.unit.scale is None"]
+        result = [f"{temp} = _UV({a}.value {symbol} {b}.value, {a}.unit)"]
+        return [(units, same, result), (_plain(a, b), [], plain)]
+    if op in (OpCode.OP_GREATER, OpCode.OP_LESS):
+        result = [f"{temp} = {a}.value {symbol} {b}.value"]
+        return [(units, [f"{a}.unit is {b}.unit"], result), (_plain(a, b), [], plain)]
+    if op in (OpCode.OP_MULTIPLY, OpCode.OP_DIVIDE):
+        method = "multiply" if op == OpCode.OP_MULTIPLY else "divide"
+        value = f"{a}.value {symbol} {b}.value"
+        result = [
+            f"{temp}_unit = {a}.unit.{method}({b}.unit)",
+            f"{temp} = _UV({value}, {temp}_unit) if {temp}_unit.scale is None "
+            f"else _make_value({value}, {temp}_unit)",
+        ]
+        # UnitValue 与普通数字相乘除：单位不变（无量纲的 UnitValue 交给通用实现）
+        scaled = [f"{temp} = _UV({a}.value {symbol} {b}, {a}.unit)"]
+        scaled_checks = [f"{a}.unit.scale is None"]
+        if op == OpCode.OP_MULTIPLY:
+            return [
+                (units, [], result),
+                (
+                    [(a, NUMBER), (b, UNIT)],
+                    [f"{b}.unit.scale is None"],
+                    [f"{temp} = _UV({a} * {b}.value, {b}.unit)"],
+                ),
+                ([(a, UNIT), (b, NUMBER)], scaled_checks, scaled),
+                (_plain(a, b), [], plain),
+            ]
+        # 除数为 0 的错误信息由通用实现给出，快速路径只处理非零的除数
+        return [
+            (units, [f"{b}.value"], result),
+            ([(a, UNIT), (b, NUMBER)], scaled_checks + [b], scaled),
+            ([(a, NUMBER), (b, NUMBER)], [b], plain),
+        ]
+    # OP_POWER：指数必须是普通数字
+    value = f"{a}.value ** {b}"
+    powered = [
+        f"{temp}_unit = {a}.unit.power({b})",
+        f"{temp} = _UV({value}, {temp}_unit) if {temp}_unit.scale is None "
+        f"else _make_value({value}, {temp}_unit)",
+    ]
+    return [([(a, UNIT), (b, NUMBER)], [], powered), (_plain(a, b), [], plain)]
+
+
+def _plain(a, b):
+    return [(a, PLAIN), (b, PLAIN)]
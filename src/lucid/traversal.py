@@ -0,0 +1,77 @@
+# src/lucid/traversal.py
+"""
+不占用 Python 调用栈的 AST 遍历。
+
+编译器、常量折叠与单位推断中有子节点的访问方法写成生成器：需要处理
+子节点时 yield 该子节点，遍历器处理完整个子节点后再恢复生成器。
+尚未完成的生成器保存在一个显式栈中，因此树的深度只受内存限制，
+机器生成的数千层嵌套表达式也不会触发 RecursionError。
+
+处理子节点时抛出的异常会 throw 回父节点的生成器，
+与递归调用时的异常传播（包括 try/finally）完全一致。
+"""
+from types import GeneratorType
+
+
+class DispatchCache(dict):
+    """
+    节点类 -> 访问方法 的缓存。第一次遇到某个节点类时按
+    prefix + 类名 查找 owner 的方法，找不到时使用 default；
+    之后的分派只是一次字典查找，不再拼接方法名或调用 getattr。
+    """
+
+    def __init__(self, owner, prefix, default):
+        super().__init__()
+        self.owner, self.prefix, self.default = owner, prefix, default
+
+    def __missing__(self, node_class):
+        method = getattr(self.owner, self.prefix + node_class.__name__, self.default)
+        self[node_class] = method
+        return method
+
+
+def walk(node, visitors, results=None):
+    """
+    用 visitors[type(节点)](节点) 处理 node 及其子树。
+
+    访问方法返回生成器时，生成器每 yield 一个子节点（不能是 None），
+    walk 就先处理完整个子节点再恢复它。results 不为 None 时，
+    直接返回结果的访问方法的返回值按 id(节点) 记录到 results 中；
+    生成器没有返回值（结束时不抛出携带返回值的 StopIteration，开销更小），
+    需要结果时由它自己在结束前写入 results，父节点 yield 子节点之后从中读取。
+    """
+    value = visitors[type(node)](node)
+    if type(value) is not GeneratorType:
+        if results is not None:
+            results[id(node)] = value
+        return
+    stack = [value]
+    error = None
+    while stack:
+        generator = stack[-1]
+        try:
+            if error is None:
+                node = next(generator, None)
+            else:
+                pending, error = error, None
+                node = generator.throw(pending)
+        except StopIteration:
+            node = None
+        except BaseException as exc:
+            stack.pop()
+            error = exc
+            continue
+        if node is None:
+            stack.pop()
+            continue
+        try:
+            value = visitors[type(node)](node)
+        except BaseException as exc:
+            error = exc
+            continue
+        if type(value) is GeneratorType:
+            stack.append(value)
+        elif results is not None:
+            results[id(node)] = value
+    if error is not None:
+        raise error
@@ -0,0 +1,176 @@
+# src/lucid/units.py
+"""
+单位注册表：把单位名称映射到国际单位制（SI）基本量纲的指数向量与换算系数。
+
+量纲向量是一个定长元组，依次为 BASE_DIMENSIONS 中各基本单位的指数，
+例如 km/hr 的量纲为 (1, 0, -1, 0, 0, 0, 0)，换算系数为 1000 / 3600。
+量纲相同的两个单位可以互相换算：数值乘以两者换算系数之比。
+未注册的名称仍然是不透明的符号，只与同名单位兼容。
+
+新单位应当在使用它的值被创建之前注册：
+    register_unit("furlong", {"m": 1}, 201.168)
+"""
+
+import hashlib
+
+BASE_DIMENSIONS = ("m", "kg", "s", "A", "K", "mol", "cd")
+
+# 名称 -> (量纲向量, 换算到 SI 的系数)
+_registry = {}
+
+# 注册表变化时调用的回调（Unit 借此刷新已驻留单位的量纲，
+# 含类型专用指令的 Chunk 借此退回通用指令）
+_listeners = []
+
+# 注册表的版本号，每次注册或注销单位时递增
+_version = 0
+# (版本号, 注册表内容的指纹)
+_fingerprint = (None, None)
+
+
+def _vector(exponents):
+    if isinstance(exponents, tuple):
+        if len(exponents) != len(BASE_DIMENSIONS):
+            raise ValueError(
+                f"Dimension vector must have {len(BASE_DIMENSIONS)} entries."
+            )
+        return exponents
+    unknown = set(exponents) - set(BASE_DIMENSIONS)
+    if unknown:
+        raise ValueError(f"Unknown base dimension: {sorted(unknown)[0]}")
+    return tuple(exponents.get(base, 0) for base in BASE_DIMENSIONS)
+
+
+def register_unit(name, dimension, factor=1):
+    """
+    注册（或重新定义）一个单位。dimension 为量纲向量，或 {基本单位: 指数}；
+    factor 为该单位换算到 SI 基本单位的系数。
+    """
+    _registry[name] = (_vector(dimension), factor)
+    _changed(name)
+
+
+def unregister_unit(name):
+    """删除一个已注册的单位；之后它重新成为不透明的符号"""
+    del _registry[name]
+    _changed(name)
+
+
+def _changed(name):
+    global _version
+    _version += 1
+    for listener in _listeners:
+        listener(name)
+
+
+def registry_version():
+    """注册表的版本号；同一进程中注册表每次变化后都不同"""
+    return _version
+
+
+def registry_fingerprint():
+    """
+    注册表内容的指纹（十六进制字符串）。内容相同的注册表指纹相同，
+    可以跨进程比较，用于判断编译期的单位信息是否仍然有效。
+    """
+    global _fingerprint
+    version, fingerprint = _fingerprint
+    if version != _version:
+        content = repr(sorted(_registry.items())).encode("utf-8")
+        fingerprint = hashlib.sha256(content).hexdigest()
+        _fingerprint = (_version, fingerprint)
+    return fingerprint
+
+
+def lookup(name):
+    """(量纲向量, 系数)；未注册时为 None"""
+    return _registry.get(name)
+
+
+def dimension_of(numerators, denominators):
+    """
+    由分子、分母中各名称的指数计算 (量纲向量, 系数)。
+    含有未注册的名称时返回 (None, None)。
+    """
+    exponents = [0] * len(BASE_DIMENSIONS)
+    factor = 1
+    for counter, sign in ((numerators, 1), (denominators, -1)):
+        for name, power in counter.items():
+            entry = _registry.get(name)
+            if entry is None:
+                return None, None
+            vector, unit_factor = entry
+            for i, exponent in enumerate(vector):
+                exponents[i] += sign * power * exponent
+            if sign > 0:
+                factor = factor * unit_factor**power
+            else:
+                factor = factor / unit_factor**power
+    if isinstance(factor, float) and factor.is_integer():
+        factor = int(factor)
+    return tuple(exponents), factor
+
+
+def conversion_ratio(from_factor, to_factor):
+    """把以 from 为单位的数值换算为以 to 为单位时需要乘的系数，能整除时保持为整数"""
+    if (
+        isinstance(from_factor, int)
+        and isinstance(to_factor, int)
+        and from_factor % to_factor == 0
+    ):
+        return from_factor // to_factor
+    return from_factor / to_factor
+
+
+def _define(name, factor=1, **exponents):
+    _registry[name] = (_vector(exponents), factor)
+
+
+# --- 基本单位 ---
+_define("m", m=1)
+_define("kg", kg=1)
+_define("s", s=1)
+_define("A", A=1)
+_define("K", K=1)
+_define("mol", mol=1)
+_define("cd", cd=1)
+
+# --- 长度 ---
+_define("km", 1000, m=1)
+_define("cm", 0.01, m=1)
+_define("mm", 0.001, m=1)
+_define("um", 1e-6, m=1)
+_define("nm", 1e-9, m=1)
+_define("mi", 1609.344, m=1)
+_define("yd", 0.9144, m=1)
+_define("ft", 0.3048, m=1)
+
+# --- 质量 ---
+_define("g", 0.001, kg=1)
+_define("mg", 1e-6, kg=1)
+_define("lb", 0.45359237, kg=1)
+
+# --- 时间 ---
+_define("ms", 0.001, s=1)
+_define("us", 1e-6, s=1)
+_define("min", 60, s=1)
+_define("hr", 3600, s=1)
+_define("day", 86400, s=1)
+
+# --- 电流 ---
+_define("mA", 0.001, A=1)
+
+# --- 导出单位 ---
+_define("L", 0.001, m=3)
+_define("Hz", s=-1)
+_define("N", kg=1, m=1, s=-2)
+_define("Pa", kg=1, m=-1, s=-2)
+_define("J", kg=1, m=2, s=-2)
+_define("kJ", 1000, kg=1, m=2, s=-2)
+_define("Wh", 3600, kg=1, m=2, s=-2)
+_define("kWh", 3_600_000, kg=1, m=2, s=-2)
+_define("W", kg=1, m=2, s=-3)
+_define("kW", 1000, kg=1, m=2, s=-3)
+_define("C", A=1, s=1)
+_define("V", kg=1, m=2, s=-3, A=-1)
+_define("ohm", kg=1, m=2, s=-3, A=-2)
@@ -1,26 +1,312 @@
 # src/lucid/vm.py
+import asyncio
+import concurrent.futures
 import enum
+import time
+import weakref
+from collections.abc import MutableMapping
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from .chunk import Chunk, OpCode
-from .runtime_types import Unit, UnitValue
+from .arrays import UnitArray
+from .builtins import bind_builtins
+from .profiler import Profile
+from .tiering import compile_chunk
+from .runtime_types import BuiltinFunction, CompiledFunction, Task, Unit, UnitValue
+from . import operations, units
 
 VMResult = enum.Enum("VMResult", ["OK", "COMPILE_ERROR", "RUNTIME_ERROR"])
 
+# 标记尚未定义（或已被删除）的全局槽位
+_UNDEFINED = object()
+
+# 调用栈深度上限，超过时抛出 RecursionError
+MAX_FRAMES = 10_000
+
+# 处理函数返回它表示当前 chunk 发生了切换（函数调用或返回），执行循环需要
+# 重新读取 chunk.code
+_FRAME_CHANGED = object()
+
+# 同一个 chunk 由 interpret 执行多少次之后翻译为 Python 函数（第二执行层）
+DEFAULT_TIER_THRESHOLD = 50
+
+# 第二执行层无法翻译的 chunk 记为此值，不再重试
+_NOT_TIERABLE = object()
+
+# 一个运算位置连续这么多次看到同一种操作数类型后，原地改写为加速指令
+DEFAULT_QUICKEN_THRESHOLD = 8
+
+# 一个运算位置的守卫失败（或看到无法加速的操作数）这么多次之后，
+# 不再记录它的类型反馈（操作数类型不稳定）
+MAX_DEOPTIMIZATIONS = 4
+
+_NUMBERS = frozenset((int, float))
+
+# 记录类型反馈的通用指令及其实现
+_OBSERVED = {
+    OpCode.OP_ADD: operations.add,
+    OpCode.OP_SUBTRACT: operations.subtract,
+    OpCode.OP_MULTIPLY: operations.multiply,
+    OpCode.OP_DIVIDE: operations.divide,
+    OpCode.OP_GREATER: operations.greater,
+    OpCode.OP_LESS: operations.less,
+}
+
+# (通用指令, 操作数类型) -> 加速指令
+_QUICKENED = {
+    (OpCode.OP_ADD, "number"): OpCode.OP_QUICK_ADD_NUMBER,
+    (OpCode.OP_SUBTRACT, "number"): OpCode.OP_QUICK_SUBTRACT_NUMBER,
+    (OpCode.OP_MULTIPLY, "number"): OpCode.OP_QUICK_MULTIPLY_NUMBER,
+    (OpCode.OP_DIVIDE, "number"): OpCode.OP_QUICK_DIVIDE_NUMBER,
+    (OpCode.OP_GREATER, "number"): OpCode.OP_QUICK_GREATER_NUMBER,
+    (OpCode.OP_LESS, "number"): OpCode.OP_QUICK_LESS_NUMBER,
+    (OpCode.OP_ADD, "unit"): OpCode.OP_QUICK_ADD_UNIT,
+    (OpCode.OP_SUBTRACT, "unit"): OpCode.OP_QUICK_SUBTRACT_UNIT,
+    (OpCode.OP_MULTIPLY, "unit"): OpCode.OP_QUICK_MULTIPLY_UNIT,
+    (OpCode.OP_DIVIDE, "unit"): OpCode.OP_QUICK_DIVIDE_UNIT,
+    (OpCode.OP_GREATER, "unit"): OpCode.OP_QUICK_GREATER_UNIT,
+    (OpCode.OP_LESS, "unit"): OpCode.OP_QUICK_LESS_UNIT,
+}
+
+
+def _operand_pattern(opcode, a, b):
+    """
+    操作数的类型模式："number"（都是 int / float）、"unit"（都是 UnitValue，
+    加减与比较时单位相同），其他组合为 None
+    """
+    if type(a) in _NUMBERS and type(b) in _NUMBERS:
+        return "number"
+    if type(a) is UnitValue and type(b) is UnitValue:
+        if opcode == OpCode.OP_MULTIPLY or opcode == OpCode.OP_DIVIDE:
+            return "unit"
+        if a.unit is b.unit:
+            return "unit"
+    return None
+
+
+def _site(chunk, offset):
+    """chunk 中 offset 处运算的类型反馈记录，必要时创建"""
+    sites = chunk.feedback
+    if sites is None:
+        sites = chunk.feedback = {}
+    site = sites.get(offset)
+    if site is None:
+        site = sites[offset] = [None, 0, 0]
+    return site
+
+
+# run_async 模式下每个绿色任务在让出调度器之前最多执行的指令数
+DEFAULT_BUDGET = 1000
+
+# run_async 模式下处理函数返回它表示当前任务需要等待 VM._waiting
+_SUSPENDED = object()
+
+# 执行预算用完，当前任务让出调度器
+_PREEMPTED = object()
+
+# VM.call_function 使用的跳板 chunk：OP_CALL argc; OP_RETURN，按参数个数缓存
+_trampolines = {}
+
+
+def _trampoline(argc):
+    chunk = _trampolines.get(argc)
+    if chunk is None:
+        chunk = Chunk()
+        chunk.code += bytes((OpCode.OP_CALL, argc, OpCode.OP_RETURN))
+        chunk = _trampolines.setdefault(argc, chunk)
+    return chunk
+
+
+class _Context:
+    """一段执行的完整状态；绿色任务切换时整体换入换出 VM"""
+
+    __slots__ = ("chunk", "ip", "stack", "frames", "base", "function", "slot_map")
+
+    def __init__(self, chunk, ip, stack, frames, base, function, slot_map):
+        self.chunk, self.ip, self.stack, self.frames = chunk, ip, stack, frames
+        self.base, self.function, self.slot_map = base, function, slot_map
+
+# switch 引擎中遇到 UnitArray 操作数时转交给 operations 处理的二元指令
+_ARRAY_OPCODES = frozenset(
+    (
+        OpCode.OP_EQUAL,
+        OpCode.OP_GREATER,
+        OpCode.OP_LESS,
+        OpCode.OP_ADD,
+        OpCode.OP_SUBTRACT,
+        OpCode.OP_MULTIPLY,
+        OpCode.OP_DIVIDE,
+        OpCode.OP_POWER,
+    )
+)
+
+
+class GlobalTable(MutableMapping):
+    """
+    虚拟机的全局变量表。
+
+    变量值按整数槽位存放在 slot_values 列表中，slot_index / slot_names
+    记录名称与槽位之间的双向映射；
+    对外它表现为一个普通的 dict，嵌入方可以照常读写 vm.globals。
+    builtins 中的内建函数不属于全局变量，只在名称未定义时作为后备值。
+    """
+
+    def __init__(self, initial=None, builtins=None):
+        self.slot_index = {}
+        self.slot_names = []
+        self.slot_values = []
+        self.builtins = builtins or {}
+        self._fallbacks = []
+        if initial:
+            self.update(initial)
+
+    def slot(self, name):
+        """返回名称对应的槽位，必要时分配一个新的（未定义的）槽位"""
+        slot = self.slot_index.get(name)
+        if slot is None:
+            slot = len(self.slot_values)
+            self.slot_index[name] = slot
+            self.slot_names.append(name)
+            self.slot_values.append(_UNDEFINED)
+            self._fallbacks.append(None)
+        return slot
+
+    def fallback(self, slot):
+        """
+        未定义名称的值：内建函数，否则被当作单位使用（例如 m）。
+        每个槽位只查找 / 构建一次
+        """
+        value = self._fallbacks[slot]
+        if value is None:
+            name = self.slot_names[slot]
+            value = self.builtins.get(name)
+            if value is None:
+                value = UnitValue(1, Unit.named(name))
+            self._fallbacks[slot] = value
+        return value
+
+    def __getitem__(self, name):
+        slot = self.slot_index[name]
+        value = self.slot_values[slot]
+        if value is _UNDEFINED:
+            raise KeyError(name)
+        return value
+
+    def __setitem__(self, name, value):
+        self.slot_values[self.slot(name)] = value
+
+    def __delitem__(self, name):
+        slot = self.slot_index[name]
+        if self.slot_values[slot] is _UNDEFINED:
+            raise KeyError(name)
+        self.slot_values[slot] = _UNDEFINED
+
+    def __iter__(self):
+        names, values = list(self.slot_names), self.slot_values
+        return (name for slot, name in enumerate(names) if values[slot] is not _UNDEFINED)
+
+    def __len__(self):
+        return sum(1 for value in self.slot_values if value is not _UNDEFINED)
+
+    def __repr__(self):
+        return repr(dict(self))
+
 
 class VM:
     """
     Lucid 字节码虚拟机。(v4.2 - 最终稳定版)
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        dispatch="table",
+        executor="thread",
+        profile=False,
+        tier_threshold=DEFAULT_TIER_THRESHOLD,
+        quicken_threshold=DEFAULT_QUICKEN_THRESHOLD,
+    ):
+        """
+        dispatch 选择执行引擎：
+        "table" 使用按操作码索引的处理函数表（默认）；
+        "switch" 使用原始的 if/elif 解释循环，作为后备实现保留。
+
+        executor 决定 spawn 代码块在哪里运行：
+        "thread" 使用线程池（适合等待 I/O 的内建函数，默认）；
+        "process" 使用进程池（适合 CPU 密集的单位运算，可以用满所有核心）；
+        也可以直接传入一个 concurrent.futures.Executor 实例。
+
+        profile 为 True 时改用插桩执行循环，剖析数据累积在 vm.profile 中
+        （见 profiler.Profile）；spawn 的任务与 run_async 不受剖析。
+        插桩循环基于处理函数表，不能与 dispatch="switch" 同时使用。
+
+        tier_threshold：同一个 chunk 被 interpret 执行这么多次之后，
+        翻译为 Python 函数直接执行（见 tiering 模块）；None 表示关闭。
+        剖析模式下总是使用字节码解释执行。
+
+        quicken_threshold：表驱动引擎中的一个算术或比较位置连续这么多次
+        看到同一种操作数类型后，把 chunk.code 中的这条指令原地改写为带类型
+        守卫的加速指令；None 表示关闭。剖析模式下不加速。
+        """
+        if dispatch not in ("table", "switch"):
+            raise ValueError(f"Unknown dispatch mode: {dispatch}")
+        if profile and dispatch == "switch":
+            raise ValueError("Profiling requires the table dispatch.")
+        if not isinstance(executor, Executor) and executor not in ("thread", "process"):
+            raise ValueError(f"Unknown executor: {executor}")
+        self.dispatch = dispatch
+        self.executor = executor
+        self.profile = Profile() if profile else None
+        self.tier_threshold = None if profile else tier_threshold
+        self.quicken_threshold = None if profile else quicken_threshold
+        # chunk -> [interpret 次数, 翻译出的函数 / _NOT_TIERABLE / None,
+        #           翻译时的单位注册表版本]
+        self._tiers = weakref.WeakKeyDictionary()
+        self._profiling = False
+        # 由本 VM 按需创建的执行器，shutdown() 时关闭
+        self._owned_executor = None
+        # 为 True 时正在 run_async 的调度下执行：spawn 创建绿色任务，
+        # await 未完成的任务时让出调度器
+        self._green = False
+        self._waiting = None
+        # 当前绿色任务的执行预算，spawn 出的任务沿用它
+        self._budget = DEFAULT_BUDGET
         self.chunk = None
         self.ip = 0
         self.stack = []
-        self.globals = {}
+        # 调用帧：保存调用者的 (chunk, ip, base, 全局槽位映射, 函数)
+        self.frames = []
+        # 当前帧在栈上的起始位置（槽位 0）与正在执行的函数
+        self.base = 0
+        self.function = None
+        self._globals = GlobalTable(builtins=bind_builtins(self))
+        self._global_values = self._globals.slot_values
+        # chunk -> 该 chunk 的全局名表到本 VM 全局槽位的映射
+        self._links = weakref.WeakKeyDictionary()
+        self._slot_map = []
+        self._handlers = self._build_dispatch_table()
+
+    @property
+    def globals(self):
+        return self._globals
+
+    @globals.setter
+    def globals(self, mapping):
+        # 兼容直接替换整个全局字典的嵌入方式；槽位保持不变，只替换内容
+        for name in list(self._globals):
+            del self._globals[name]
+        self._globals.update(mapping)
 
     def interpret(self, chunk):
+        if self.tier_threshold is not None:
+            tiered = self._tiered(chunk)
+            if tiered is not None:
+                return tiered()
         self.chunk = chunk
         self.ip = 0
         self.stack = []
+        self.frames = []
+        self.base = 0
+        self.function = None
+        self._slot_map = self._link(chunk)
 
         result = self.run()
 
@@ -29,6 +315,144 @@ class VM:
 
         return result
 
+    def _tiered(self, chunk):
+        """记录一次执行；chunk 已经（或刚好）达到阈值且可以翻译时返回翻译出的函数"""
+        entry = self._tiers.get(chunk)
+        if entry is None:
+            entry = self._tiers[chunk] = [0, None, None]
+        elif entry[2] != units.registry_version():
+            # 注册表变化后 chunk 中的类型专用指令已被改写，重新翻译
+            entry[1] = None
+        tiered = entry[1]
+        if tiered is None:
+            entry[0] += 1
+            if entry[0] < self.tier_threshold:
+                return None
+            tiered = compile_chunk(
+                chunk,
+                self._link(chunk),
+                self._global_values,
+                self._globals.fallback,
+                _UNDEFINED,
+            )
+            entry[1] = tiered = tiered or _NOT_TIERABLE
+            entry[2] = units.registry_version()
+        return None if tiered is _NOT_TIERABLE else tiered
+
+    def call_function(self, function, *args):
+        """
+        从 Python 调用一个 Lucid 函数并返回结果。
+        可以在虚拟机执行过程中重入（例如由内建函数回调），调用结束后恢复原状态。
+        """
+        saved, green = self._save_context(), self._green
+        try:
+            # 重入的调用总是同步执行，其中的 await 会阻塞等待
+            self._green = False
+            self._load_context(self._call_context(function, args))
+            status = self.run()
+            if status is not VMResult.OK:
+                raise RuntimeError(f"Function call finished with {status.name}.")
+            return self.stack.pop()
+        finally:
+            self._load_context(saved)
+            self._green = green
+
+    async def run_async(self, chunk, budget=DEFAULT_BUDGET):
+        """
+        asyncio 入口：执行 chunk 并返回结果，不阻塞事件循环。
+        其中的 spawn 创建绿色任务（各自拥有栈与指令指针，共享全局变量），
+        await 未完成的任务时让出调度器，每个任务（包括 spawn 出的任务）
+        执行 budget 条指令后被抢占。
+        """
+        context = _Context(chunk, 0, [], [], 0, None, self._link(chunk))
+        return await self._drive(context, budget)
+
+    async def _drive(self, context, budget):
+        """在事件循环中分片执行一个绿色任务，直到它结束"""
+        while True:
+            self._load_context(context)
+            self._green = True
+            self._budget = budget
+            try:
+                status = self._run_budget(budget)
+            finally:
+                self._green = False
+                self._save_context(context)
+            if status is _PREEMPTED:
+                await asyncio.sleep(0)
+            elif status is _SUSPENDED:
+                waiting, self._waiting = self._waiting, None
+                # 只等待完成；结果（或错误）由重新执行的 OP_AWAIT 取出
+                await asyncio.wait((waiting,))
+            elif status is VMResult.OK:
+                return context.stack.pop() if context.stack else None
+            else:
+                raise RuntimeError(f"Task finished with {status.name}.")
+
+    def _run_budget(self, budget):
+        """表驱动执行循环的计数版本，执行 budget 条指令后返回 _PREEMPTED"""
+        handlers = self._handlers
+        while True:
+            code = self.chunk.code
+            end = len(code)
+            while self.ip < end:
+                if not budget:
+                    return _PREEMPTED
+                budget -= 1
+                instruction = code[self.ip]
+                self.ip += 1
+                status = handlers[instruction]()
+                if status is not None:
+                    break
+            else:
+                return VMResult.OK
+            if status is not _FRAME_CHANGED:
+                return status
+
+    def _call_context(self, function, args):
+        return _Context(_trampoline(len(args)), 0, [function, *args], [], 0, None, [])
+
+    def _save_context(self, context=None):
+        if context is None:
+            return _Context(
+                self.chunk,
+                self.ip,
+                self.stack,
+                self.frames,
+                self.base,
+                self.function,
+                self._slot_map,
+            )
+        context.chunk, context.ip, context.stack = self.chunk, self.ip, self.stack
+        context.frames, context.base = self.frames, self.base
+        context.function, context.slot_map = self.function, self._slot_map
+        return context
+
+    def _load_context(self, context):
+        self.chunk, self.ip, self.stack = context.chunk, context.ip, context.stack
+        self.frames, self.base = context.frames, context.base
+        self.function, self._slot_map = context.function, context.slot_map
+
+    def shutdown(self, wait=True):
+        """关闭本 VM 为 spawn 创建的线程池或进程池"""
+        if self._owned_executor is not None:
+            self._owned_executor.shutdown(wait=wait)
+            self._owned_executor = None
+
+    def _link(self, chunk):
+        """
+        把 chunk 的全局变量名表解析为本 VM 的全局槽位，结果按 chunk 缓存。
+        名表只会追加，因此之后新增的名称只需解析增长的部分
+        """
+        slot_map = self._links.get(chunk)
+        if slot_map is None:
+            slot_map = self._links[chunk] = []
+        names = chunk.global_names
+        if len(slot_map) != len(names):
+            slot = self._globals.slot
+            slot_map.extend(slot(name) for name in names[len(slot_map) :])
+        return slot_map
+
     def push(self, value):
         self.stack.append(value)
 
@@ -42,6 +466,649 @@ class VM:
         return value is None or value is False
 
     def run(self):
+        if self.profile is not None:
+            return self._run_profiled()
+        if self.dispatch == "table":
+            return self._run_table()
+        return self._run_switch()
+
+    # --- 插桩执行引擎（仅在 profile 模式下使用） ---
+    def _run_profiled(self):
+        if self._profiling:
+            # call_function 重入时，外层已经在统计分配
+            return self._run_instrumented()
+        self._profiling = True
+        try:
+            with self.profile.counting_allocations():
+                return self._run_instrumented()
+        finally:
+            self._profiling = False
+
+    def _run_instrumented(self):
+        """与 _run_table 相同，另外记录每条指令的次数、耗时与栈深度"""
+        handlers = self._handlers
+        profile = self.profile
+        clock = time.perf_counter_ns
+        while True:
+            code = self.chunk.code
+            end = len(code)
+            counts, times = profile.site(self.chunk, self.function)
+            high_water = profile.stack_high_water
+            depth = len(self.frames) + 1
+            profile.frames_high_water = max(profile.frames_high_water, depth)
+            while self.ip < end:
+                offset = self.ip
+                instruction = code[offset]
+                self.ip += 1
+                start = clock()
+                status = handlers[instruction]()
+                times[offset] += clock() - start
+                counts[offset] += 1
+                if len(self.stack) > high_water:
+                    high_water = len(self.stack)
+                if status is not None:
+                    break
+            else:
+                status = VMResult.OK
+            profile.stack_high_water = max(profile.stack_high_water, high_water)
+            if status is not _FRAME_CHANGED:
+                return status
+
+    # --- 表驱动执行引擎 ---
+    def _build_dispatch_table(self):
+        """
+        构建 256 项的处理函数表。每个操作码 OP_XXX 对应方法 _op_xxx，
+        未定义的字节统一映射到 _op_invalid。
+        """
+        table = [self._op_invalid] * 256
+        for op in OpCode:
+            table[op] = getattr(self, f"_{op.name.lower()}")
+        if self.quicken_threshold is not None:
+            # 开启加速时，通用的算术与比较指令由记录类型反馈的处理函数执行
+            for op, operation in _OBSERVED.items():
+                table[op] = self._observing(op, operation)
+        return table
+
+    def _observing(self, opcode, operation):
+        """返回执行 operation 并记录操作数类型的处理函数"""
+        threshold = self.quicken_threshold
+
+        def handler():
+            stack = self.stack
+            b = stack.pop()
+            a = stack[-1]
+            stack[-1] = operation(a, b)
+            site = _site(self.chunk, self.ip - 1)
+            if site[2] >= MAX_DEOPTIMIZATIONS:
+                return
+            pattern = _operand_pattern(opcode, a, b)
+            if pattern is None:
+                site[1] = 0
+                site[2] += 1
+                return
+            if pattern != site[0]:
+                site[0], site[1] = pattern, 0
+            site[1] += 1
+            if site[1] >= threshold:
+                self.chunk.code[self.ip - 1] = _QUICKENED[opcode, pattern]
+                site[1] = 0
+
+        return handler
+
+    def _deoptimize(self, opcode):
+        """加速指令的守卫失败：把当前指令改写回通用指令 opcode"""
+        self.chunk.code[self.ip - 1] = opcode
+        site = _site(self.chunk, self.ip - 1)
+        site[0], site[1] = None, 0
+        site[2] += 1
+
+    def _run_table(self):
+        handlers = self._handlers
+        while True:
+            code = self.chunk.code
+            end = len(code)
+            while self.ip < end:
+                instruction = code[self.ip]
+                self.ip += 1
+                # 处理函数返回非 None 值表示执行结束或切换了 chunk
+                status = handlers[instruction]()
+                if status is not None:
+                    break
+            else:
+                return VMResult.OK
+            if status is not _FRAME_CHANGED:
+                return status
+
+    def _read_short(self):
+        code = self.chunk.code
+        ip = self.ip
+        self.ip = ip + 2
+        return (code[ip] << 8) | code[ip + 1]
+
+    def _read_wide_index(self):
+        code = self.chunk.code
+        ip = self.ip
+        self.ip = ip + 3
+        return (code[ip] << 16) | (code[ip + 1] << 8) | code[ip + 2]
+
+    def _read_long(self):
+        code = self.chunk.code
+        ip = self.ip
+        self.ip = ip + 4
+        return int.from_bytes(code[ip : ip + 4], "big")
+
+    def _op_invalid(self):
+        raise RuntimeError(f"Unknown opcode {self.chunk.code[self.ip - 1]}.")
+
+    def _op_constant(self):
+        self.stack.append(self.chunk.constants[self.chunk.code[self.ip]])
+        self.ip += 1
+
+    def _op_nil(self):
+        self.stack.append(None)
+
+    def _op_true(self):
+        self.stack.append(True)
+
+    def _op_false(self):
+        self.stack.append(False)
+
+    def _op_pop(self):
+        self.stack.pop()
+
+    def _op_define_global(self):
+        slot = self._slot_map[self.chunk.code[self.ip]]
+        self.ip += 1
+        self._global_values[slot] = self.stack.pop()
+
+    def _op_get_global(self):
+        slot = self._slot_map[self.chunk.code[self.ip]]
+        self.ip += 1
+        value = self._global_values[slot]
+        if value is None or value is _UNDEFINED:
+            value = self._globals.fallback(slot)
+        self.stack.append(value)
+
+    def _op_build_unit_value(self):
+        stack = self.stack
+        unit_string = stack.pop()
+        stack[-1] = UnitValue(stack[-1], Unit.named(unit_string))
+
+    def _op_jump_if_false(self):
+        jump_offset = self._read_short()
+        value = self.stack[-1]
+        if value is None or value is False:
+            self.ip += jump_offset
+
+    def _op_jump(self):
+        jump_offset = self._read_short()
+        self.ip += jump_offset
+
+    def _op_equal(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = operations.equal(stack[-1], b)
+
+    def _op_greater(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = operations.greater(stack[-1], b)
+
+    def _op_less(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = operations.less(stack[-1], b)
+
+    def _op_constant_long(self):
+        self.stack.append(self.chunk.constants[self._read_wide_index()])
+
+    def _op_define_global_long(self):
+        slot = self._slot_map[self._read_wide_index()]
+        self._global_values[slot] = self.stack.pop()
+
+    def _op_get_global_long(self):
+        slot = self._slot_map[self._read_wide_index()]
+        value = self._global_values[slot]
+        if value is None or value is _UNDEFINED:
+            value = self._globals.fallback(slot)
+        self.stack.append(value)
+
+    def _op_jump_if_false_long(self):
+        jump_offset = self._read_long()
+        value = self.stack[-1]
+        if value is None or value is False:
+            self.ip += jump_offset
+
+    def _op_jump_long(self):
+        jump_offset = self._read_long()
+        self.ip += jump_offset
+
+    def _op_not_equal(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = operations.not_equal(stack[-1], b)
+
+    def _op_greater_equal(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = operations.greater_equal(stack[-1], b)
+
+    def _op_less_equal(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = operations.less_equal(stack[-1], b)
+
+    def _op_unit_constant(self):
+        # 常量池中存放的是预先构建好的 UnitValue
+        self.stack.append(self.chunk.constants[self.chunk.code[self.ip]])
+        self.ip += 1
+
+    def _op_not(self):
+        stack = self.stack
+        value = stack[-1]
+        if type(value) is UnitArray:
+            stack[-1] = value.logical_not()
+        else:
+            stack[-1] = value is None or value is False
+
+    def _op_add(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = operations.add(stack[-1], b)
+
+    def _op_subtract(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = operations.subtract(stack[-1], b)
+
+    def _op_multiply(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = operations.multiply(stack[-1], b)
+
+    def _op_divide(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = operations.divide(stack[-1], b)
+
+    def _op_power(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = operations.power(stack[-1], b)
+
+    def _op_negate(self):
+        stack = self.stack
+        stack[-1] = operations.negate(stack[-1])
+
+    def _op_return(self):
+        if not self.frames:
+            return VMResult.OK
+        stack = self.stack
+        result = stack.pop()
+        del stack[self.base :]
+        stack.append(result)
+        self.chunk, self.ip, self.base, self._slot_map, self.function = (
+            self.frames.pop()
+        )
+        return _FRAME_CHANGED
+
+    def _op_get_local(self):
+        stack = self.stack
+        stack.append(stack[self.base + self.chunk.code[self.ip]])
+        self.ip += 1
+
+    def _op_set_local(self):
+        stack = self.stack
+        stack[self.base + self.chunk.code[self.ip]] = stack.pop()
+        self.ip += 1
+
+    def _op_get_capture(self):
+        self.stack.append(self.function.captures[self.chunk.code[self.ip]])
+        self.ip += 1
+
+    def _op_closure(self):
+        self._make_closure(self.chunk.code[self.ip])
+        self.ip += 1
+
+    def _op_closure_long(self):
+        self._make_closure(self._read_wide_index())
+
+    def _make_closure(self, index):
+        function = self.chunk.constants[index]
+        count = function.capture_count
+        if count:
+            stack = self.stack
+            function = function.bind(stack[-count:])
+            del stack[-count:]
+        self.stack.append(function)
+
+    def _op_spawn(self):
+        function = self.stack.pop()
+        if self._green:
+            context = self._call_context(function, ())
+            future = asyncio.ensure_future(self._drive(context, self._budget))
+            self.stack.append(Task(future))
+            return
+        executor = self._get_executor()
+        snapshot = self._capture_globals(
+            function, isinstance(executor, ProcessPoolExecutor)
+        )
+        future = executor.submit(_run_task, function, snapshot, self.dispatch)
+        self.stack.append(Task(future))
+
+    def _op_await(self):
+        task = self.stack[-1]
+        if not isinstance(task, Task):
+            raise TypeError(f"Can only await tasks, not {task!r}.")
+        future = task.future
+        if self._green and not future.done():
+            if isinstance(future, concurrent.futures.Future):
+                future = task.future = asyncio.wrap_future(future)
+            # 回到 OP_AWAIT 本身，任务完成后重新执行它
+            self.ip -= 1
+            self._waiting = future
+            return _SUSPENDED
+        # 任务中的错误在这里重新抛出
+        self.stack[-1] = future.result()
+
+    def _get_executor(self):
+        if isinstance(self.executor, Executor):
+            return self.executor
+        if self._owned_executor is None:
+            if self.executor == "process":
+                self._owned_executor = ProcessPoolExecutor()
+            else:
+                self._owned_executor = ThreadPoolExecutor()
+        return self._owned_executor
+
+    def _capture_globals(self, function, cross_process):
+        """
+        spawn 时的全局变量快照：包括代码块引用的全局变量，以及其中的函数
+        （来自其他 chunk 时）所引用的全局变量。
+        Task 无法发送到其他进程，cross_process 为 True 时不包含它们。
+        """
+        table = self._globals
+        snapshot = {}
+        seen = set()
+        pending = [function]
+        while pending:
+            current = pending.pop()
+            pending.extend(
+                value for value in current.captures if type(value) is CompiledFunction
+            )
+            names = current.chunk.global_names
+            if id(names) in seen:
+                continue
+            seen.add(id(names))
+            for name in names:
+                slot = table.slot_index.get(name)
+                if slot is None or name in snapshot:
+                    continue
+                value = table.slot_values[slot]
+                if value is _UNDEFINED or (cross_process and type(value) is Task):
+                    continue
+                snapshot[name] = value
+                if type(value) is CompiledFunction:
+                    pending.append(value)
+        return snapshot
+
+    def _op_call(self):
+        argc = self.chunk.code[self.ip]
+        self.ip += 1
+        stack = self.stack
+        callee = stack[-1 - argc]
+        if type(callee) is CompiledFunction:
+            if argc != callee.arity:
+                raise TypeError(
+                    f"Expected {callee.arity} arguments but got {argc}."
+                )
+            if len(self.frames) >= MAX_FRAMES:
+                raise RecursionError("Stack overflow.")
+            self.frames.append(
+                (self.chunk, self.ip, self.base, self._slot_map, self.function)
+            )
+            extra = callee.local_count - argc
+            if extra:
+                stack.extend([None] * extra)
+            chunk = callee.chunk
+            if chunk.global_names is not self.chunk.global_names:
+                self._slot_map = self._link(chunk)
+            self.chunk, self.ip, self.function = chunk, 0, callee
+            self.base = len(stack) - callee.local_count - 1
+            return _FRAME_CHANGED
+        if type(callee) is BuiltinFunction:
+            args = stack[len(stack) - argc :]
+            del stack[-1 - argc :]
+            stack.append(callee.fn(*args))
+            return None
+        raise TypeError(f"Can only call functions, not {callee!r}.")
+
+    # --- 类型专用指令：编译器已证明操作数的类型，这里不再检查 ---
+    def _op_add_number(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] += b
+
+    def _op_subtract_number(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] -= b
+
+    def _op_multiply_number(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] *= b
+
+    def _op_divide_number(self):
+        stack = self.stack
+        b = stack.pop()
+        if b == 0:
+            raise ZeroDivisionError("Division by zero.")
+        stack[-1] /= b
+
+    def _op_greater_number(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = stack[-1] > b
+
+    def _op_less_number(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = stack[-1] < b
+
+    def _op_add_unit(self):
+        stack = self.stack
+        b, a = stack.pop(), stack[-1]
+        stack[-1] = UnitValue(a.value + b.value, a.unit)
+
+    def _op_subtract_unit(self):
+        stack = self.stack
+        b, a = stack.pop(), stack[-1]
+        stack[-1] = UnitValue(a.value - b.value, a.unit)
+
+    def _op_multiply_unit(self):
+        stack = self.stack
+        b, a = stack.pop(), stack[-1]
+        stack[-1] = UnitValue(a.value * b.value, a.unit.multiply(b.unit))
+
+    def _op_divide_unit(self):
+        stack = self.stack
+        b, a = stack.pop(), stack[-1]
+        if b.value == 0:
+            raise ZeroDivisionError("Division by zero.")
+        stack[-1] = UnitValue(a.value / b.value, a.unit.divide(b.unit))
+
+    def _op_greater_unit(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = stack[-1].value > b.value
+
+    def _op_less_unit(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = stack[-1].value < b.value
+
+    def _op_greater_equal_number(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = not stack[-1] < b
+
+    def _op_less_equal_number(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = not stack[-1] > b
+
+    def _op_greater_equal_unit(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = not stack[-1].value < b.value
+
+    def _op_less_equal_unit(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = not stack[-1].value > b.value
+
+    def _op_multiply_unit_number(self):
+        stack = self.stack
+        b, a = stack.pop(), stack[-1]
+        stack[-1] = UnitValue(a.value * b, a.unit)
+
+    def _op_multiply_number_unit(self):
+        stack = self.stack
+        b, a = stack.pop(), stack[-1]
+        stack[-1] = UnitValue(a * b.value, b.unit)
+
+    def _op_divide_unit_number(self):
+        stack = self.stack
+        b, a = stack.pop(), stack[-1]
+        if b == 0:
+            raise ZeroDivisionError("Division by zero.")
+        stack[-1] = UnitValue(a.value / b, a.unit)
+
+    # --- 加速指令：守卫成立时走快速路径，否则退回通用实现并撤销加速 ---
+    def _op_quick_add_number(self):
+        stack = self.stack
+        b, a = stack.pop(), stack[-1]
+        if type(a) in _NUMBERS and type(b) in _NUMBERS:
+            stack[-1] = a + b
+        else:
+            self._deoptimize(OpCode.OP_ADD)
+            stack[-1] = operations.add(a, b)
+
+    def _op_quick_subtract_number(self):
+        stack = self.stack
+        b, a = stack.pop(), stack[-1]
+        if type(a) in _NUMBERS and type(b) in _NUMBERS:
+            stack[-1] = a - b
+        else:
+            self._deoptimize(OpCode.OP_SUBTRACT)
+            stack[-1] = operations.subtract(a, b)
+
+    def _op_quick_multiply_number(self):
+        stack = self.stack
+        b, a = stack.pop(), stack[-1]
+        if type(a) in _NUMBERS and type(b) in _NUMBERS:
+            stack[-1] = a * b
+        else:
+            self._deoptimize(OpCode.OP_MULTIPLY)
+            stack[-1] = operations.multiply(a, b)
+
+    def _op_quick_divide_number(self):
+        stack = self.stack
+        b, a = stack.pop(), stack[-1]
+        if type(a) in _NUMBERS and type(b) in _NUMBERS and b:
+            stack[-1] = a / b
+        else:
+            # 除数为 0 也走通用实现，由它给出错误信息
+            self._deoptimize(OpCode.OP_DIVIDE)
+            stack[-1] = operations.divide(a, b)
+
+    def _op_quick_greater_number(self):
+        stack = self.stack
+        b, a = stack.pop(), stack[-1]
+        if type(a) in _NUMBERS and type(b) in _NUMBERS:
+            stack[-1] = a > b
+        else:
+            self._deoptimize(OpCode.OP_GREATER)
+            stack[-1] = operations.greater(a, b)
+
+    def _op_quick_less_number(self):
+        stack = self.stack
+        b, a = stack.pop(), stack[-1]
+        if type(a) in _NUMBERS and type(b) in _NUMBERS:
+            stack[-1] = a < b
+        else:
+            self._deoptimize(OpCode.OP_LESS)
+            stack[-1] = operations.less(a, b)
+
+    def _op_quick_add_unit(self):
+        stack = self.stack
+        b, a = stack.pop(), stack[-1]
+        if (
+            type(a) is UnitValue
+            and type(b) is UnitValue
+            and a.unit is b.unit
+            and a.unit.scale is None
+        ):
+            stack[-1] = UnitValue(a.value + b.value, a.unit)
+        else:
+            self._deoptimize(OpCode.OP_ADD)
+            stack[-1] = operations.add(a, b)
+
+    def _op_quick_subtract_unit(self):
+        stack = self.stack
+        b, a = stack.pop(), stack[-1]
+        if (
+            type(a) is UnitValue
+            and type(b) is UnitValue
+            and a.unit is b.unit
+            and a.unit.scale is None
+        ):
+            stack[-1] = UnitValue(a.value - b.value, a.unit)
+        else:
+            self._deoptimize(OpCode.OP_SUBTRACT)
+            stack[-1] = operations.subtract(a, b)
+
+    def _op_quick_multiply_unit(self):
+        stack = self.stack
+        b, a = stack.pop(), stack[-1]
+        if type(a) is UnitValue and type(b) is UnitValue:
+            unit = a.unit.multiply(b.unit)
+            stack[-1] = operations.make_value(a.value * b.value, unit)
+        else:
+            self._deoptimize(OpCode.OP_MULTIPLY)
+            stack[-1] = operations.multiply(a, b)
+
+    def _op_quick_divide_unit(self):
+        stack = self.stack
+        b, a = stack.pop(), stack[-1]
+        if type(a) is UnitValue and type(b) is UnitValue and b.value:
+            unit = a.unit.divide(b.unit)
+            stack[-1] = operations.make_value(a.value / b.value, unit)
+        else:
+            self._deoptimize(OpCode.OP_DIVIDE)
+            stack[-1] = operations.divide(a, b)
+
+    def _op_quick_greater_unit(self):
+        stack = self.stack
+        b, a = stack.pop(), stack[-1]
+        if type(a) is UnitValue and type(b) is UnitValue and a.unit is b.unit:
+            stack[-1] = a.value > b.value
+        else:
+            self._deoptimize(OpCode.OP_GREATER)
+            stack[-1] = operations.greater(a, b)
+
+    def _op_quick_less_unit(self):
+        stack = self.stack
+        b, a = stack.pop(), stack[-1]
+        if type(a) is UnitValue and type(b) is UnitValue and a.unit is b.unit:
+            stack[-1] = a.value < b.value
+        else:
+            self._deoptimize(OpCode.OP_LESS)
+            stack[-1] = operations.less(a, b)
+
+    # --- 原始 if/elif 执行引擎（后备） ---
+    def _run_switch(self):
         while self.ip < len(self.chunk.code):
             instruction = OpCode(self.chunk.code[self.ip])
             self.ip += 1
@@ -64,17 +1131,16 @@ class VM:
             elif instruction == OpCode.OP_DEFINE_GLOBAL:
                 # *** BUG FIX: Change from peek() back to pop() ***
                 # The instruction's job is to consume the value from the stack and store it.
-                var_name_index = self.chunk.code[self.ip]
+                slot = self._slot_map[self.chunk.code[self.ip]]
                 self.ip += 1
-                self.globals[self.chunk.constants[var_name_index]] = self.pop()
+                self._global_values[slot] = self.pop()
 
             elif instruction == OpCode.OP_GET_GLOBAL:
-                var_name_index = self.chunk.code[self.ip]
+                slot = self._slot_map[self.chunk.code[self.ip]]
                 self.ip += 1
-                var_name = self.chunk.constants[var_name_index]
-                value = self.globals.get(var_name)
-                if value is None:
-                    self.push(UnitValue(1, Unit([var_name])))
+                value = self._global_values[slot]
+                if value is None or value is _UNDEFINED:
+                    self.push(self._globals.fallback(slot))
                 else:
                     self.push(value)
 
@@ -97,6 +1163,11 @@ class VM:
                 self.ip += 2
                 self.ip += jump_offset
 
+            elif instruction in _ARRAY_OPCODES and (
+                type(self.peek()) is UnitArray or type(self.peek(1)) is UnitArray
+            ):
+                self._handlers[instruction]()
+
             elif instruction == OpCode.OP_EQUAL:
                 b, a = self.pop(), self.pop()
                 self.push(a == b)
@@ -105,12 +1176,13 @@ class VM:
                 b, a = self.pop(), self.pop()
                 val_a = a if isinstance(a, UnitValue) else UnitValue(a, Unit())
                 val_b = b if isinstance(b, UnitValue) else UnitValue(b, Unit())
-                if val_a.unit != val_b.unit:
+                ratio = val_a.unit.ratio(val_b.unit)
+                if ratio is None:
                     raise TypeError("Cannot compare values with different units.")
                 if instruction == OpCode.OP_GREATER:
-                    self.push(val_a.value > val_b.value)
+                    self.push(val_a.value > val_b.value * ratio)
                 else:
-                    self.push(val_a.value < val_b.value)
+                    self.push(val_a.value < val_b.value * ratio)
 
             elif (
                 instruction == OpCode.OP_ADD
@@ -123,13 +1195,15 @@ class VM:
                 val_a = a if isinstance(a, UnitValue) else UnitValue(a, Unit())
                 val_b = b if isinstance(b, UnitValue) else UnitValue(b, Unit())
                 if instruction == OpCode.OP_ADD:
-                    if val_a.unit != val_b.unit:
+                    ratio = val_a.unit.ratio(val_b.unit)
+                    if ratio is None:
                         raise TypeError("Incompatible units for addition.")
-                    result = UnitValue(val_a.value + val_b.value, val_a.unit)
+                    result = UnitValue(val_a.value + val_b.value * ratio, val_a.unit)
                 elif instruction == OpCode.OP_SUBTRACT:
-                    if val_a.unit != val_b.unit:
+                    ratio = val_a.unit.ratio(val_b.unit)
+                    if ratio is None:
                         raise TypeError("Incompatible units for subtraction.")
-                    result = UnitValue(val_a.value - val_b.value, val_a.unit)
+                    result = UnitValue(val_a.value - val_b.value * ratio, val_a.unit)
                 elif instruction == OpCode.OP_MULTIPLY:
                     result = UnitValue(
                         val_a.value * val_b.value,
@@ -161,11 +1235,13 @@ class VM:
 
                 if not result.unit.numerators and not result.unit.denominators:
                     self.push(result.value)
+                elif result.unit.scale is not None:
+                    self.push(result.value * result.unit.scale)
                 else:
                     self.push(result)
 
             elif instruction == OpCode.OP_NOT:
-                self.push(self.is_falsy(self.pop()))
+                self.push(operations.logical_not(self.pop()))
             elif instruction == OpCode.OP_NEGATE:
                 value = self.pop()
                 self.push(
@@ -175,6 +1251,25 @@ class VM:
                 )
 
             elif instruction == OpCode.OP_RETURN:
-                return VMResult.OK
+                if not self.frames:
+                    return VMResult.OK
+                self._op_return()
+
+            else:
+                # 后续新增的指令直接复用表驱动引擎的处理函数
+                status = self._handlers[instruction]()
+                if status is not None and status is not _FRAME_CHANGED:
+                    return status
 
         return VMResult.OK
+
+
+def _run_task(function, globals_snapshot, dispatch):
+    """在执行器（线程或工作进程）中运行一个 spawn 代码块"""
+    vm = VM(dispatch=dispatch)
+    vm.globals.update(globals_snapshot)
+    try:
+        return vm.call_function(function)
+    finally:
+        # 代码块内部嵌套的 spawn 已经提交的任务不受影响
+        vm.shutdown(wait=False)